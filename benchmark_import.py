@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the CSV import pipeline of import_data.py
+
+Generates synthetic CSV files that follow SCHEMA and the sample templates of
+create_sample_csvs, then times each stage of the import separately:
+
+    read   parsing the CSV file into records (CsvStream)
+    cast   converting records into rows (cast_shard / RowConverter)
+    cached reading the casted rows back from a staging cache of the file, what
+           a later import of the same file does instead of read and cast
+    hash   bcrypt hashing of users passwords (first --hash-sample rows only)
+    write  COPY/INSERT of the casted rows into PostgreSQL
+
+Usage:
+    python benchmark_import.py [--sizes 10k,1m,10m] [--variants utf8-comma,cp1252-semicolon]
+                               [--tables interventions,users] [--no-write] [--no-copy]
+                               [--output results.json] [--baseline previous.json]
+
+Generated files are cached in --data-dir and reused by later runs. The write
+stage loads rows into copies of the tables created in a scratch schema
+(BENCH_SCHEMA, dropped afterwards), so it needs the migrated database of
+DB_CONFIG but never touches its data; use a local throwaway database anyway.
+
+Results are written as JSON (one entry per table, variant and size, with the
+seconds and rows/s of every stage), and --baseline prints the change in
+throughput against the results of an earlier run.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from psycopg2 import sql
+
+from import_data import (
+    BCRYPT_ROUNDS, COPY_CHUNK_SIZE, DB_CONFIG, HAS_BCRYPT, ID_REGISTRY, SAMPLE_CSVS, SCHEMA,
+    CsvStream, DatabaseImporter, StagingCache, _chunked, cast_shard, compile_converter,
+)
+
+# Row counts selectable with --sizes
+BENCH_SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# File variants: name -> (encoding, delimiter)
+BENCH_VARIANTS = {
+    'utf8-comma': ('utf-8', ','),
+    'cp1252-semicolon': ('cp1252', ';'),
+}
+
+# Stages timed for every file, in pipeline order
+BENCH_STAGES = ['read', 'cast', 'cached', 'hash', 'write']
+
+# Schema holding the tables written by the benchmark
+BENCH_SCHEMA = 'import_bench'
+
+# Share of empty values in nullable columns
+BENCH_NULL_RATE = 0.2
+
+# Accented text appended to text columns, so both encodings are exercised
+BENCH_ACCENTED_TEXT = "Contrôle effectué à l'arrêt, reprise prévue"
+
+BENCH_BASE_DATE = datetime(2024, 1, 1)
+
+
+def parse_size(value: str) -> int:
+    """Row count from a BENCH_SIZES name or a plain integer."""
+    value = value.strip().lower()
+    if value in BENCH_SIZES:
+        return BENCH_SIZES[value]
+    return int(value.replace('_', ''))
+
+
+def sample_values(table: str) -> Dict[str, List[str]]:
+    """Non-empty values of each column in the create_sample_csvs template of a table."""
+    header, *rows = SAMPLE_CSVS[f'{table}.csv']
+    values: Dict[str, List[str]] = {col: [] for col in header}
+    for row in rows:
+        for col, value in zip(header, row):
+            if value:
+                values[col].append(value)
+    return values
+
+
+def synthetic_value(col: str, kind: str, i: int, rng: random.Random, vocab: Sequence[str]) -> str:
+    """CSV value of column `col` (SCHEMA type `kind`) in the i-th synthetic row."""
+    base = kind.rstrip('?')
+    if kind.endswith('?') and rng.random() < BENCH_NULL_RATE:
+        return ''
+    if col == 'id':
+        return str(i)
+    if col in ('email', 'firebaseUid'):
+        # Unique in users
+        return f'{col.lower()}{i}@supervision.test'
+    if base == 'uuid':
+        return str(rng.randint(1, 1000))
+    if base == 'bool':
+        return rng.choice(('true', 'false'))
+    if base in ('int', 'number'):
+        return str(rng.randint(0, 10))
+    if base == 'timestamp':
+        return (BENCH_BASE_DATE + timedelta(minutes=i)).isoformat()
+    if vocab:
+        value = rng.choice(vocab)
+    elif base == 'json_text':
+        value = '["Maintenance"]'
+    elif base == 'jsonb':
+        value = json.dumps({'row': i})
+    else:
+        value = f'{col} {i}'
+    if base == 'text':
+        value = f'{value} - {BENCH_ACCENTED_TEXT}'
+    return value
+
+
+def generate_csv(table: str, rows: int, variant: str, path: str, seed: int = 0) -> None:
+    """Write a synthetic CSV of `rows` rows for a table, with the header of its sample template."""
+    encoding, delimiter = BENCH_VARIANTS[variant]
+    header = SAMPLE_CSVS[f'{table}.csv'][0]
+    schema = SCHEMA[table]
+    vocab = sample_values(table)
+    rng = random.Random(seed)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', newline='', encoding=encoding) as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(header)
+        for i in range(1, rows + 1):
+            writer.writerow([synthetic_value(col, schema.get(col, 'string?'), i, rng, vocab[col])
+                             for col in header])
+    os.replace(tmp_path, path)
+
+
+def bench_path(data_dir: str, table: str, rows: int, variant: str) -> str:
+    """Return the cached synthetic CSV of a table, generating it if needed."""
+    path = os.path.join(data_dir, f'{table}-{rows}-{variant}.csv')
+    if not os.path.exists(path):
+        print(f"📝 Generating {rows} rows for {table} ({variant})...")
+        started = time.perf_counter()
+        generate_csv(table, rows, variant, path)
+        print(f"   {os.path.getsize(path) / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def create_bench_schema(importer: DatabaseImporter, tables: Sequence[str]) -> None:
+    """Create empty copies of `tables` in BENCH_SCHEMA and put it first in the search path."""
+    schema = sql.Identifier(BENCH_SCHEMA)
+    importer.cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(schema))
+    importer.cur.execute(sql.SQL("CREATE SCHEMA {}").format(schema))
+    for table in tables:
+        # Defaults, checks and indexes are copied, foreign keys are not
+        importer.cur.execute(sql.SQL("CREATE TABLE {}.{} (LIKE public.{} INCLUDING ALL)").format(
+            schema, sql.Identifier(table), sql.Identifier(table)))
+    importer.cur.execute(sql.SQL("SET search_path TO {}, public").format(schema))
+    importer.conn.commit()
+
+
+def drop_bench_schema(importer: DatabaseImporter) -> None:
+    importer.conn.rollback()
+    importer.cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(BENCH_SCHEMA)))
+    importer.conn.commit()
+
+
+def _stage(seconds: float, rows: int, size: Optional[int] = None) -> Dict[str, Any]:
+    result = {
+        'seconds': round(seconds, 6),
+        'rows': rows,
+        'rows_per_second': round(rows / seconds, 1) if seconds else None,
+    }
+    if size is not None:
+        result['mb_per_second'] = round(size / 1e6 / seconds, 2) if seconds else None
+    return result
+
+
+def bench_file(importer: DatabaseImporter, table: str, path: str, write: bool,
+               hash_sample: int) -> Dict[str, Any]:
+    """Run one CSV file through the import stages and time each of them."""
+    ID_REGISTRY.clear()
+    stream = CsvStream(path)
+    fieldnames = tuple(stream.fieldnames)
+    formats = stream.timestamp_formats(table)
+    converter = compile_converter(table, fieldnames, formats)
+    columns = converter.columns
+    staging = StagingCache(f"{path}.cache", 'bench', converter)
+    staging.begin()
+    seconds = dict.fromkeys(BENCH_STAGES, 0.0)
+    rows = failed = stored = hashed = 0
+    hash_budget = hash_sample if table == 'users' and 'password' in columns and HAS_BCRYPT else 0
+
+    if write:
+        importer.cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(table)))
+        importer.conn.commit()
+
+    shards = _chunked(enumerate(stream.records(), start=1), COPY_CHUNK_SIZE)
+    while True:
+        started = time.perf_counter()
+        shard = next(shards, None)
+        read_done = time.perf_counter()
+        seconds['read'] += read_done - started
+        if shard is None:
+            break
+
+        casted, errors = cast_shard(table, fieldnames, shard, formats)
+        seconds['cast'] += time.perf_counter() - read_done
+        rows += len(shard)
+        failed += len(errors)
+        staging.add(casted, errors, (shard[-1][0], stream.offset), shard[0][0])
+
+        if hashed < hash_budget:
+            sample = casted[:hash_budget - hashed]
+            started = time.perf_counter()
+            importer._finish_shard(table, columns, importer._prepare_shard(table, columns, sample))
+            seconds['hash'] += time.perf_counter() - started
+            hashed += len(sample)
+
+        if write:
+            started = time.perf_counter()
+            stored += importer.write_shard(table, columns, casted, errors, importer.use_copy)
+            seconds['write'] += time.perf_counter() - started
+
+    staging.commit()
+    started = time.perf_counter()
+    cached = sum(len(casted) + len(errors) for _, casted, errors, _ in staging.shards())
+    seconds['cached'] = time.perf_counter() - started
+    os.remove(staging.path)
+
+    size = os.path.getsize(path)
+    stages = {
+        'read': _stage(seconds['read'], rows, size),
+        'cast': _stage(seconds['cast'], rows),
+        'cached': _stage(seconds['cached'], cached),
+    }
+    if hashed:
+        stages['hash'] = _stage(seconds['hash'], hashed)
+    if write:
+        stages['write'] = _stage(seconds['write'], stored)
+    return {
+        'table': table,
+        'rows': rows,
+        'bytes': size,
+        'encoding': stream.encoding,
+        'delimiter': stream.delimiter,
+        'failed_rows': failed,
+        'stages': stages,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Print the throughput change of every stage against an earlier results file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['table'], r['variant'], r['rows']): r for r in baseline.get('results', [])}
+    print(f"\n📈 Change in rows/s against {baseline_path}:")
+    for result in results:
+        old = previous.get((result['table'], result['variant'], result['rows']))
+        if not old:
+            continue
+        changes = []
+        for stage, timing in result['stages'].items():
+            before = old['stages'].get(stage, {}).get('rows_per_second')
+            after = timing['rows_per_second']
+            if before and after:
+                changes.append(f"{stage} {(after - before) / before:+.1%}")
+        print(f"   {result['table']:<18} {result['variant']:<17} {result['rows']:>9}  {', '.join(changes)}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Benchmark the stages of the CSV import pipeline.')
+    parser.add_argument('--sizes', default='10k',
+                        help=f"comma separated row counts, {'/'.join(BENCH_SIZES)} or integers (default: 10k)")
+    parser.add_argument('--variants', default=','.join(BENCH_VARIANTS),
+                        help=f"comma separated file variants among {', '.join(BENCH_VARIANTS)} (default: all)")
+    parser.add_argument('--tables', default='interventions,users',
+                        help='comma separated tables to benchmark (default: interventions,users)')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'supervision-import-bench'),
+                        help='directory caching the generated CSV files')
+    parser.add_argument('--hash-sample', type=int, default=100,
+                        help='users passwords hashed per file for the hash stage (default: 100)')
+    parser.add_argument('--bcrypt-rounds', type=int, default=BCRYPT_ROUNDS,
+                        help=f'bcrypt cost factor of the hash stage (default: {BCRYPT_ROUNDS})')
+    parser.add_argument('--no-copy', action='store_true',
+                        help='write with batched multi-row INSERTs instead of COPY')
+    parser.add_argument('--no-write', action='store_true',
+                        help='skip the write stage (no database needed)')
+    parser.add_argument('--output', default='import_benchmark.json',
+                        help='JSON results file (default: import_benchmark.json)')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare against')
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main execution function."""
+    args = parse_args()
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    variants = [v.strip() for v in args.variants.split(',') if v.strip()]
+    tables = [t.strip() for t in args.tables.split(',') if t.strip()]
+    for variant in variants:
+        if variant not in BENCH_VARIANTS:
+            sys.exit(f"❌ Unknown variant: {variant}")
+    for table in tables:
+        if table not in SCHEMA:
+            sys.exit(f"❌ Unknown table: {table}")
+    os.makedirs(args.data_dir, exist_ok=True)
+    started = datetime.now()
+
+    importer = DatabaseImporter(DB_CONFIG, use_copy=not args.no_copy, bcrypt_rounds=args.bcrypt_rounds)
+    write = not args.no_write
+    if write:
+        importer.connect()
+        create_bench_schema(importer, tables)
+
+    results = []
+    try:
+        for rows in sizes:
+            for variant in variants:
+                for table in tables:
+                    path = bench_path(args.data_dir, table, rows, variant)
+                    print(f"\n⏱️  {table} - {rows} rows - {variant}")
+                    result = bench_file(importer, table, path, write, args.hash_sample)
+                    result['variant'] = variant
+                    results.append(result)
+                    for stage, timing in result['stages'].items():
+                        print(f"   {stage:<6} {timing['seconds']:>9.3f}s {timing['rows_per_second'] or 0:>12.0f} rows/s")
+    finally:
+        if write:
+            drop_bench_schema(importer)
+        importer.disconnect()
+
+    report = {
+        'started': started.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'copy': not args.no_copy,
+        'bcrypt_rounds': args.bcrypt_rounds,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
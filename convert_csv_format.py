@@ -2,82 +2,162 @@
 """
 Convert CSV files from semicolon-delimited to comma-delimited with UTF-8 encoding.
 This fixes encoding and delimiter issues for the import script.
+
+Files are transcoded row by row into a temporary file that then atomically
+replaces the original, so memory use does not depend on the file size, and
+the files of the directory are converted in parallel. Files already converted
+(or already UTF-8 and comma-delimited) are recorded by fingerprint and skipped
+by later runs.
+
+Usage:
+    python convert_csv_format.py [--workers N] [--force]
 """
 
+import argparse
+import codecs
 import csv
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from csv_utils import CSV_SAMPLE_BYTES, file_fingerprint, sniff_csv
 
 CSV_DIR = 'csv_data'
 
-def convert_csv_file(filename):
-    """Convert a single CSV file from semicolon to comma delimiter with UTF-8 encoding."""
+# Fingerprints of normalised files, kept with the import state of CSV_DIR
+NORMALIZED_MANIFEST = os.path.join('.import_state', 'normalized.json')
+
+def _decoded_lines(f: Any, encoding: str) -> Iterator[str]:
+    # Bytes that are not valid UTF-8 further down a UTF-8 file fall back to cp1252,
+    # and the few bytes cp1252 leaves undefined to latin-1
+    decoder = codecs.getincrementaldecoder(encoding)(errors='cp1252_fallback')
+    for raw in f:
+        yield decoder.decode(raw)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def is_utf8(filepath: Path) -> bool:
+    """Whether the whole file decodes as UTF-8, read in bounded chunks."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(CSV_SAMPLE_BYTES), b''):
+                decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def convert_csv_file(filename: str, known_fingerprint: Optional[str] = None) -> Tuple[bool, str, Optional[str]]:
+    """Convert a single CSV file from semicolon to comma delimiter with UTF-8 encoding.
+
+    Returns (success, message, fingerprint of the normalised file). Files whose
+    fingerprint is `known_fingerprint` are already normalised and left alone.
+    """
     filepath = Path(CSV_DIR) / filename
-    
+
     if not filepath.exists():
-        print(f"⚠️  File not found: {filepath}")
-        return False
-    
-    # Try to read with multiple encodings
-    encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-    rows = None
-    
-    for encoding in encodings:
-        try:
-            with open(filepath, 'r', encoding=encoding) as f:
-                # Detect delimiter
-                first_line = f.readline()
-                f.seek(0)
-                
-                delimiter = ';' if ';' in first_line else ','
-                reader = csv.reader(f, delimiter=delimiter)
-                rows = list(reader)
-                
-                if rows:
-                    print(f"✅ Read {filename} (encoding: {encoding}, delimiter: '{delimiter}')")
-                    break
-        except Exception as e:
-            continue
-    
-    if not rows:
-        print(f"❌ Could not read {filename}")
-        return False
-    
-    # Write back as UTF-8 with comma delimiter
+        return False, f"⚠️  File not found: {filepath}", None
+
+    current = file_fingerprint(filepath)
+    if current == known_fingerprint:
+        return True, f"⏭️  {filename} is already UTF-8 with comma delimiter", current
+
     try:
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f, delimiter=',')
-            writer.writerows(rows)
-        print(f"✅ Converted {filename} to UTF-8 with comma delimiter")
-        return True
+        encoding, delimiter = sniff_csv(filepath)
+    except OSError as e:
+        return False, f"❌ Could not read {filename}: {e}", None
+
+    if encoding == 'utf-8' and delimiter == ',' and is_utf8(filepath):
+        return True, f"⏭️  {filename} is already UTF-8 with comma delimiter", current
+
+    # Write next to the original, then swap it in atomically
+    tmp_path = filepath.with_name(f".{filename}.tmp")
+    rows = 0
+    try:
+        with open(filepath, 'rb') as src, open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+            reader = csv.reader(_decoded_lines(src, encoding), delimiter=delimiter)
+            writer = csv.writer(dst, delimiter=',')
+            for row in reader:
+                writer.writerow(row)
+                rows += 1
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, filepath)
     except Exception as e:
-        print(f"❌ Error writing {filename}: {e}")
-        return False
+        if tmp_path.exists():
+            tmp_path.unlink()
+        return False, f"❌ Error converting {filename}: {e}", None
+
+    return (True, f"✅ Converted {filename} ({encoding}, delimiter '{delimiter}', {rows} rows) "
+                  f"to UTF-8 with comma delimiter", file_fingerprint(filepath))
+
+def load_manifest(path: str) -> Dict[str, str]:
+    """Fingerprints of the files normalised by earlier runs, by file name."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except Exception as e:
+        print(f"⚠️  Could not read {path}: {e}")
+        return {}
+
+def save_manifest(path: str, files: Dict[str, str]) -> None:
+    """Write the manifest atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'files': files}, f, indent=2)
+    os.replace(tmp_path, path)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Convert the CSV files of csv_data/ to UTF-8 with comma delimiter.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='files converted in parallel (default: number of CPUs)')
+    parser.add_argument('--force', action='store_true',
+                        help='check every file again, ignoring the fingerprints of earlier runs')
+    return parser.parse_args(argv)
 
 def main():
     """Convert all CSV files in the csv_data directory."""
+    args = parse_args()
     print("\n" + "="*60)
     print("   CSV FORMAT CONVERTER")
     print("="*60 + "\n")
-    
+
     if not os.path.exists(CSV_DIR):
         print(f"❌ Directory '{CSV_DIR}' not found")
         return
-    
-    csv_files = [f for f in os.listdir(CSV_DIR) if f.endswith('.csv')]
-    
+
+    csv_files = sorted(f for f in os.listdir(CSV_DIR) if f.endswith('.csv'))
+
     if not csv_files:
         print(f"⚠️  No CSV files found in '{CSV_DIR}'")
         return
-    
+
     print(f"Found {len(csv_files)} CSV file(s):\n")
-    
+
+    manifest_path = os.path.join(CSV_DIR, NORMALIZED_MANIFEST)
+    normalized = {} if args.force else load_manifest(manifest_path)
+
     success_count = 0
-    for filename in csv_files:
-        if convert_csv_file(filename):
-            success_count += 1
-        print()
-    
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(csv_files)))) as pool:
+        results = pool.map(convert_csv_file, csv_files, [normalized.get(f) for f in csv_files])
+        for filename, (success, message, fingerprint) in zip(csv_files, results):
+            print(message)
+            if success:
+                success_count += 1
+                normalized[filename] = fingerprint
+            else:
+                normalized.pop(filename, None)
+    save_manifest(manifest_path, normalized)
+
+    print()
     print("="*60)
     print(f"✅ Converted {success_count}/{len(csv_files)} files successfully")
     print("="*60 + "\n")
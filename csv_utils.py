@@ -0,0 +1,107 @@
+"""
+CSV file helpers shared by import_data.py and convert_csv_format.py.
+
+Finding and opening CSV files, plain or compressed (.csv.gz, .csv.zst as
+export_data.py --compress writes them), detecting their encoding and delimiter,
+decoding stray cp1252 bytes of UTF-8 files, and fingerprinting a file's
+content. No database imports, so the converter runs without psycopg2.
+"""
+
+import codecs
+import gzip
+import hashlib
+import io
+import os
+from typing import BinaryIO, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # .csv.zst files then cannot be read
+
+# Bytes read from the start of a CSV file to detect its encoding and delimiter
+CSV_SAMPLE_BYTES = 64 * 1024
+
+# Candidate CSV delimiters, in order of preference
+CSV_DELIMITERS = [',', ';', '\t']
+
+# Suffixes a CSV file may have after its .csv name: none, or its compression
+CSV_COMPRESSED_SUFFIXES = ('', '.gz', '.zst')
+
+def _decode_cp1252_fallback(err: UnicodeDecodeError):
+    """Codec error handler: decode bytes that are not valid UTF-8 as cp1252 (latin-1 if undefined)."""
+    chars = []
+    for b in err.object[err.start:err.end]:
+        try:
+            chars.append(bytes([b]).decode('cp1252'))
+        except UnicodeDecodeError:
+            chars.append(chr(b))
+    return ''.join(chars), err.end
+
+codecs.register_error('cp1252_fallback', _decode_cp1252_fallback)
+
+def find_csv(directory: str, filename: str) -> Optional[str]:
+    """Path of `filename` in `directory`, or of its compressed version (.gz, .zst), if one exists."""
+    for suffix in CSV_COMPRESSED_SUFFIXES:
+        filepath = os.path.join(directory, filename + suffix)
+        if os.path.exists(filepath):
+            return filepath
+    return None
+
+def is_compressed(filepath: str) -> bool:
+    """Whether open_csv() decompresses the file (so it cannot be seeked or read as plain text)."""
+    return os.fspath(filepath).endswith(CSV_COMPRESSED_SUFFIXES[1:])
+
+def open_csv(filepath: str) -> BinaryIO:
+    """Open a CSV file for reading bytes, decompressing it by its suffix.
+    
+    Compressed files are read in one pass: use skip_bytes() rather than seek().
+    """
+    filepath = os.fspath(filepath)
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, 'rb')
+    if filepath.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{filepath} is zstd compressed: pip install zstandard")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), closefd=True)
+        # Buffered for line iteration, which the zstd reader lacks
+        return io.BufferedReader(reader)
+    return open(filepath, 'rb')
+
+def skip_bytes(f: BinaryIO, offset: int) -> None:
+    """Move a file opened by open_csv() to the (decompressed) byte `offset` from its start."""
+    if f.seekable():
+        f.seek(offset)
+        return
+    while offset > 0:
+        chunk = f.read(min(offset, CSV_SAMPLE_BYTES))
+        if not chunk:
+            break
+        offset -= len(chunk)
+
+def sniff_csv(filepath: str) -> Tuple[str, str]:
+    """Detect (encoding, delimiter) of a CSV file from its first CSV_SAMPLE_BYTES bytes."""
+    with open_csv(filepath) as f:
+        sample = f.read(CSV_SAMPLE_BYTES)
+    
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        try:
+            # The sample may end in the middle of a multi-byte character
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'cp1252'
+    
+    header = sample.split(b'\n', 1)[0].decode(encoding, errors='cp1252_fallback')
+    counts = {d: header.count(d) for d in CSV_DELIMITERS}
+    delimiter = max(CSV_DELIMITERS, key=lambda d: counts[d]) if any(counts.values()) else ','
+    return encoding, delimiter
+
+def file_fingerprint(filepath: str) -> str:
+    """Identify a file's content by size, mtime and a hash of its first CSV_SAMPLE_BYTES bytes."""
+    st = os.stat(filepath)
+    with open_csv(filepath) as f:
+        head = hashlib.blake2b(f.read(CSV_SAMPLE_BYTES), digest_size=16).hexdigest()
+    return f"{st.st_size}-{st.st_mtime_ns}-{head}"
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+CSV Data Export Script for Supervision Database
+
+The inverse of import_data.py: every table of IMPORT_ORDER is streamed out of
+PostgreSQL with COPY ... TO STDOUT into one CSV file per table, with the
+columns of the sample templates (SAMPLE_CSVS), so a dump imports back as is.
+
+Usage:
+    python export_data.py [--output DIR] [--tables users,interventions] [--workers N]
+                          [--compress {gzip,zstd}] [--since DATE] [--until DATE]
+
+Tables are exported in parallel, one connection each, all reading the same
+snapshot of the database (exported by a coordinating connection, as pg_dump -j
+does), so the files are consistent with each other even while the database is
+being written to.
+
+Values are written the way the import casts read them: booleans as true/false
+and timestamps as ISO 8601. Rows are never held in memory; COPY streams them
+straight into the (optionally gzip or zstd compressed) file, which replaces the
+previous export of the table once complete.
+
+NULLs of columns the importer defaults when empty are written as null where
+its casts read that back as NULL (booleans and numbers). Empty text columns
+with a default (e.g. intervenants.country) come back with the default.
+
+--since and --until keep the rows of DATE_FILTER_COLUMNS tables (interventions
+by dateRef, audit_logs by createdAt) within a date range; the other tables are
+exported whole, so every reference of the exported rows still resolves on import.
+
+To import a dump, point CSV_DIR at it (or copy the files into csv_data/); the
+importer reads .csv.gz and .csv.zst files as they are.
+
+Prerequisites:
+    pip install psycopg2-binary python-dotenv
+    pip install zstandard  # optional, for --compress zstd
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
+
+from import_data import COLUMN_MAPPINGS, DB_CONFIG, IMPORT_ORDER, SAMPLE_CSVS, SCHEMA
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# Directory the CSV files are written to
+EXPORT_DIR = 'csv_export'
+
+# Tables exported concurrently, one connection each
+EXPORT_WORKERS = 4
+
+# File suffix of each --compress choice
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+# zstd level of --compress zstd (gzip uses its default level)
+ZSTD_LEVEL = 3
+
+# Column of the tables --since/--until filter on; tables nothing references only,
+# so filtering them never leaves a dangling reference
+DATE_FILTER_COLUMNS = {
+    'interventions': 'dateRef',
+    'audit_logs': 'createdAt',
+}
+
+# Column types whose import cast reads 'null' as NULL
+NULL_LITERAL_KINDS = ('bool', 'int', 'number')
+
+# Timestamps are written in the ISO format the importer parses first
+ISO_TIMESTAMP = 'YYYY-MM-DD"T"HH24:MI:SS.US'
+
+
+def export_columns(table: str) -> List[str]:
+    """Columns of a table's CSV file: the header of its sample template, else its SCHEMA columns."""
+    template = SAMPLE_CSVS.get(f"{table}.csv")
+    return list(template[0]) if template else list(SCHEMA.get(table, {}))
+
+
+def _column_expression(table: str, col: str) -> sql.Composable:
+    """SELECT expression writing a column the way the import casts read it back."""
+    kind = SCHEMA.get(table, {}).get(col, 'string').rstrip('?')
+    column = sql.Identifier(col)
+    if kind == 'bool':
+        # COPY writes booleans as t/f, which the import does not read
+        expression = sql.SQL("{}::text").format(column)
+    elif kind == 'timestamp':
+        expression = sql.SQL("to_char({}, {})").format(column, sql.Literal(ISO_TIMESTAMP))
+    else:
+        expression = column
+    # The import fills empty values of columns with a default, so NULLs are spelled out
+    if col in COLUMN_MAPPINGS.get(table, {}).get('defaults', {}) and kind in NULL_LITERAL_KINDS:
+        expression = sql.SQL("COALESCE({}::text, 'null')").format(expression)
+    return expression
+
+
+def export_query(table: str, columns: Sequence[str], since: Optional[date] = None,
+                 until: Optional[date] = None) -> sql.Composable:
+    """COPY ... TO STDOUT statement of a table, filtered on its DATE_FILTER_COLUMNS column if given a range."""
+    conditions = []
+    date_column = DATE_FILTER_COLUMNS.get(table)
+    if date_column and since:
+        conditions.append(sql.SQL("{} >= {}").format(sql.Identifier(date_column), sql.Literal(since)))
+    if date_column and until:
+        # --until is inclusive: the whole day counts
+        conditions.append(sql.SQL("{} < {}::date + 1").format(sql.Identifier(date_column), sql.Literal(until)))
+    where = sql.SQL(" WHERE {}").format(sql.SQL(' AND ').join(conditions)) if conditions else sql.SQL('')
+    select = sql.SQL("SELECT {} FROM {}{}").format(
+        sql.SQL(', ').join(sql.SQL("{} AS {}").format(_column_expression(table, col), sql.Identifier(col))
+                           for col in columns),
+        sql.Identifier(table), where)
+    return sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER, ENCODING 'UTF8')").format(select)
+
+
+def _open_output(path: str, compress: Optional[str]) -> Any:
+    """Binary file object writing (and compressing) to `path`."""
+    if compress == 'gzip':
+        return gzip.open(path, 'wb')
+    if compress == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, 'wb'), closefd=True)
+    return open(path, 'wb')
+
+
+def export_table(table: str, output_dir: str, snapshot: Optional[str] = None, compress: Optional[str] = None,
+                 since: Optional[date] = None, until: Optional[date] = None) -> Tuple[bool, str, int]:
+    """Stream one table into its CSV file. Returns (success, message, rows written).
+
+    With a `snapshot` (from pg_export_snapshot()), the table is read as of that snapshot.
+    """
+    columns = export_columns(table)
+    path = os.path.join(output_dir, f"{table}.csv{COMPRESSIONS.get(compress, '')}")
+    tmp_path = os.path.join(output_dir, f".{os.path.basename(path)}.tmp")
+    started = time.perf_counter()
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except Exception as e:
+        return False, f"❌ {table}: database connection failed: {e}", 0
+    try:
+        conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+        with conn.cursor() as cur:
+            if snapshot:
+                cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+            cur.execute("""
+                SELECT attname FROM pg_attribute
+                WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+            """, (sql.Identifier(table).as_string(conn),))
+            existing = {name for name, in cur.fetchall()}
+            missing = [col for col in columns if col not in existing]
+            if missing:
+                print(f"⚠️  {table}: no column {', '.join(missing)} in the database, left out of the export")
+                columns = [col for col in columns if col in existing]
+            with _open_output(tmp_path, compress) as f:
+                cur.copy_expert(export_query(table, columns, since, until), f)
+            rows = cur.rowcount
+        conn.rollback()
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False, f"❌ Error exporting {table}: {e}", 0
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(path)
+    return True, f"✅ Exported {rows} rows of {table} to {path} ({size / 1e6:.1f} MB) in {elapsed:.2f}s", rows
+
+
+def export_all(tables: Sequence[str], output_dir: str, workers: int = EXPORT_WORKERS,
+               compress: Optional[str] = None, since: Optional[date] = None,
+               until: Optional[date] = None) -> List[str]:
+    """Export `tables` concurrently from one snapshot. Returns the tables whose export failed."""
+    os.makedirs(output_dir, exist_ok=True)
+    # The coordinating transaction must stay open while the workers import its snapshot
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_export_snapshot()")
+            snapshot = cur.fetchone()[0]
+
+        failed = []
+        total_rows = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tables)))) as pool:
+            results = pool.map(lambda table: export_table(table, output_dir, snapshot, compress, since, until),
+                               tables)
+            for table, (success, message, rows) in zip(tables, results):
+                print(message)
+                if success:
+                    total_rows += rows
+                else:
+                    failed.append(table)
+    finally:
+        conn.rollback()
+        conn.close()
+    print(f"\n📦 {total_rows} rows exported from {len(tables) - len(failed)}/{len(tables)} tables")
+    return failed
+
+
+def _parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Export the Supervision database to CSV files the importer reads.')
+    parser.add_argument('--output', default=EXPORT_DIR,
+                        help=f'directory the CSV files are written to (default: {EXPORT_DIR})')
+    parser.add_argument('--tables', default=','.join(IMPORT_ORDER),
+                        help='comma-separated tables to export (default: all of IMPORT_ORDER)')
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS,
+                        help=f'tables exported in parallel (default: {EXPORT_WORKERS})')
+    parser.add_argument('--compress', choices=sorted(COMPRESSIONS),
+                        help='compress the files with gzip (.csv.gz) or zstd (.csv.zst)')
+    parser.add_argument('--since', type=_parse_date,
+                        help='only rows of interventions (dateRef) and audit_logs (createdAt) from this date on')
+    parser.add_argument('--until', type=_parse_date,
+                        help='only rows of interventions (dateRef) and audit_logs (createdAt) up to this date')
+    args = parser.parse_args(argv)
+    args.tables = [t.strip() for t in args.tables.split(',') if t.strip()]
+    unknown = [t for t in args.tables if t not in IMPORT_ORDER]
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(unknown)}")
+    if args.compress == 'zstd' and not HAS_ZSTD:
+        parser.error("--compress zstd needs the zstandard package (pip install zstandard)")
+    return args
+
+
+def main():
+    """Export every table to CSV."""
+    args = parse_args()
+    print("\n" + "="*60)
+    print("   SUPERVISION DATABASE - CSV EXPORT TOOL")
+    print("="*60 + "\n")
+
+    # Keep the import order, so a partial export still lists parents first
+    tables = [t for t in IMPORT_ORDER if t in args.tables]
+    try:
+        failed = export_all(tables, args.output, args.workers, args.compress, args.since, args.until)
+    except Exception as e:
+        print(f"❌ Export failed: {e}")
+        sys.exit(1)
+    if failed:
+        print(f"❌ Export of {', '.join(failed)} failed")
+        sys.exit(1)
+
+    print("="*60 + "\n")
+
+
+if __name__ == '__main__':
+    main()
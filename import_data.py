@@ -6,44 +6,148 @@ This script imports data from CSV files into the PostgreSQL database.
 It supports all tables in the system and handles relationships properly.
 
 Usage:
-    python import_data.py
+    python import_data.py [--no-copy] [--batch-size N] [--workers N] [--shard-workers N]
+                          [--bcrypt-rounds N] [--incremental [--prune]] [--resume] [--no-cache]
+                          [--defer-indexes] [--server-cast] [--orphans {reject,null}]
+                          [--dedup {first,last}] [--rejects DIR] [--async]
+                          [--profile {bulk,online}] [--replace-partitions]
+    python import_data.py [...] [--report run.json] [--prometheus import.prom]
+    python import_data.py --dry-run
+
+Rows are bulk loaded with COPY by default, or with batched multi-row INSERTs
+(--no-copy). Each batch runs inside a SAVEPOINT, so a bad row only costs itself,
+not the whole table. Plain text passwords in users.csv are bcrypt-hashed in a
+thread pool while earlier rows are being written.
+
+With --incremental, a fingerprint of every imported row is kept in
+csv_data/.import_state/manifest.json and later runs only upsert the rows that
+are new or changed (--prune also deletes rows whose id left the CSV file).
+Rows without an id are recognised by their content, so they are stored once.
+
+Progress is checkpointed after every committed shard; if an import dies,
+--resume continues it right after the last committed shard of each table.
+Tables that do not depend on each other are imported concurrently, and with
+--shard-workers each table is split into row shards cast and written in parallel.
+
+--async loads each table through an asyncio pipeline instead: a reader, a
+process pool casting shards and writers on a pool of connections (asyncpg if
+installed), joined by bounded queues so parsing and casting overlap with the
+database round trips while memory stays capped.
+
+Foreign keys are checked before rows are written, against in-memory sets of
+the ids of the referenced tables: rows referencing a missing row fail up front
+(--orphans null clears the reference and keeps the row instead).
+
+--dedup drops rows repeating the natural key of another row of their table
+(DEDUP_KEYS, e.g. type, value and parentId of predefined values), keeping the
+first or the last one of each group, and rewrites the references to dropped
+rows (in the table and in those imported after it) to the kept row.
+
+Rows that cannot be imported are written to one JSON Lines file per table in
+csv_data/.import_state/rejects/ (--rejects DIR), with their CSV line, raw
+values, error class and message; summary.json counts them per error class.
+The console only shows the first few rejects of each table.
+
+When audit_logs is RANGE partitioned by createdAt in the database, its rows are
+routed by month straight into their partitions (audit_logs_YYYY_MM, created
+when missing), each loaded by its own COPY stream in parallel.
+--replace-partitions loads every month of the file into a new table and swaps
+it in for the month's partition (DETACH, then ATTACH), replacing that window.
+
+--profile picks the session settings of every connection of the load from
+LOAD_PROFILES and opens them from one shared pool: bulk turns synchronous_commit
+off and raises maintenance_work_mem for fast reloads; online sets statement and
+lock timeouts and lowers the concurrency to fit in two connections.
+
+--defer-indexes drops the secondary indexes and foreign keys of the tables for
+the duration of the load (their definitions are saved first), then rebuilds
+them in parallel and ANALYZEs the tables.
+
+--server-cast moves parsing and casting into PostgreSQL: each CSV file is
+copied as text into an UNLOGGED staging table and inserted into its table by a
+single INSERT ... SELECT that casts with SQL versions of the import casts.
+users (whose passwords are hashed in Python), incremental and resumed imports,
+compressed files and any table whose set-based load fails, are imported the
+usual way.
+
+The casted rows of each CSV file are saved in a columnar staging cache
+(csv_data/.import_state/cache/); importing the same file again reads them from
+there instead of parsing and casting the CSV (--no-cache disables it). Tables
+with passwords (users) are never cached, so no plaintext password is written.
+
+Every run is timed per table and per stage (read, dedup, cast, check, hash,
+write, commit, swap, reset_sequence); --report and --prometheus export the timings, rows/s, bytes/s,
+failed rows and peak RSS as JSON and as a Prometheus textfile.
+
+--dry-run checks the CSV files without a database: every value goes through the
+import casts and per-column success/null rates, dropped headers and sample
+failures are printed. It exits with status 1 if anything would be lost.
 
 Prerequisites:
     pip install psycopg2-binary python-dotenv bcrypt
+    pip install asyncpg  # optional, connections of the --async pipeline
+    pip install zstandard  # optional, to read .csv.zst files
 
 CSV File Requirements:
     - Place CSV files in the 'csv_data' directory
     - File names should match table names (e.g., 'users.csv', 'predefined_values.csv')
     - First row must contain column headers matching database column names
-    - Use UTF-8 encoding
+    - UTF-8 is preferred; cp1252 exports and ',', ';' or tab delimiters are detected automatically
+    - Files may be gzip or zstd compressed ('users.csv.gz', 'users.csv.zst', as export_data.py writes them)
 """
 
+import argparse
+import asyncio
 import csv
+import functools
+import hashlib
+import io
+import itertools
+import mmap
 import os
-import time
+import struct
+import re
 import sys
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Set, Tuple
 import json
 import uuid
 import psycopg2
 from psycopg2 import sql
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from psycopg2.extensions import connection, cursor
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
+
+from csv_utils import file_fingerprint, find_csv, is_compressed, open_csv, skip_bytes, sniff_csv
 try:
     import bcrypt
     HAS_BCRYPT = True
 except ImportError:
     HAS_BCRYPT = False
     print("⚠️  Warning: bcrypt not installed. Passwords will be stored as-is. Install with: pip install bcrypt")
+try:
+    import asyncpg
+    HAS_ASYNCPG = True
+except ImportError:
+    HAS_ASYNCPG = False  # --async then writes over psycopg2 connections driven from worker threads
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows; peak RSS is then not reported
 
 # Load environment variables
 load_dotenv()
 
 # Database configuration (support both DATABASE_* and legacy DB_* variable names)
 DB_CONFIG = {
-    'host': 'localhost',#os.getenv('DATABASE_HOST') or os.getenv('DB_HOST', 'localhost'),
-    'port': '5432',#int(os.getenv('DATABASE_PORT') or os.getenv('DB_PORT', '4201')),
+    'host': os.getenv('DATABASE_HOST') or os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DATABASE_PORT') or os.getenv('DB_PORT', '5432')),
     'database': os.getenv('DATABASE_NAME') or os.getenv('DB_NAME', 'supervision_maintenance'),
     'user': os.getenv('DATABASE_USER') or os.getenv('DB_USER', 'supervision_user'),
     'password': os.getenv('DATABASE_PASSWORD') or os.getenv('DB_PASSWORD', 'supervision_password')
@@ -52,6 +156,12 @@ DB_CONFIG = {
 # CSV data directory
 CSV_DIR = 'csv_data'
 
+# Directory (inside CSV_DIR) holding state kept between import runs
+STATE_DIR = '.import_state'
+
+# Foreign key values whose UUID IdRegistry keeps memoized
+ID_CACHE_SIZE = 64 * 1024
+
 # Table import order (respects foreign key dependencies)
 IMPORT_ORDER = [
     'users',
@@ -62,6 +172,104 @@ IMPORT_ORDER = [
     'audit_logs'
 ]
 
+# Table referenced by each foreign key column (the *Id uuid columns of SCHEMA)
+FOREIGN_KEYS = {
+    'companyId': 'companies',
+    'parentId': 'predefined_values',
+    'createdById': 'users',
+    'updatedById': 'users',
+    'userId': 'users',
+}
+
+# Tables imported concurrently (one connection each) once their parents are committed
+IMPORT_WORKERS = 3
+
+# Processes casting (and connections writing) shards of a single table; 1 disables sharding
+SHARD_WORKERS = 1
+
+# Session settings of the connections of a load (--profile), and the most connections it may open.
+# bulk trades durability of the last commits for speed (a crash may lose them, never corrupts);
+# online keeps incremental loads on a live database short and on few connections
+LOAD_PROFILES = {
+    'bulk': {
+        'settings': {
+            'synchronous_commit': 'off',
+            'maintenance_work_mem': '1GB',
+            'work_mem': '64MB',
+            'statement_timeout': '0',
+            'lock_timeout': '0',
+        },
+        'max_connections': None,
+    },
+    'online': {
+        'settings': {
+            'synchronous_commit': 'on',
+            'maintenance_work_mem': '64MB',
+            'statement_timeout': '60s',
+            'lock_timeout': '5s',
+            'idle_in_transaction_session_timeout': '5min',
+        },
+        'max_connections': 2,
+    },
+}
+
+# Column by whose month the rows of a table are routed into partitions, when the table is
+# RANGE partitioned on it in the database (one partition per month, named <table>_YYYY_MM)
+PARTITION_KEYS = {
+    'audit_logs': 'createdAt',
+}
+
+# Connections COPYing into the partitions of a table at once, when --shard-workers is not given
+PARTITION_WORKERS = 4
+
+# Writers of the --async pipeline when --shard-workers is not given
+PIPELINE_WRITERS = 2
+
+# Casted shards queued per writer of the --async pipeline before the reader waits
+PIPELINE_QUEUE_DEPTH = 2
+
+# Rows sent per COPY statement in bulk load mode
+COPY_CHUNK_SIZE = 5000
+
+# Default rows per multi-row INSERT when COPY is not used
+INSERT_BATCH_SIZE = 1000
+
+# bcrypt cost factor used to hash plain text passwords of users.csv
+BCRYPT_ROUNDS = 12
+
+# Threads hashing passwords ahead of insertion (bcrypt releases the GIL)
+HASH_WORKERS = os.cpu_count() or 4
+
+# Bump when the layout of staging cache files changes
+STAGING_CACHE_VERSION = 3
+
+# Prefix of the metric names written to the Prometheus textfile
+METRICS_PREFIX = 'supervision_import'
+
+# Failing values kept per column by a dry run
+DRY_RUN_SAMPLES = 5
+
+# What to do with rows whose foreign key references a missing row: fail the row,
+# or clear the reference and import it
+ORPHAN_POLICIES = ('reject', 'null')
+
+# Natural key of the tables deduplicated by --dedup (rows repeating the key of another row are dropped)
+DEDUP_KEYS = {
+    'users': ('email',),
+    # Equipments of different centrales may share a name
+    'predefined_values': ('type', 'value', 'parentId'),
+    'companies': ('name',),
+    'intervenants': ('name', 'surname', 'companyId'),
+}
+
+# Which row of a group of duplicates --dedup keeps
+DEDUP_POLICIES = ('first', 'last')
+
+# Rejected rows printed per table before the console only gets running counts,
+# printed at most every REJECT_CONSOLE_INTERVAL seconds
+REJECT_CONSOLE_ROWS = 10
+REJECT_CONSOLE_INTERVAL = 5.0
+
 # Column mappings and transformations
 # Note: If 'id' is provided in CSV, it will be used. Otherwise, auto-generated.
 COLUMN_MAPPINGS = {
@@ -225,6 +433,23 @@ SCHEMA: Dict[str, Dict[str, str]] = {
     },
 }
 
+def table_dependencies(tables: Sequence[str] = IMPORT_ORDER) -> Dict[str, Set[str]]:
+    """Build the import dependency graph: table -> parent tables referenced by its *Id uuid columns.
+    
+    Self references (predefined_values.parentId) and tables outside `tables` are ignored.
+    """
+    deps: Dict[str, Set[str]] = {}
+    for table in tables:
+        parents = set()
+        for col, kind in SCHEMA.get(table, {}).items():
+            if kind.rstrip('?') != 'uuid' or not col.endswith('Id'):
+                continue
+            parent = FOREIGN_KEYS.get(col)
+            if parent and parent != table and parent in tables:
+                parents.add(parent)
+        deps[table] = parents
+    return deps
+
 PREDEFINED_TYPES = {
     'centrale',
     'equipement',
@@ -261,23 +486,108 @@ def _to_int(v: Any) -> Optional[int]:
     except Exception:
         return None
 
-def _to_timestamp(v: Any) -> Optional[str]:
-    """Return ISO string acceptable by PostgreSQL if possible, else None."""
-    if v in (None, ''):
-        return None
-    if isinstance(v, (int, float)):
-        # treat as epoch seconds
-        try:
-            return datetime.fromtimestamp(float(v)).isoformat()
-        except Exception:
+# Date with numeric day and month, e.g. 11/05/2023 12:45 (also with '.' or '-', 'h' or seconds)
+_NUMERIC_DATE_RE = re.compile(
+    r'\s*(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})(?:[ T]+(\d{1,2})[:hH](\d{2})(?::(\d{2})(?:[.,](\d{1,6}))?)?)?\s*$')
+
+def _parse_iso(s: str) -> datetime:
+    s = s.strip()
+    if s.endswith('Z'):
+        s = s[:-1] + '+00:00'
+    return datetime.fromisoformat(s)
+
+def _numeric_date_parser(day_first: bool) -> Callable[[str], datetime]:
+    def parse(s: str) -> datetime:
+        m = _NUMERIC_DATE_RE.match(s)
+        if not m:
+            raise ValueError(f"Invalid timestamp: {s}")
+        a, b, year, hour, minute, second, fraction = m.groups()
+        day, month = (a, b) if day_first else (b, a)
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+                        int(second or 0), int((fraction or '0').ljust(6, '0')))
+    return parse
+
+# Timestamp formats, in order of preference when inferring the format of a column
+TIMESTAMP_PARSERS: Dict[str, Callable[[str], datetime]] = {
+    'iso': _parse_iso,
+    'day-first': _numeric_date_parser(day_first=True),      # dd/mm/yyyy hh:mm, French exports
+    'month-first': _numeric_date_parser(day_first=False),   # mm/dd/yyyy hh:mm
+}
+
+# Values sampled per timestamp column to infer its format
+TIMESTAMP_SAMPLE_ROWS = 1000
+
+# Distinct values remembered per timestamp column (dates repeat a lot, e.g. dateRef)
+TIMESTAMP_CACHE_SIZE = 100_000
+
+def infer_timestamp_format(values: Iterable[Any]) -> Optional[str]:
+    """Name of the first TIMESTAMP_PARSERS format that parses the most of the non-empty `values`."""
+    sample = [str(v) for v in values if v not in (None, '')]
+    best, best_count = None, 0
+    for name, parse in TIMESTAMP_PARSERS.items():
+        count = 0
+        for s in sample:
+            try:
+                parse(s)
+                count += 1
+            except ValueError:
+                pass
+        if count > best_count:
+            best, best_count = name, count
+        if count == len(sample):
+            break
+    return best
+
+
+class TimestampParser:
+    """Casts the values of one timestamp column to datetime, with a format inferred up front.
+    
+    Values are parsed with the column's format, or as ISO 8601 (what exports and
+    defaults write); without a format, every TIMESTAMP_PARSERS format is tried.
+    Any other value fails the row rather than being read with another
+    convention than the rest of the column. Parsed values are memoized.
+    """
+    
+    def __init__(self, fmt: Optional[str] = None):
+        self.fmt = fmt
+        if fmt:
+            self._parsers = [TIMESTAMP_PARSERS[name] for name in dict.fromkeys([fmt, 'iso'])]
+        else:
+            self._parsers = list(TIMESTAMP_PARSERS.values())
+        self._cache: Dict[str, Any] = {}
+    
+    def __call__(self, v: Any) -> Any:
+        if v in (None, ''):
             return None
-    s = str(v).strip()
-    # Accept already ISO-like strings
-    try:
-        # Python 3.11: fromisoformat handles most cases
-        return datetime.fromisoformat(s.replace('Z', '+00:00')).isoformat()
-    except Exception:
-        return s  # let DB try; better than dropping
+        if isinstance(v, datetime):
+            return v
+        if isinstance(v, (int, float)):
+            # treat as epoch seconds
+            try:
+                return datetime.fromtimestamp(float(v))
+            except Exception:
+                return None
+        cached = self._cache.get(v)
+        if cached is not None:
+            return cached
+        value = self._parse(str(v))
+        if len(self._cache) < TIMESTAMP_CACHE_SIZE:
+            self._cache[v] = value
+        return value
+    
+    def _parse(self, s: str) -> datetime:
+        for parse in self._parsers:
+            try:
+                return parse(s)
+            except ValueError:
+                continue
+        raise ValueError(f"Invalid timestamp: {s}" + (f" (the column has {self.fmt} dates)" if self.fmt else ''))
+
+_ANY_TIMESTAMP = TimestampParser()
+
+def _to_timestamp(v: Any) -> Any:
+    """Return a datetime if the value parses with any TIMESTAMP_PARSERS format; fails otherwise."""
+    return _ANY_TIMESTAMP(v)
 
 def _to_json_text_array(v: Any) -> Optional[str]:
     """Ensure value is serialized JSON array as text."""
@@ -311,272 +621,3046 @@ def _to_jsonb(v: Any) -> Optional[str]:
         # store as a string field inside JSON
         return json.dumps({'value': s}, ensure_ascii=False)
 
-def _int_to_uuid(value: Any, namespace: str = 'supervision') -> str:
-    """Convert an integer ID to a deterministic UUID v5."""
-    if value in (None, '', 'null'):
-        return None
+_UUID_RE = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+
+
+class IdRegistry:
+    """Maps legacy ids to deterministic UUID v5, shared by all tables.
     
-    # If already a valid UUID, return as-is
-    s = str(value).strip()
-    if '-' in s:
-        try:
-            uuid.UUID(s)  # Validate
-            return s
-        except Exception:
-            pass
+    The namespace UUID is derived once. Foreign key values repeat in every row
+    referencing the same parent, so resolve() memoizes them in an LRU of
+    ID_CACHE_SIZE values; primary keys are unique, so derive() resolves them
+    without a cache. Being deterministic, nothing needs to be kept between runs.
+    """
+    
+    def __init__(self, namespace: str = 'supervision', cache_size: int = ID_CACHE_SIZE):
+        self.namespace = namespace
+        self.namespace_uuid = uuid.uuid5(uuid.NAMESPACE_DNS, namespace)
+        self.resolve: Callable[[Any], Optional[str]] = functools.lru_cache(maxsize=cache_size)(self.derive)
     
-    # Convert integer to UUID using namespace
-    # This ensures same integer always maps to same UUID
-    namespace_uuid = uuid.uuid5(uuid.NAMESPACE_DNS, namespace)
-    return str(uuid.uuid5(namespace_uuid, str(value)))
+    def __len__(self) -> int:
+        return self.resolve.cache_info().currsize
+    
+    def clear(self) -> None:
+        """Forget every memoized value."""
+        self.resolve.cache_clear()
+    
+    def derive(self, value: Any) -> Optional[str]:
+        """Return the UUID for a cell value: valid UUIDs as-is, anything else via uuid5."""
+        if value in (None, '', 'null'):
+            return None
+        key = value if isinstance(value, str) else str(value)
+        
+        # If already a valid UUID, return as-is
+        s = key.strip()
+        if '-' in s:
+            if _UUID_RE.fullmatch(s):
+                return s
+            try:
+                uuid.UUID(s)  # Validate
+                return s
+            except Exception:
+                pass
+        # This ensures same integer always maps to same UUID
+        return str(uuid.uuid5(self.namespace_uuid, key))
 
+# Registry used for every uuid column during import
+ID_REGISTRY = IdRegistry()
 
-class DatabaseImporter:
-    """Handles CSV import into PostgreSQL database."""
+
+class FingerprintManifest:
+    """Fingerprint of every row imported so far, per table and id, for incremental imports.
     
-    def __init__(self, config: Dict[str, Any]):
-        """Initialize the importer with database configuration."""
-        self.config = config
-        self.conn: Optional[connection] = None
-        self.cur: Optional[cursor] = None
-        
-    def connect(self) -> None:
-        """Establish database connection."""
+    Rows without an id are known by their content instead: how many rows of each
+    content fingerprint were stored. Each of them matches one row of a later run,
+    so a row repeated in the file is stored as many times as it appears.
+    """
+    
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, str]] = {}
+        # Per table and content fingerprint: rows without an id stored by earlier runs,
+        # and the ones stored and matched by this run
+        self.contents: Dict[str, Dict[str, int]] = {}
+        self._stored: Dict[str, Dict[str, int]] = {}
+        self._matched: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+    
+    def table(self, table: str) -> Dict[str, str]:
+        with self._lock:
+            return self.tables.setdefault(table, {})
+    
+    def match_content(self, table: str, fp: str) -> bool:
+        """Whether a row without an id and this content was stored by an earlier run and not matched yet."""
+        with self._lock:
+            matched = self._matched.setdefault(table, {})
+            if matched.get(fp, 0) < self.contents.get(table, {}).get(fp, 0):
+                matched[fp] = matched.get(fp, 0) + 1
+                return True
+            return False
+    
+    def add_content(self, table: str, fp: str) -> None:
+        """Record that a row without an id and this content was stored."""
+        with self._lock:
+            stored = self._stored.setdefault(table, {})
+            stored[fp] = stored.get(fp, 0) + 1
+    
+    def clear(self) -> None:
+        """Forget every row, once the tables were emptied."""
+        with self._lock:
+            self.tables = {}
+            self.contents = {}
+            self._stored = {}
+            self._matched = {}
+    
+    def load(self, path: str) -> None:
+        """Load a manifest saved by save(), if any."""
+        if not os.path.exists(path):
+            return
         try:
-            self.conn = psycopg2.connect(**self.config)
-            self.cur = self.conn.cursor()
-            print(f"✅ Connected to database: {self.config['database']}")
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.tables = data.get('tables', {})
+            self.contents = data.get('contents', {})
         except Exception as e:
-            print(f"❌ Database connection failed: {e}")
-            sys.exit(1)
+            print(f"⚠️  Could not read import manifest {path}: {e}")
     
-    def disconnect(self) -> None:
-        """Close database connection."""
-        if self.cur:
-            self.cur.close()
-        if self.conn:
-            self.conn.close()
-            print("✅ Database connection closed")
+    def save(self, path: str) -> None:
+        """Write the manifest atomically."""
+        with self._lock:
+            for table, stored in self._stored.items():
+                contents = self.contents.setdefault(table, {})
+                for fp, count in stored.items():
+                    contents[fp] = contents.get(fp, 0) + count
+            self._stored = {}
+            self._matched = {}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'tables': self.tables, 'contents': self.contents}, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+class ImportCheckpoint:
+    """Durable progress of an import, saved after every committed shard.
     
-    def read_csv(self, filename: str) -> List[Dict[str, Any]]:
-        """Read CSV file and return list of rows as dictionaries."""
-        filepath = os.path.join(CSV_DIR, filename)
-        
-        if not os.path.exists(filepath):
-            print(f"⚠️  File not found: {filepath}")
-            return []
-        
-        # Try multiple encodings and delimiters
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        delimiters = [',', ';', '\t']
-        
-        for encoding in encodings:
-            for delimiter in delimiters:
-                try:
-                    with open(filepath, 'r', encoding=encoding) as f:
-                        # Read first line to detect delimiter
-                        first_line = f.readline()
-                        f.seek(0)
-                        
-                        # Auto-detect delimiter from first line
-                        if delimiter in first_line:
-                            reader = csv.DictReader(f, delimiter=delimiter)
-                            rows = list(reader)
-                            if rows:  # Successfully read data
-                                print(f"📄 Read {len(rows)} rows from {filename} (encoding: {encoding}, delimiter: '{delimiter}')")
-                                return rows
-                except Exception:
-                    continue
-        
-        print(f"❌ Error reading {filename}: Could not parse with any encoding/delimiter combination")
-        return []
+    For each table it records the file fingerprint, how many CSV rows are
+    committed, the byte offset just past them and the rows stored so far, so an
+    interrupted import can resume right after the last committed shard.
     
-    def prepare_row(self, row: Dict[str, Any], table: str) -> Dict[str, Any]:
-        """Prepare row data for insertion: whitelist columns, apply defaults, cast values."""
-        mapping = COLUMN_MAPPINGS.get(table, {})
-        skip_columns = mapping.get('skip_columns', [])
-        defaults = mapping.get('defaults', {})
-        schema = SCHEMA.get(table, {})
+    Tables loaded into monthly partitions commit out of file order, so they also
+    record the progress of each month (see DatabaseImporter._load_partitioned()).
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def load(self) -> None:
+        """Load the checkpoint left by an interrupted run, if any."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.tables = json.load(f).get('tables', {})
+        except Exception as e:
+            print(f"⚠️  Could not read checkpoint {self.path}: {e}")
+    
+    def get(self, table: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Progress of a table, unless its CSV file changed since it was recorded."""
+        entry = self.tables.get(table)
+        if entry and entry.get('fingerprint') == fingerprint:
+            return entry
+        return None
+    
+    def update(self, table: str, fingerprint: str, rows: int, offset: int,
+               stored: int, done: bool = False, partitions: Optional[Dict[str, Any]] = None) -> None:
+        """Record the progress of a table and flush the checkpoint to disk."""
+        with self._lock:
+            self.tables[table] = {
+                'fingerprint': fingerprint,
+                'rows': rows,
+                'offset': offset,
+                'stored': stored,
+                'done': done,
+            }
+            if partitions is not None:
+                self.tables[table]['partitions'] = partitions
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'tables': self.tables}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+    
+    def clear(self) -> None:
+        """Forget all progress, once an import completed."""
+        self.tables = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
 
-        # Start with filtered row (drop unknown columns and skipped ones)
-        filtered: Dict[str, Any] = {}
-        for col, val in row.items():
-            if col in skip_columns:
-                continue
-            if col not in schema:
+class ReferenceCheck:
+    """Checks the foreign keys of a table's casted rows against in-memory hash sets of ids.
+    
+    Every FOREIGN_KEYS column of the table is looked up in the set of ids of the
+    table it references, so orphan references are caught before the rows are
+    written instead of by a failed INSERT each. With policy 'null' the orphan
+    reference is cleared and the row kept; otherwise the row fails.
+    """
+    
+    def __init__(self, table: str, columns: Sequence[str], ids: Dict[str, Set[str]], policy: str = 'reject'):
+        self.table = table
+        self.policy = policy
+        self.ids = ids
+        self.columns = [(i, col, FOREIGN_KEYS[col]) for i, col in enumerate(columns)
+                        if FOREIGN_KEYS.get(col) in ids]
+    
+    def __call__(self, rows: List[Tuple[int, Tuple[Any, ...]]]
+                 ) -> Tuple[List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]], int]:
+        """Return the rows that passed (orphan references cleared with policy 'null'), the
+        (row number, error) of the rows that failed and the number of cleared references."""
+        checked = []
+        rejected = []
+        cleared = 0
+        for idx, row in rows:
+            for i, col, parent in self.columns:
+                value = row[i]
+                if value is None or value.lower() in self.ids[parent]:
+                    continue
+                if self.policy == 'null':
+                    row = row[:i] + (None,) + row[i + 1:]
+                    cleared += 1
+                    continue
+                rejected.append((idx, f"{col} references a missing {parent} row: {value}"))
+                break
+            else:
+                checked.append((idx, row))
+        return checked, rejected, cleared
+
+class Deduplicator:
+    """Drops rows repeating the natural key (DEDUP_KEYS) of another row, and rewrites references to them.
+    
+    scan() hashes the casted key of every row of a table's CSV file in one pass,
+    casting only the key columns and the id. References in a key are compared
+    by the id of the row that replaces the referenced one, so rows pointing at
+    duplicate parents share a key. Of each group of rows sharing a key, the
+    first or last one (`keep`) survives.
+    The ids of the other rows are mapped to the survivor's id, and apply() drops
+    those rows and rewrites every FOREIGN_KEYS column pointing at them, in the
+    table itself and in the tables imported after it.
+    """
+    
+    def __init__(self, keep: str = 'first'):
+        self.keep = keep
+        # Per table: id of each dropped row -> id of the row that replaces it
+        self.aliases: Dict[str, Dict[str, str]] = {}
+        # Per table: numbers of the rows to drop
+        self.dropped: Dict[str, Set[int]] = {}
+    
+    def scan(self, table: str, records: Iterable[List[str]], converter: 'RowConverter') -> int:
+        """Find the duplicate rows of a table from its raw records. Returns how many will be dropped."""
+        keys = DEDUP_KEYS.get(table)
+        if not keys or not all(col in converter.columns for col in keys):
+            return 0
+        has_id = converter.id_index >= 0
+        convert = converter.project(list(keys) + (['id'] if has_id else []))
+        first: Dict[Tuple[Any, ...], Tuple[int, Optional[str]]] = {}
+        repeats: Dict[Tuple[Any, ...], List[Tuple[int, Optional[str]]]] = {}
+        group_ids: Dict[str, str] = {}
+        # References to the table itself are compared by the first id of their group,
+        # references to a deduplicated parent by the id of its surviving row
+        lookups = [group_ids if FOREIGN_KEYS.get(col) == table else self.aliases.get(FOREIGN_KEYS.get(col))
+                   for col in keys]
+        for idx, values in enumerate(records, 1):
+            try:
+                row = convert(values)
+            except ValueError:
+                continue  # fails when imported anyway
+            key = tuple(lookup.get(value, value) if lookup is not None else value
+                        for value, lookup in zip(row, lookups))
+            row_id = row[-1] if has_id else None
+            if key not in first:
+                first[key] = (idx, row_id)
                 continue
-            filtered[col] = val
-
-        # Apply defaults
-        for key, value in defaults.items():
-            if key not in filtered or filtered[key] in ('', None):
-                filtered[key] = value
-
-        # Cast per schema
-        casted: Dict[str, Any] = {}
-        for key, val in filtered.items():
-            kind = schema.get(key)
-            if kind is None:
+            repeats.setdefault(key, []).append((idx, row_id))
+            if row_id and first[key][1]:
+                group_ids[row_id] = first[key][1]
+        
+        aliases: Dict[str, str] = {}
+        dropped: Set[int] = set()
+        for key, rest in repeats.items():
+            group = [first[key]] + rest
+            survivor = group[0] if self.keep == 'first' else group[-1]
+            for idx, row_id in group:
+                if idx == survivor[0]:
+                    continue
+                dropped.add(idx)
+                if row_id and survivor[1] and row_id != survivor[1]:
+                    aliases[row_id] = survivor[1]
+        self.aliases[table] = aliases
+        self.dropped[table] = dropped
+        return len(dropped)
+    
+    def apply(self, table: str, columns: Sequence[str],
+              rows: List[Tuple[int, Tuple[Any, ...]]]) -> List[Tuple[int, Tuple[Any, ...]]]:
+        """Drop the duplicate rows found by scan() and point references to dropped rows at their survivor."""
+        dropped = self.dropped.get(table, ())
+        references = [(i, self.aliases[FOREIGN_KEYS[col]]) for i, col in enumerate(columns)
+                      if self.aliases.get(FOREIGN_KEYS.get(col))]
+        if not dropped and not references:
+            return rows
+        kept = []
+        for idx, row in rows:
+            if idx in dropped:
                 continue
+            for i, aliases in references:
+                survivor = aliases.get(row[i])
+                if survivor:
+                    row = row[:i] + (survivor,) + row[i + 1:]
+            kept.append((idx, row))
+        return kept
 
-            base = kind.rstrip('?')
-            nullable = kind.endswith('?')
-
-            if base == 'uuid':
-                # Convert integer IDs to UUIDs, or validate existing UUIDs
-                v = _int_to_uuid(val) if val not in (None, '', 'null') else (None if nullable else None)
-            elif base == 'string' or base == 'text':
-                v = None if (val == '' and nullable) else (None if val is None and nullable else str(val) if val is not None else None)
-            elif base == 'bool':
-                v = _to_bool(val)
-            elif base == 'number':
-                v = _to_number(val)
-            elif base == 'int':
-                v = _to_int(val)
-            elif base == 'timestamp':
-                v = _to_timestamp(val)
-            elif base == 'json_text':
-                v = _to_json_text_array(val)
-            elif base == 'jsonb':
-                v = _to_jsonb(val)
-            elif base == 'enum_predefined':
-                v = str(val).strip().lower() if val is not None else None
-                if v not in PREDEFINED_TYPES:
-                    raise ValueError(f"Invalid predefined_values.type: {v}")
-            else:
-                v = val
+def _pack_array(values: array) -> bytes:
+    """Typecode, length and little-endian items of an array."""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return struct.pack('<cI', values.typecode.encode('ascii'), len(values)) + values.tobytes()
 
-            if v is None and not nullable and key not in ('id',):
-                # keep None for DB defaults where appropriate
-                pass
+def _unpack_array(view: memoryview, pos: int) -> Tuple[array, int]:
+    typecode, count = struct.unpack_from('<cI', view, pos)
+    pos += 5
+    values = array(typecode.decode('ascii'))
+    size = values.itemsize * count
+    values.frombytes(view[pos:pos + size])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, pos + size
 
-            casted[key] = v
+def _pack_strings(strings: Sequence[str]) -> bytes:
+    """A string table: the end of each string (in characters) and their concatenated UTF-8."""
+    ends = array('I', itertools.accumulate(map(len, strings)))
+    text = ''.join(strings).encode('utf-8', 'surrogatepass')
+    return _pack_array(ends) + struct.pack('<I', len(text)) + text
 
-        return casted
+def _unpack_strings(view: memoryview, pos: int) -> Tuple[List[str], int]:
+    ends, pos = _unpack_array(view, pos)
+    (size,) = struct.unpack_from('<I', view, pos)
+    pos += 4
+    text = str(view[pos:pos + size], 'utf-8', 'surrogatepass')
+    return [text[start:end] for start, end in zip(itertools.chain((0,), ends), ends)], pos + size
+
+def _pack_column(values: Sequence[Any]) -> bytes:
+    """A column of casted values, as the index of each value in a typed table of its distinct values.
     
-    def insert_row(self, table: str, data: Dict[str, Any]) -> bool:
-        """Insert a single row into the specified table."""
-        if not self.cur or not self.conn:
-            print("❌ No database connection")
+    The table lists None, False, True, the ints, floats, strings and datetimes,
+    each kind as one array (datetimes as a table of their ISO 8601 texts, which
+    datetime.fromisoformat() reads about 3x faster than datetimes are rebuilt
+    from integer fields), so it is decoded without a loop over its values.
+    Raises TypeError (or OverflowError) for other types.
+    """
+    # Distinct values of each kind, in table order; True == 1 and equal instants
+    # with other offsets must stay apart
+    kinds: Tuple[Dict[Any, int], ...] = tuple({} for _ in range(7))
+    located = []
+    for v in values:
+        kind = type(v)
+        if v is None:
+            group, key = 0, None
+        elif kind is bool:
+            group, key = 2 if v else 1, v
+        elif kind is int:
+            group, key = 3, v
+        elif kind is float:
+            group, key = 4, v
+        elif kind is str:
+            group, key = 5, v
+        elif kind is datetime:
+            group, key = 6, v.isoformat()
+        else:
+            raise TypeError(f"no staging cache layout for {kind.__name__} values")
+        table = kinds[group]
+        local = table.get(key)
+        if local is None:
+            local = table[key] = len(table)
+        located.append((group, local))
+    bases = list(itertools.accumulate((len(table) for table in kinds), initial=0))
+    positions = array('I', [bases[group] + local for group, local in located])
+    return b''.join((
+        _pack_array(positions),
+        struct.pack('<3B', len(kinds[0]), len(kinds[1]), len(kinds[2])),
+        _pack_array(array('q', kinds[3])),
+        _pack_array(array('d', kinds[4])),
+        _pack_strings(list(kinds[5])),
+        _pack_strings(list(kinds[6])),
+    ))
+
+def _unpack_column(view: memoryview, pos: int) -> Tuple[List[Any], int]:
+    positions, pos = _unpack_array(view, pos)
+    nones, falses, trues = struct.unpack_from('<3B', view, pos)
+    pos += 3
+    ints, pos = _unpack_array(view, pos)
+    floats, pos = _unpack_array(view, pos)
+    strings, pos = _unpack_strings(view, pos)
+    timestamps, pos = _unpack_strings(view, pos)
+    distinct = [None] * nones + [False] * falses + [True] * trues
+    distinct += ints.tolist()
+    distinct += floats.tolist()
+    distinct += strings
+    distinct.extend(map(datetime.fromisoformat, timestamps))
+    return list(map(distinct.__getitem__, positions)), pos
+
+
+class StagingCache:
+    """Casted rows of a CSV file, saved so later imports of the same file skip parsing and casting.
+    
+    The file holds columnar blocks, one per shard: the row numbers, the cast
+    errors and each column as the indexes into a table of its distinct values,
+    stored by type (see _pack_column). Only arrays and UTF-8 text are read
+    back, so loading a cache never runs code from it, and repeated values
+    (dates, foreign keys) are decoded once per shard. A JSON index of the blocks, with the key the cache was built for,
+    closes the file and the last 8 bytes give its offset. Reads go through
+    mmap, so only the blocks being loaded are paged in.
+    
+    The key covers the CSV fingerprint (size, mtime, hash), the header, the
+    timestamp formats and the converter layout; any change rebuilds the cache.
+    Timestamp defaults of the current run (RowConverter._volatile) are stored
+    as None and filled in again on load. A table with values of another type
+    is not cached.
+    """
+    
+    MAGIC = b'SUPSTAGE\n'
+    
+    def __init__(self, path: str, key: str, converter: 'RowConverter'):
+        self.path = path
+        self.key = key
+        self.converter = converter
+        self._blocks: List[Tuple[int, int, int, int, int]] = []  # first row, end row, end offset, start, length
+        self._file: Optional[Any] = None
+        self._unsupported: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    # Reading
+    
+    def load(self) -> bool:
+        """Read the block index; False if there is no cache, or it was built for something else."""
+        if not os.path.exists(self.path):
             return False
-        
         try:
-            # Hash plain text passwords for users table
-            if table == 'users' and 'password' in data and data['password']:
-                pwd = str(data['password'])
-                # Check if password is already hashed (bcrypt hashes start with $2a$, $2b$, or $2y$)
-                if not pwd.startswith('$2'):
-                    if HAS_BCRYPT:
-                        # Hash the plain text password
-                        hashed = bcrypt.hashpw(pwd.encode('utf-8'), bcrypt.gensalt())
-                        data['password'] = hashed.decode('utf-8')
-                        print(f"  🔐 Hashed password for {data.get('email', 'user')}")
-                    else:
-                        print(f"  ⚠️  Cannot hash password for {data.get('email', 'user')} - bcrypt not installed")
-            
-            # Drop empty IDs to let DB auto-generate
-            # Note: Integer IDs are now converted to UUIDs in prepare_row()
-            if 'id' in data:
-                v = data.get('id')
-                if v in (None, '', 'null'):
-                    data = {k: val for k, val in data.items() if k != 'id'}
-
-            columns = list(data.keys())
-            values = list(data.values())
-            
-            # Build INSERT query
-            query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
-                sql.Identifier(table),
-                sql.SQL(', ').join(map(sql.Identifier, columns)),
-                sql.SQL(', ').join(sql.Placeholder() * len(values))
-            )
-            
-            self.cur.execute(query, values)
-            return True
-        except Exception as e:
-            print(f"❌ Error inserting row into {table}: {e}")
-            print(f"   Data: {data}")
-            try:
-                # rollback this failed statement so following rows can continue
-                self.conn.rollback()
-            except Exception:
-                pass
+            with open(self.path, 'rb') as f:
+                if f.read(len(self.MAGIC)) != self.MAGIC:
+                    return False
+                f.seek(-8, os.SEEK_END)
+                (index_offset,) = struct.unpack('<Q', f.read(8))
+                f.seek(index_offset)
+                index = json.loads(f.read()[:-8])
+        except (OSError, ValueError, struct.error):
             return False
+        if index.get('key') != self.key:
+            return False
+        self._blocks = [tuple(block) for block in index['blocks']]
+        return True
     
-    def reset_sequence(self, table: str) -> None:
-        """Reset the ID sequence for a table after importing with explicit IDs."""
-        if not self.cur or not self.conn:
+    def shards(self, start_row: int = 0) -> Iterator[Tuple[Tuple[int, int], List[Tuple[int, Tuple[Any, ...]]],
+                                                          List[Tuple[int, str]], int]]:
+        """Yield (end, rows, errors, size in bytes) of the cached shards, after `start_row`."""
+        volatile = self.converter._volatile
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for first_row, end_row, end_offset, start, length in self._blocks:
+                    if end_row <= start_row:
+                        continue
+                    numbers, pos = _unpack_array(view, start)
+                    error_rows, pos = _unpack_array(view, pos)
+                    messages, pos = _unpack_strings(view, pos)
+                    (width,) = struct.unpack_from('<H', view, pos)
+                    pos += 2
+                    columns = []
+                    for _ in range(width):
+                        column, pos = _unpack_column(view, pos)
+                        columns.append(column)
+                    for i, default in volatile:
+                        if columns:
+                            columns[i] = [default if v is None else v for v in columns[i]]
+                    numbers = numbers.tolist()
+                    rows = list(zip(numbers, zip(*columns))) if columns else [(n, ()) for n in numbers]
+                    errors = list(zip(error_rows.tolist(), messages))
+                    if first_row <= start_row:
+                        rows = [(n, row) for n, row in rows if n > start_row]
+                        errors = [(n, e) for n, e in errors if n > start_row]
+                    yield (end_row, end_offset), rows, errors, length
+            finally:
+                view.release()
+    
+    # Writing
+    
+    def begin(self) -> None:
+        """Start a new cache, written to a temporary file until commit()."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._blocks = []
+        self._unsupported = None
+        self._file = open(f"{self.path}.tmp", 'wb')
+        self._file.write(self.MAGIC)
+    
+    def add(self, rows: List[Tuple[int, Tuple[Any, ...]]], errors: List[Tuple[int, str]],
+            end: Tuple[int, int], first_row: int) -> None:
+        """Append a casted shard (rows `first_row` to end[0]); shards may arrive in any order."""
+        if self._unsupported:
             return
-        
+        columns = [list(values) for values in zip(*(row for _, row in rows))]
+        for i, default in self.converter._volatile:
+            if columns:
+                columns[i] = [None if v == default else v for v in columns[i]]
         try:
-            # Get the sequence name (PostgreSQL convention: tablename_id_seq)
-            sequence_name = f"{table}_id_seq"
-            
-            # Reset sequence to max(id) + 1
-            self.cur.execute(
-                sql.SQL("SELECT setval({}, COALESCE((SELECT MAX(id) FROM {}), 1), true)").format(
-                    sql.Literal(sequence_name),
-                    sql.Identifier(table)
-                )
-            )
-            self.conn.commit()
-            print(f"🔄 Reset sequence for {table}")
-        except Exception as e:
-            # Sequence might not exist or table might not have id column
-            pass
+            packed = [_pack_column(column) for column in columns]
+        except (TypeError, OverflowError) as e:
+            self._unsupported = str(e)
+            return
+        payload = b''.join((_pack_array(array('q', [n for n, _ in rows])),
+                            _pack_array(array('q', [n for n, _ in errors])),
+                            _pack_strings([error for _, error in errors]),
+                            struct.pack('<H', len(packed)), *packed))
+        with self._lock:
+            start = self._file.tell()
+            self._file.write(payload)
+            self._blocks.append((first_row, end[0], end[1], start, len(payload)))
     
-    def import_table(self, table: str) -> int:
-        """Import all data from CSV file into specified table."""
-        print(f"\n📊 Importing {table}...")
-        
-        # Read CSV file
-        filename = f"{table}.csv"
-        rows = self.read_csv(filename)
-        
-        if not rows:
-            print(f"⚠️  No data to import for {table}")
-            return 0
+    def commit(self) -> None:
+        """Write the index and move the complete cache into place."""
+        if self._unsupported:
+            print(f"⚠️  Staging cache of {self.converter.table} not saved: {self._unsupported}")
+            self.discard()
+            return
+        f = self._file
+        self._blocks.sort()
+        index_offset = f.tell()
+        f.write(json.dumps({'key': self.key, 'blocks': self._blocks}).encode('utf-8'))
+        f.write(struct.pack('<Q', index_offset))
+        f.close()
+        self._file = None
+        os.replace(f"{self.path}.tmp", self.path)
+    
+    def discard(self) -> None:
+        """Drop a cache that was not completed."""
+        if self._file:
+            self._file.close()
+            self._file = None
+            os.remove(f"{self.path}.tmp")
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process and its (casting) child processes."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes, except on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process right now (Linux only, from /proc/self/statm)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ImportMetrics:
+    """Wall time, rows, bytes and failures per table and stage of an import run.
+    
+    Stages are read (CSV parsing), cast, hash (bcrypt, summed over the pool
+    threads), write (COPY/INSERT), commit and reset_sequence. One instance is
+    shared by every importer and thread of a run; write_json() and
+    write_prometheus() export it once the run is over.
+    
+    The peak RSS of a table is the largest resident set size of the process
+    sampled while the table was imported (each time a stage is accounted), so
+    tables imported concurrently share their peaks. ru_maxrss only gives the
+    peak of the whole run, which is reported once at the run level.
+    """
+    
+    def __init__(self):
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.failed_tables: List[str] = []
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def _table(self, table: str) -> Dict[str, Any]:
+        entry = self.tables.get(table)
+        if entry is None:
+            entry = self.tables[table] = {
+                'seconds': 0.0, 'rows': 0, 'rows_read': 0, 'bytes': 0,
+                'failed_rows': 0, 'peak_rss_bytes': None, 'stages': {},
+            }
+        return entry
+    
+    def sample_rss(self, table: str) -> None:
+        """Raise the peak RSS of a table to the current resident set size."""
+        rss = current_rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            entry = self._table(table)
+            if entry['peak_rss_bytes'] is None or rss > entry['peak_rss_bytes']:
+                entry['peak_rss_bytes'] = rss
+    
+    def add(self, table: str, stage: str, seconds: float, rows: int = 0, nbytes: int = 0) -> None:
+        """Account `seconds` spent on `rows` rows (and `nbytes` bytes) to a stage of a table."""
+        self.sample_rss(table)
+        with self._lock:
+            stages = self._table(table)['stages']
+            totals = stages.get(stage)
+            if totals is None:
+                totals = stages[stage] = {'seconds': 0.0, 'rows': 0, 'bytes': 0}
+            totals['seconds'] += seconds
+            totals['rows'] += rows
+            totals['bytes'] += nbytes
+    
+    def timed(self, table: str, stage: str, items: Iterable[Sequence[Any]]) -> Iterator[Sequence[Any]]:
+        """Yield from `items`, accounting the time spent producing each one (and its length) to a stage."""
+        it = iter(items)
+        while True:
+            started = time.perf_counter()
+            item = next(it, None)
+            if item is None:
+                return
+            self.add(table, stage, time.perf_counter() - started, len(item))
+            yield item
+    
+    def fail(self, table: str, count: int) -> None:
+        if count:
+            with self._lock:
+                self._table(table)['failed_rows'] += count
+    
+    def table_done(self, table: str, seconds: float, rows: int, rows_read: int, nbytes: int) -> None:
+        """Record the totals of a table once its import finished."""
+        self.sample_rss(table)
+        with self._lock:
+            entry = self._table(table)
+            entry.update(seconds=seconds, rows=rows, rows_read=rows_read, bytes=nbytes)
+            entry['stages'].setdefault('read', {'seconds': 0.0, 'rows': 0, 'bytes': 0})['bytes'] = nbytes
+    
+    def finish(self, failed_tables: Sequence[str] = ()) -> None:
+        self.finished = time.time()
+        self.failed_tables = list(failed_tables)
+    
+    @staticmethod
+    def _rates(totals: Dict[str, Any]) -> Dict[str, Any]:
+        seconds = totals['seconds']
+        rates = dict(totals, seconds=round(seconds, 6))
+        rates['rows_per_second'] = round(totals['rows'] / seconds, 1) if seconds and totals['rows'] else None
+        rates['bytes_per_second'] = round(totals['bytes'] / seconds, 1) if seconds and totals['bytes'] else None
+        return rates
+    
+    def report(self) -> Dict[str, Any]:
+        """The run as a JSON-serializable dict."""
+        finished = self.finished or time.time()
+        with self._lock:
+            tables = {}
+            for table, entry in self.tables.items():
+                tables[table] = self._rates(entry)
+                tables[table]['stages'] = {stage: self._rates(totals) for stage, totals in entry['stages'].items()}
+        return {
+            'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'seconds': round(finished - self.started, 3),
+            'success': self.finished is not None and not self.failed_tables,
+            'failed_tables': self.failed_tables,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'tables': tables,
+        }
+    
+    def write_json(self, path: str) -> None:
+        """Write the run report as JSON (atomically)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(tmp_path, path)
+    
+    def write_prometheus(self, path: str) -> None:
+        """Write the run as a Prometheus textfile (node_exporter textfile collector format)."""
+        report = self.report()
+        metrics: Dict[str, Tuple[str, List[Tuple[str, Any]]]] = {}
         
-        # Validate required columns
-        mapping = COLUMN_MAPPINGS.get(table, {})
-        required = mapping.get('required', [])
+        def metric(name: str, help_text: str, labels: Dict[str, str], value: Any) -> None:
+            if value is None:
+                return
+            label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+            samples = metrics.setdefault(f'{METRICS_PREFIX}_{name}', (help_text, []))[1]
+            samples.append((f'{{{label_text}}}' if label_text else '', value))
         
-        if required:
-            first_row = rows[0]
-            missing = [col for col in required if col not in first_row]
-            if missing:
-                print(f"❌ Missing required columns for {table}: {missing}")
-                return 0
+        metric('last_run_timestamp_seconds', 'Time the last import run started.', {}, round(self.started, 3))
+        metric('last_run_success', 'Whether the last import run completed without failed tables.', {},
+               int(report['success']))
+        metric('run_seconds', 'Wall time of the last import run.', {}, report['seconds'])
+        metric('peak_rss_bytes', 'Peak resident set size of the process over the last import run.', {}, report['peak_rss_bytes'])
+        for table, entry in report['tables'].items():
+            labels = {'table': table}
+            metric('table_seconds', 'Wall time of the import of a table.', labels, round(entry['seconds'], 6))
+            metric('table_rows', 'Rows stored in a table.', labels, entry['rows'])
+            metric('table_rows_read', 'CSV rows read for a table.', labels, entry['rows_read'])
+            metric('table_bytes', 'CSV bytes read for a table.', labels, entry['bytes'])
+            metric('table_rows_per_second', 'Rows stored per second of table import.', labels, entry['rows_per_second'])
+            metric('table_bytes_per_second', 'CSV bytes read per second of table import.', labels, entry['bytes_per_second'])
+            metric('table_failed_rows', 'Rows that could not be imported.', labels, entry['failed_rows'])
+            metric('table_peak_rss_bytes', 'Peak resident set size of the process sampled during the import of a table.', labels, entry['peak_rss_bytes'])
+            for stage, totals in entry['stages'].items():
+                labels = {'table': table, 'stage': stage}
+                metric('stage_seconds', 'Wall time spent in an import stage.', labels, round(totals['seconds'], 6))
+                metric('stage_rows', 'Rows processed by an import stage.', labels, totals['rows'])
+                metric('stage_rows_per_second', 'Rows processed per second by an import stage.', labels,
+                       totals['rows_per_second'])
+        
+        lines = []
+        for name, (help_text, samples) in metrics.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.extend(f'{name}{labels} {value}' for labels, value in samples)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        # The textfile collector must never see a half written file
+        os.replace(tmp_path, path)
+
+class RejectLog:
+    """Rows of an import that could not be stored, one JSON Lines file per table.
+    
+    Every rejected row gets a record with its row number, the line it starts on
+    in the CSV file, its raw values by header, the error class (ValueError,
+    InvalidDatetimeFormat, ForeignKeyViolation, UniqueViolation, ...) and the
+    message. The import path only reports row numbers; the raw values are read
+    back from the CSV file by flush(), once the rows are committed, continuing
+    the read where the previous flush stopped, so the rows being imported are
+    not kept around and a killed import loses no reject of a committed row.
+    Rejects reported after the read went past their row are written by finish().
+    The console shows the first REJECT_CONSOLE_ROWS rejects of a table and then
+    running counts only.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Per table: CSV file, (row, error class, message) not written yet, counts per error class
+        self.files: Dict[str, str] = {}
+        self.pending: Dict[str, List[Tuple[int, str, str]]] = {}
+        self.counts: Dict[str, Dict[str, int]] = {}
+        # Per table: where flush() stopped reading the CSV file (row, byte offset, line) and the rows written
+        self._read: Dict[str, Tuple[int, int, int]] = {}
+        self._written: Dict[str, Set[int]] = {}
+        self._printed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flush_locks: Dict[str, threading.Lock] = {}
+    
+    def path(self, table: str) -> str:
+        return os.path.join(self.directory, f"{table}.jsonl")
+    
+    def begin(self, table: str, filepath: str, append: bool = False) -> None:
+        """Start the reject file of a table, keeping the rejects of an interrupted run when `append`."""
+        with self._lock:
+            self.files[table] = filepath
+            self.pending[table] = []
+            self.counts[table] = {}
+            self._read[table] = (0, 0, 0)
+            self._written[table] = set()
+            self._printed_at[table] = 0.0
+            self._flush_locks.setdefault(table, threading.Lock())
+        path = self.path(table)
+        if not append and os.path.exists(path):
+            os.remove(path)
+    
+    def add(self, table: str, row: int, error_class: str, message: str) -> None:
+        """Record that row number `row` of a table's CSV file was rejected."""
+        with self._lock:
+            counts = self.counts.setdefault(table, {})
+            counts[error_class] = counts.get(error_class, 0) + 1
+            self.pending.setdefault(table, []).append((row, error_class, message))
+            total = sum(counts.values())
+            if total <= REJECT_CONSOLE_ROWS:
+                print(f"❌ Row {row} of {table} rejected ({error_class}): {message.splitlines()[0] if message else ''}")
+            elif time.monotonic() - self._printed_at.get(table, 0.0) >= REJECT_CONSOLE_INTERVAL:
+                self._printed_at[table] = time.monotonic()
+                print(f"⚠️  {total} rows of {table} rejected so far (see {self.path(table)})")
+    
+    def flush(self, table: str, through: int) -> None:
+        """Write the pending rejects of rows up to `through` (committed rows) with their raw values."""
+        with self._flush_locks.setdefault(table, threading.Lock()):
+            with self._lock:
+                start = self._read.get(table, (0, 0, 0))
+                pending = self.pending.get(table, [])
+                ready = [entry for entry in pending if start[0] < entry[0] <= through]
+                if not ready:
+                    return
+                self.pending[table] = [entry for entry in pending if not start[0] < entry[0] <= through]
+            end = self._write(table, ready, start)
+            with self._lock:
+                self._read[table] = end
+    
+    def finish(self, table: str) -> None:
+        """Write the pending rejects of a table with their raw values, and print its summary."""
+        with self._flush_locks.setdefault(table, threading.Lock()):
+            with self._lock:
+                pending = self.pending.pop(table, [])
+                start = self._read.get(table, (0, 0, 0))
+                counts = self.counts.get(table, {})
+            self._write(table, [entry for entry in pending if entry[0] > start[0]], start)
+            # Rows before where flush() stopped are read again from the start of the file
+            late = [entry for entry in pending if entry[0] <= start[0]]
+            if late:
+                self._write(table, late, (0, 0, 0))
+        if counts:
+            summary = ', '.join(f"{count} {name}" for name, count in sorted(counts.items()))
+            print(f"⚠️  {sum(counts.values())} rows of {table} rejected ({summary}), see {self.path(table)}")
+    
+    def _write(self, table: str, entries: List[Tuple[int, str, str]],
+               start: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """Append the records of `entries`, reading the CSV file from `start` (row, byte offset, line).
+        
+        Returns where the read stopped, just past the last of the rows.
+        """
+        filepath = self.files.get(table)
+        written = self._written.setdefault(table, set())
+        # A row reported twice is written with its first error
+        first: Dict[int, Tuple[int, str, str]] = {}
+        for entry in entries:
+            if entry[0] not in written:
+                first.setdefault(entry[0], entry)
+        pending = sorted(first.values())
+        if not pending or not filepath:
+            return start
+        os.makedirs(self.directory, exist_ok=True)
+        stream = CsvStream(filepath)
+        wanted = iter(pending)
+        row, error_class, message = next(wanted)
+        idx, offset, lines = start
+        with open(self.path(table), 'a', encoding='utf-8') as out, open_csv(filepath) as f:
+            skip_bytes(f, offset)
+            stream.offset = offset
+            reader = stream._reader(f)
+            if not offset:
+                next(reader, None)  # header
+            line = lines + reader.line_num + 1
+            for values in reader:
+                if values:
+                    idx += 1
+                if idx == row:
+                    record = {'row': row, 'line': line, 'values': dict(zip(stream.fieldnames, values)),
+                              'error': error_class, 'message': message}
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    written.add(row)
+                    row, error_class, message = next(wanted, (None, None, None))
+                if row is None:
+                    break
+                line = lines + reader.line_num + 1
+        return idx, stream.offset, lines + reader.line_num
+    
+    def write_summary(self) -> None:
+        """Write the counts per table and error class of the run to summary.json."""
+        with self._lock:
+            counts = {table: dict(c) for table, c in self.counts.items() if c}
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, 'summary.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'tables': counts, 'files': {table: self.path(table) for table in counts}}, f, indent=2)
+        os.replace(tmp_path, path)
+    
+    def close(self) -> None:
+        """Write the rejects of tables whose import did not finish."""
+        for table in [t for t, pending in self.pending.items() if pending]:
+            self.finish(table)
+
+def _int_to_uuid(value: Any, namespace: str = 'supervision') -> str:
+    """Convert an integer ID to a deterministic UUID v5."""
+    if namespace == ID_REGISTRY.namespace:
+        return ID_REGISTRY.resolve(value)
+    return IdRegistry(namespace).derive(value)
+
+def _asyncpg_config(config: Dict[str, Any], settings: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Connection arguments of asyncpg for a psycopg2 style DB_CONFIG, with session `settings` on top."""
+    kwargs = {key: config[key] for key in ('host', 'database', 'user', 'password') if config.get(key)}
+    if config.get('port'):
+        kwargs['port'] = int(config['port'])
+    # asyncpg has no libpq options: their -c name=value settings become server settings
+    server_settings = {}
+    tokens = iter((config.get('options') or '').split())
+    for token in tokens:
+        setting = next(tokens, '') if token == '-c' else token[2:] if token.startswith('-c') else ''
+        name, _, value = setting.partition('=')
+        if name and value:
+            server_settings[name] = value
+    server_settings.update(settings or {})
+    if server_settings:
+        kwargs['server_settings'] = server_settings
+    return kwargs
+
+def _month_of(value: Any) -> Optional[date]:
+    """First day of the month of a casted timestamp, or None if it did not parse."""
+    return date(value.year, value.month, 1) if isinstance(value, datetime) else None
+
+def _month_label(month: Optional[date]) -> str:
+    """Key of a month in the checkpoint of a partitioned load ('' for rows outside any month)."""
+    return month.isoformat() if month else ''
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def _state_path(name: str) -> str:
+    """Path of a file kept between runs in the state directory of CSV_DIR."""
+    return os.path.join(CSV_DIR, STATE_DIR, name)
+
+def _to_enum_predefined(v: Any) -> str:
+    s = str(v).strip().lower() if v is not None else None
+    if s not in PREDEFINED_TYPES:
+        raise ValueError(f"Invalid predefined_values.type: {s}")
+    return s
+
+def _to_string(v: Any) -> Optional[str]:
+    return str(v) if v is not None else None
+
+def _to_nullable_string(v: Any) -> Optional[str]:
+    return None if v in (None, '') else str(v)
+
+def _unchanged(v: Any) -> Any:
+    return v
+
+_CASTS: Dict[str, Callable[[Any], Any]] = {
+    # Convert integer IDs to UUIDs, or validate existing UUIDs
+    'uuid': _int_to_uuid,
+    'bool': _to_bool,
+    'number': _to_number,
+    'int': _to_int,
+    'timestamp': _to_timestamp,
+    'json_text': _to_json_text_array,
+    'jsonb': _to_jsonb,
+    'enum_predefined': _to_enum_predefined,
+}
+
+def _caster(kind: str) -> Callable[[Any], Any]:
+    """Return the cast function for a SCHEMA column type."""
+    base = kind.rstrip('?')
+    if base in ('string', 'text'):
+        return _to_nullable_string if kind.endswith('?') else _to_string
+    return _CASTS.get(base, _unchanged)
+
+_NO_DEFAULT = object()
+
+
+class RowConverter:
+    """Casts raw CSV records of one table into tuples in SCHEMA column order.
+    
+    Built once per (table, header) from SCHEMA, COLUMN_MAPPINGS['defaults'] and
+    skip_columns: each target column is bound to its position in the CSV header,
+    its cast function and its already casted default, so converting a record is
+    a single pass over those slots with no per-cell lookups.
+    """
+    
+    def __init__(self, table: str, fieldnames: Sequence[str], timestamp_formats: Sequence[Tuple[str, str]] = ()):
+        mapping = COLUMN_MAPPINGS.get(table, {})
+        skip_columns = mapping.get('skip_columns', [])
+        defaults = mapping.get('defaults', {})
+        schema = SCHEMA.get(table, {})
+        
+        # Unknown and skipped headers are dropped; a repeated header keeps its last value
+        positions = {name: i for i, name in enumerate(fieldnames)
+                     if name in schema and name not in skip_columns}
+        
+        formats = dict(timestamp_formats)
+        self.table = table
+        self.fieldnames = list(fieldnames)
+        self.columns: List[str] = []
+        self.kinds: List[str] = []
+        self._slots: List[Tuple[int, Callable[[Any], Any], Any]] = []
+        # Schema columns absent from the header, left to the DB default
+        self.missing: List[str] = []
+        for col, kind in schema.items():
+            idx = positions.get(col, -1)
+            if idx < 0 and col not in defaults:
+                self.missing.append(col)
+                continue  # left to the DB default
+            # Timestamp columns get their own parser, with its format and cache
+            if kind.rstrip('?') == 'timestamp':
+                cast = TimestampParser(formats.get(col))
+            elif kind.rstrip('?') == 'uuid' and col not in FOREIGN_KEYS:
+                # Unique ids would only fill the memoized foreign keys
+                cast = ID_REGISTRY.derive
+            else:
+                cast = _caster(kind)
+            default = cast(defaults[col]) if col in defaults else _NO_DEFAULT
+            self.columns.append(col)
+            self.kinds.append(kind)
+            self._slots.append((idx, cast, default))
+        # Headers whose values are never imported
+        self.unknown = [name for name in fieldnames if name not in schema]
+        self.skipped = [name for name in fieldnames if name in schema and name in skip_columns]
+        
+        # Timestamp defaults are datetime.now() of the current run, so they are left
+        # out of fingerprints to keep them stable between runs
+        self._volatile = [(i, self._slots[i][2]) for i, col in enumerate(self.columns)
+                          if isinstance(defaults.get(col), datetime)]
+        self.id_index = self.columns.index('id') if 'id' in self.columns else -1
+        # Identifies what this converter produces, leaving out the per-run timestamp defaults
+        self.signature = repr((self.columns, self.kinds, sorted(
+            (col, value) for col, value in defaults.items() if not isinstance(value, datetime))))
+    
+    def fingerprint(self, row: Sequence[Any]) -> str:
+        """Content hash of a converted row, used to detect changed rows between runs."""
+        if self._volatile:
+            row = list(row)
+            for i, default in self._volatile:
+                if row[i] == default:
+                    row[i] = None
+        # Hash timestamps as ISO strings, as they were cast before casts returned datetimes
+        row = [v.isoformat() if isinstance(v, datetime) else v for v in row]
+        return hashlib.blake2b(repr(tuple(row)).encode('utf-8'), digest_size=16).hexdigest()
+    
+    def __call__(self, values: Sequence[Any]) -> Tuple[Any, ...]:
+        """Convert one record (values in header order) into a row tuple."""
+        return self._convert(self._slots, values)
+    
+    def project(self, columns: Sequence[str]) -> Callable[[Sequence[Any]], Tuple[Any, ...]]:
+        """Converter of a record into the values of `columns` only, leaving the other columns uncast."""
+        slots = [self._slots[self.columns.index(col)] for col in columns]
+        return functools.partial(self._convert, slots)
+    
+    @staticmethod
+    def _convert(slots: Sequence[Tuple[int, Callable[[Any], Any], Any]], values: Sequence[Any]) -> Tuple[Any, ...]:
+        n = len(values)
+        out = []
+        for idx, cast, default in slots:
+            val = values[idx] if 0 <= idx < n else None
+            if default is not _NO_DEFAULT and (val is None or val == ''):
+                out.append(default)
+            else:
+                out.append(cast(val))
+        return tuple(out)
+
+@functools.lru_cache(maxsize=None)
+def compile_converter(table: str, fieldnames: Tuple[Any, ...],
+                      timestamp_formats: Tuple[Tuple[str, str], ...] = ()) -> RowConverter:
+    """Return the (cached) converter of a table for a given CSV header and timestamp formats."""
+    return RowConverter(table, fieldnames, timestamp_formats)
+
+def infer_timestamp_formats(table: str, fieldnames: Sequence[str],
+                            records: Sequence[Sequence[str]]) -> Tuple[Tuple[str, str], ...]:
+    """Infer the format of each timestamp column of a table from sample records.
+    
+    Returns (column, format name) pairs, hashable so they can key compile_converter.
+    """
+    formats = []
+    for idx, col in enumerate(fieldnames):
+        if SCHEMA.get(table, {}).get(col, '').rstrip('?') != 'timestamp':
+            continue
+        fmt = infer_timestamp_format(values[idx] for values in records if idx < len(values))
+        if fmt:
+            formats.append((col, fmt))
+    return tuple(formats)
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most `size` items."""
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def cast_shard(table: str, fieldnames: Tuple[str, ...], shard: List[Tuple[int, List[str]]],
+               timestamp_formats: Tuple[Tuple[str, str], ...] = ()
+               ) -> Tuple[List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]]]:
+    """Cast a shard of (row number, raw values) records of a table.
+    
+    Returns the casted (row number, row) pairs and the (row number, error) of rows
+    that could not be cast. Module level so it can run in a process pool.
+    """
+    converter = compile_converter(table, fieldnames, timestamp_formats)
+    rows = []
+    errors = []
+    for idx, values in shard:
+        try:
+            rows.append((idx, converter(values)))
+        except ValueError as e:
+            errors.append((idx, str(e)))
+    return rows, errors
+
+def timed_cast_shard(table: str, fieldnames: Tuple[str, ...], shard: List[Tuple[int, List[str]]],
+                     timestamp_formats: Tuple[Tuple[str, str], ...] = ()
+                     ) -> Tuple[List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]], float]:
+    """cast_shard that also returns the seconds it took, for casts running in another process."""
+    started = time.perf_counter()
+    rows, errors = cast_shard(table, fieldnames, shard, timestamp_formats)
+    return rows, errors, time.perf_counter() - started
+
+# SQL versions of the import casts, used by --server-cast to cast staged rows in
+# PostgreSQL. Session-local (pg_temp); they mirror the Python casts above and
+# return NULL where those return None (or raise, for timestamps).
+SERVER_CAST_FUNCTIONS = r"""
+CREATE OR REPLACE FUNCTION pg_temp.import_uuid(v text, ns uuid) RETURNS uuid
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE
+        WHEN v IS NULL OR v IN ('', 'null') THEN NULL
+        WHEN btrim(v, E' \t\r\n\f\v') ~ '^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'
+            THEN btrim(v, E' \t\r\n\f\v')::uuid
+        -- From the uuid-ossp extension, which the schema migrations install
+        ELSE uuid_generate_v5(ns, v)
+    END
+$$;
+
+CREATE OR REPLACE FUNCTION pg_temp.import_bool(v text) RETURNS boolean
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE lower(btrim(v, E' \t\r\n\f\v'))
+        WHEN 'true' THEN true WHEN '1' THEN true WHEN 'yes' THEN true
+        WHEN 'false' THEN false WHEN '0' THEN false WHEN 'no' THEN false
+    END
+$$;
+
+CREATE OR REPLACE FUNCTION pg_temp.import_int(v text) RETURNS numeric
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN v ~ '^\s*[+-]?\d+\s*$' THEN btrim(v, E' \t\r\n\f\v')::numeric END
+$$;
+
+CREATE OR REPLACE FUNCTION pg_temp.import_number(v text) RETURNS double precision
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN v ~* '^\s*([+-]?(\d+\.?\d*|\.\d+)(e[+-]?\d+)?|[+-]?(nan|inf|infinity))\s*$'
+        THEN btrim(v, E' \t\r\n\f\v')::double precision END
+$$;
+
+CREATE OR REPLACE FUNCTION pg_temp.import_timestamp(v text, formats text[]) RETURNS timestamp
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    s text := btrim(v, E' \t\r\n\f\v');
+    fmt text;
+    matched boolean;
+    rest text;
+    tz text;
+    t text[];
+    f int[];
+    seconds double precision;
+    ts timestamp;
+BEGIN
+    IF v IS NULL OR v = '' THEN
+        RETURN NULL;
+    END IF;
+    -- Formats are matched with plain regular expressions (captures make PostgreSQL's slow)
+    -- and then split into f: year, month, day, hour, minute
+    FOREACH fmt IN ARRAY formats LOOP
+        matched := false;
+        tz := NULL;
+        IF fmt = 'iso' THEN
+            IF s ~ '^\d{4}-\d{2}-\d{2}([T ]\d{2}(:\d{2}(:\d{2}([.,]\d{1,6})?)?)?(Z|[+-]\d{2}(:?\d{2})?)?)?$' THEN
+                matched := true;
+                rest := substr(s, 12);
+                IF right(rest, 1) = 'Z' THEN
+                    tz := '+00';
+                    rest := left(rest, -1);
+                ELSIF rest ~ '[+-]' THEN
+                    tz := substring(rest FROM '[+-].*$');
+                    rest := substring(rest FROM '^[^+-]*');
+                END IF;
+                t := string_to_array(rest, ':');
+                f := ARRAY[substr(s, 1, 4), substr(s, 6, 2), substr(s, 9, 2),
+                           coalesce(t[1], '0'), coalesce(t[2], '0')]::int[];
+                seconds := replace(coalesce(t[3], '0'), ',', '.')::double precision;
+            END IF;
+        ELSIF s ~ '^\d{1,2}[/.-]\d{1,2}[/.-]\d{4}([ T]+\d{1,2}[:hH]\d{2}(:\d{2}([.,]\d{1,6})?)?)?$' THEN
+            matched := true;
+            t := regexp_split_to_array(s, '[/.,:hHT -]+');
+            f := ARRAY[t[3], CASE fmt WHEN 'day-first' THEN t[2] ELSE t[1] END,
+                       CASE fmt WHEN 'day-first' THEN t[1] ELSE t[2] END,
+                       coalesce(t[4], '0'), coalesce(t[5], '0')]::int[];
+            seconds := (coalesce(t[6], '0') || '.' || coalesce(t[7], '0'))::double precision;
+        END IF;
+        -- Impossible dates (e.g. February 30) do not match the format, as in Python
+        IF matched AND f[1] >= 1 AND f[2] BETWEEN 1 AND 12 AND f[4] < 24 AND f[5] < 60 AND seconds < 60 THEN
+            IF f[3] BETWEEN 1 AND extract(day FROM make_date(f[1], f[2], 1) + interval '1 month - 1 day') THEN
+                ts := make_timestamp(f[1], f[2], f[3], f[4], f[5], seconds);
+                IF tz IS NOT NULL THEN
+                    -- Shifted to the session time zone, as psycopg2 does with aware datetimes
+                    ts := ((ts::text || tz)::timestamptz)::timestamp;
+                END IF;
+                RETURN ts;
+            END IF;
+        END IF;
+    END LOOP;
+    -- No format of the column: the row fails, as in Python
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION pg_temp.import_json_text(v text) RETURNS text
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    s text := btrim(v, E' \t\r\n\f\v');
+    j jsonb;
+BEGIN
+    IF v IS NULL OR v = '' THEN
+        RETURN '[]';
+    END IF;
+    IF left(s, 1) = '[' AND right(s, 1) = ']' THEN
+        BEGIN
+            j := s::jsonb;
+            IF jsonb_typeof(j) = 'array' THEN
+                RETURN j::text;
+            END IF;
+        EXCEPTION WHEN others THEN
+            NULL;
+        END;
+    END IF;
+    -- Split by comma as a fallback
+    RETURN (SELECT coalesce(jsonb_agg(p ORDER BY i), '[]'::jsonb)::text
+            FROM (SELECT btrim(x, E' \t\r\n\f\v') AS p, i
+                  FROM unnest(string_to_array(s, ',')) WITH ORDINALITY AS u(x, i)) parts
+            WHERE p <> '');
+END
+$$;
+
+CREATE OR REPLACE FUNCTION pg_temp.import_jsonb(v text) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF v IS NULL OR v = '' THEN
+        RETURN NULL;
+    END IF;
+    BEGIN
+        RETURN v::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN jsonb_build_object('value', v);
+    END;
+END
+$$;
+"""
+
+def _server_cast(kind: str, value: sql.Composable, casted: sql.Composable,
+                 timestamp_format: Optional[str] = None) -> Tuple[sql.Composable, Optional[sql.Composable]]:
+    """SQL expression casting a staged text `value` like _caster(kind), for --server-cast.
+
+    Returns the expression and, for casts that fail rows, an expression giving
+    the row's error message from the value and its result `casted` (NULL when
+    the value is fine).
+    """
+    base = kind.rstrip('?')
+    if base in ('string', 'text'):
+        # COPY reads an unquoted empty field as NULL, the csv module as ''
+        if kind.endswith('?'):
+            return sql.SQL("NULLIF({}, '')").format(value), None
+        return sql.SQL("COALESCE({}, '')").format(value), None
+    if base == 'uuid':
+        return sql.SQL("pg_temp.import_uuid({}, {}::uuid)").format(
+            value, sql.Literal(str(ID_REGISTRY.namespace_uuid))), None
+    if base == 'timestamp':
+        # As TimestampParser: the format of the column, else ISO 8601
+        formats = list(dict.fromkeys([timestamp_format, 'iso'])) if timestamp_format else list(TIMESTAMP_PARSERS)
+        suffix = f" (the column has {timestamp_format} dates)" if timestamp_format else ''
+        error = sql.SQL("CASE WHEN {0} <> '' AND {1} IS NULL THEN format('Invalid timestamp: %s', {0}) || {2} END").format(
+            value, casted, sql.Literal(suffix))
+        return sql.SQL("pg_temp.import_timestamp({}, {}::text[])").format(value, sql.Literal(formats)), error
+    if base == 'enum_predefined':
+        lowered = sql.SQL("lower(btrim({}, E' \\t\\r\\n\\f\\v'))").format(value)
+        error = sql.SQL("CASE WHEN {} IS NULL "
+                        "THEN format('Invalid predefined_values.type: %s', COALESCE({}, 'None')) END").format(
+            casted, lowered)
+        return sql.SQL("CASE WHEN {0} = ANY({1}::text[]) THEN {0} END").format(
+            lowered, sql.Literal(sorted(PREDEFINED_TYPES))), error
+    if base in ('bool', 'int', 'number', 'json_text', 'jsonb'):
+        return sql.SQL("pg_temp.{}({})").format(sql.Identifier(f'import_{base}'), value), None
+    return value, None
+
+# Escapes for the PostgreSQL COPY text format
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def _to_copy_field(v: Any) -> str:
+    """Encode a prepared value as a field of the COPY text format."""
+    if v is None:
+        return '\\N'
+    if isinstance(v, bool):
+        return 't' if v else 'f'
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return str(v).translate(_COPY_ESCAPES)
+
+def _copy_buffer(rows: Iterable[Sequence[Any]]) -> io.StringIO:
+    """Prepared rows as the data of a COPY ... FROM STDIN in text format.
+    
+    Timestamps repeat heavily (dateRef): each distinct one is formatted once per buffer.
+    """
+    # Keyed by offset too: equal instants with other offsets store other timestamp values
+    timestamps: Dict[Tuple[datetime, Any], str] = {}
+    
+    def field(v: Any) -> str:
+        if type(v) is datetime:
+            key = (v, v.utcoffset())
+            text = timestamps.get(key)
+            if text is None:
+                text = timestamps[key] = v.isoformat()
+            return text
+        return _to_copy_field(v)
+    
+    buf = io.StringIO()
+    for values in rows:
+        buf.write('\t'.join(map(field, values)))
+        buf.write('\n')
+    buf.seek(0)
+    return buf
+
+def _id_groups(columns: List[str], rows: List[Sequence[Any]]) -> List[Tuple[List[str], List[Sequence[Any]]]]:
+    """Split prepared rows into (columns, rows) groups sent as separate statements.
+    
+    Rows without an id go in a group that omits the column, so the DB default generates it.
+    """
+    if 'id' not in columns:
+        return [(columns, rows)]
+    id_index = columns.index('id')
+    with_id = [row for row in rows if row[id_index] not in (None, '', 'null')]
+    without_id = [row[:id_index] + row[id_index + 1:] for row in rows
+                  if row[id_index] in (None, '', 'null')]
+    groups = []
+    if with_id:
+        groups.append((columns, with_id))
+    if without_id:
+        groups.append((columns[:id_index] + columns[id_index + 1:], without_id))
+    return groups
+
+class CsvStream:
+    """CSV file parsed lazily in a single pass.
+    
+    The encoding and delimiter are detected from a bounded sample and the header is
+    read up front. records() yields raw value lists; iterating yields one dict per
+    row as DictReader would.
+    Bytes that do not decode as UTF-8 further down a UTF-8 file fall back to
+    cp1252 instead of aborting the read. Compressed (.csv.gz, .csv.zst) files
+    are decompressed on the fly; offsets count decompressed bytes.
+    """
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.encoding, self.delimiter = sniff_csv(filepath)
+        self.fieldnames: List[str] = []
+        self.rows_read = 0
+        # Byte offset just past the last record read
+        self.offset = 0
+        with open_csv(filepath) as f:
+            self.fieldnames = next(self._reader(f), [])
+    
+    def _lines(self, f: Any) -> Iterator[str]:
+        errors = 'cp1252_fallback' if self.encoding.startswith('utf-8') else 'strict'
+        for raw in f:
+            self.offset += len(raw)
+            yield raw.decode(self.encoding, errors=errors)
+    
+    def _reader(self, f: Any) -> Iterator[List[str]]:
+        # csv.reader only pulls the lines of the record it is parsing, so
+        # self.offset is exact between records
+        return csv.reader(self._lines(f), delimiter=self.delimiter)
+    
+    def head(self, n: int) -> List[List[str]]:
+        """The first `n` data rows, read apart from records() (rows_read and offset are left as they are)."""
+        offset = self.offset
+        try:
+            with open_csv(self.filepath) as f:
+                reader = self._reader(f)
+                next(reader, None)  # header
+                return [values for values in itertools.islice(reader, n) if values]
+        finally:
+            self.offset = offset
+    
+    def timestamp_formats(self, table: str) -> Tuple[Tuple[str, str], ...]:
+        """Formats of the table's timestamp columns, inferred from the first TIMESTAMP_SAMPLE_ROWS rows."""
+        return infer_timestamp_formats(table, self.fieldnames, self.head(TIMESTAMP_SAMPLE_ROWS))
+    
+    def records(self, offset: int = 0) -> Iterator[List[str]]:
+        """Yield the raw values of each data row, in header order.
+        
+        A non-zero `offset` (a previous value of self.offset) resumes reading at
+        that byte position instead of the first data row.
+        """
+        with open_csv(self.filepath) as f:
+            self.offset = 0
+            if offset:
+                skip_bytes(f, offset)
+                self.offset = offset
+                reader = self._reader(f)
+            else:
+                reader = self._reader(f)
+                next(reader, None)  # header
+            for values in reader:
+                if not values:
+                    continue
+                self.rows_read += 1
+                yield values
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        width = len(self.fieldnames)
+        for values in self.records():
+            row: Dict[str, Any] = dict(zip(self.fieldnames, values))
+            if len(values) < width:
+                for key in self.fieldnames[len(values):]:
+                    row[key] = None
+            elif len(values) > width:
+                row[None] = values[width:]
+            yield row
+
+
+def _cast_loss(kind: str, value: Any) -> Optional[str]:
+    """Why a cast of a non-empty CSV value lost it, or None if it was understood.
+    
+    Most casts return None for values they do not understand instead of raising.
+    """
+    if value is None:
+        return f"not understood as {kind.rstrip('?')}, stored as NULL"
+    return None
+
+
+class ColumnStats:
+    """Cast outcome counters of one column during a dry run."""
+    
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.filled = 0      # non-empty CSV values
+        self.casted = 0      # non-empty values the cast understood
+        self.nulls = 0       # rows that would store NULL
+        self.defaulted = 0   # empty values replaced by the column default
+        self.failures = 0
+        self.samples: List[Tuple[int, str, str]] = []  # (row number, raw value, reason)
+    
+    def fail(self, row: int, raw: Any, reason: str) -> None:
+        self.failures += 1
+        if len(self.samples) < DRY_RUN_SAMPLES:
+            self.samples.append((row, raw, reason))
+
+
+class TableProfile:
+    """Per-column statistics of a CSV file run through a table's RowConverter, without a database."""
+    
+    def __init__(self, converter: RowConverter):
+        self.converter = converter
+        self.rows = 0
+        self.rejected = 0  # rows a real import would report as failed
+        self.columns = [ColumnStats(col, kind) for col, kind in zip(converter.columns, converter.kinds)]
+    
+    def add(self, row_number: int, values: Sequence[Any]) -> None:
+        """Cast one record cell by cell, as RowConverter does, and count the outcomes."""
+        self.rows += 1
+        n = len(values)
+        rejected = False
+        for stats, (idx, cast, default) in zip(self.columns, self.converter._slots):
+            raw = values[idx] if 0 <= idx < n else None
+            empty = raw is None or raw == ''
+            if empty and default is not _NO_DEFAULT:
+                stats.defaulted += 1
+                continue
+            if not empty:
+                stats.filled += 1
+            try:
+                value = cast(raw)
+            except ValueError as e:
+                stats.fail(row_number, raw, str(e))
+                rejected = True
+                continue
+            if value is None:
+                stats.nulls += 1
+            if empty:
+                continue
+            reason = _cast_loss(stats.kind, value)
+            if reason:
+                stats.fail(row_number, raw, reason)
+            else:
+                stats.casted += 1
+        if rejected:
+            self.rejected += 1
+    
+    @property
+    def failures(self) -> int:
+        return sum(stats.failures for stats in self.columns)
+    
+    def report(self, missing_required: Sequence[str] = ()) -> None:
+        """Print the header checks and the per-column statistics."""
+        converter = self.converter
+        if missing_required:
+            print(f"   ❌ Missing required columns (the import skips the table): {', '.join(missing_required)}")
+        if converter.unknown:
+            print(f"   ⚠️  Unknown headers (dropped): {', '.join(converter.unknown)}")
+        if converter.skipped:
+            print(f"   ⚠️  Skipped headers: {', '.join(converter.skipped)}")
+        defaulted = [col for col in converter.missing if col not in missing_required]
+        if defaulted:
+            print(f"   ℹ️  Not in CSV (DB default): {', '.join(defaulted)}")
+        print(f"   {'column':<26} {'type':<16} {'filled':>8} {'cast ok':>8} {'null':>7} {'default':>8} {'failed':>7}")
+        for stats in self.columns:
+            cast_rate = f"{stats.casted / stats.filled:.1%}" if stats.filled else '-'
+            null_rate = f"{stats.nulls / self.rows:.1%}" if self.rows else '-'
+            mark = '❌' if stats.failures else '  '
+            print(f"{mark} {stats.name:<26} {stats.kind:<16} {stats.filled:>8} {cast_rate:>8} "
+                  f"{null_rate:>7} {stats.defaulted:>8} {stats.failures:>7}")
+            for row, raw, reason in stats.samples:
+                print(f"        row {row}: {raw!r} ({reason})")
+
+
+def dry_run(tables: Sequence[str] = IMPORT_ORDER) -> bool:
+    """Validate the CSV files of `tables` against SCHEMA without touching the database.
+    
+    Every record goes through the same casts as an import and the per-column
+    results are printed. Returns True when no value would be rejected or lost.
+    """
+    ok = True
+    total_rows = 0
+    for table in tables:
+        filepath = find_csv(CSV_DIR, f'{table}.csv')
+        print(f"\n📋 {table}")
+        if not filepath:
+            print(f"   ⚠️  File not found: {os.path.join(CSV_DIR, f'{table}.csv')}")
+            continue
+        stream = CsvStream(filepath)
+        if not stream.fieldnames:
+            print(f"   ⚠️  {filepath} has no header row")
+            ok = False
+            continue
+        # As import_table, which does not import a table missing a required column
+        required = COLUMN_MAPPINGS.get(table, {}).get('required', [])
+        missing_required = [col for col in required if col not in stream.fieldnames]
+        formats = stream.timestamp_formats(table)
+        profile = TableProfile(compile_converter(table, tuple(stream.fieldnames), formats))
+        for row_number, values in enumerate(stream.records(), start=1):
+            profile.add(row_number, values)
+        print(f"   {profile.rows} rows ({stream.encoding}, delimiter {stream.delimiter!r}), "
+              f"{profile.rejected} would be rejected")
+        if formats:
+            print(f"   🕒 Timestamp formats: {', '.join(f'{col}={fmt}' for col, fmt in formats)}")
+        profile.report(missing_required)
+        total_rows += profile.rows
+        if profile.failures or profile.converter.unknown or missing_required:
+            ok = False
+    print(f"\n{'✅' if ok else '❌'} Dry run checked {total_rows} rows"
+          + ('' if ok else ' and found problems'))
+    return ok
+
+
+class DatabaseImporter:
+    """Handles CSV import into PostgreSQL database."""
+    
+    def __init__(self, config: Dict[str, Any], use_copy: bool = True,
+                 batch_size: int = INSERT_BATCH_SIZE, workers: int = IMPORT_WORKERS,
+                 shard_workers: int = SHARD_WORKERS, bcrypt_rounds: int = BCRYPT_ROUNDS,
+                 incremental: bool = False, prune: bool = False, resume: bool = False,
+                 use_cache: bool = True, defer_indexes: bool = False, server_cast: bool = False,
+                 orphans: str = 'reject', dedup: Optional[str] = None, rejects_dir: Optional[str] = None,
+                 async_pipeline: bool = False, profile: Optional[str] = None, replace_partitions: bool = False):
+        """Initialize the importer with database configuration."""
+        self.config = config
+        self.use_copy = use_copy
+        self.batch_size = batch_size
+        self.workers = workers
+        self.shard_workers = shard_workers
+        self.bcrypt_rounds = bcrypt_rounds
+        self.incremental = incremental
+        self.prune = prune
+        self.resume = resume
+        self.use_cache = use_cache
+        self.defer_indexes_during_load = defer_indexes
+        self.server_cast = server_cast
+        self.orphans = orphans
+        self.async_pipeline = async_pipeline
+        self.replace_partitions = replace_partitions
+        # Connections COPYing into the partitions of a PARTITION_KEYS table
+        self.partition_workers = shard_workers if shard_workers > 1 else PARTITION_WORKERS
+        self.profile = profile
+        # Connections of a --profile load come from a pool shared with the importers spawned from this one
+        self.pool: Optional[ThreadedConnectionPool] = None
+        self._owns_pool = False
+        if profile:
+            self._fit_connections(LOAD_PROFILES[profile]['max_connections'])
+        self.dedup = Deduplicator(dedup) if dedup else None
+        self.rejects = RejectLog(rejects_dir or _state_path('rejects'))
+        self.manifest = FingerprintManifest()
+        self.checkpoint: Optional[ImportCheckpoint] = None
+        self.metrics = ImportMetrics()
+        self._failed_rows: List[int] = []
+        self._unchanged_rows = 0
+        self._delta_lock = threading.Lock()
+        self._hash_pool: Optional[ThreadPoolExecutor] = None
+        self._hash_pool_lock = threading.Lock()
+        self.conn: Optional[connection] = None
+        self.cur: Optional[cursor] = None
+        
+    def connections_needed(self) -> int:
+        """Most connections this importer and the ones it spawns hold at once."""
+        if self.shard_workers > 1:
+            writers = self.shard_workers
+        else:
+            # The writers of the --async pipeline, psycopg2 or asyncpg connections alike
+            writers = PIPELINE_WRITERS if self.async_pipeline else 0
+        # Whether a PARTITION_KEYS table is partitioned is only known once it is imported
+        writers = max(writers, self.partition_workers)
+        # The connection of each table import and the writers of its shards or partitions
+        tables = self.workers * (1 + writers) if self.workers > 1 else writers
+        # Indexes are rebuilt on `workers` connections next to this one
+        return 1 + max(tables, self.workers)
+    
+    def _fit_connections(self, limit: Optional[int]) -> None:
+        """Lower the concurrency of the load until it fits in `limit` connections."""
+        if not limit or self.connections_needed() <= limit:
+            return
+        async_pipeline = self.async_pipeline
+        while self.connections_needed() > limit:
+            if self.workers > 1:
+                self.workers -= 1
+            elif self.shard_workers > 1:
+                self.shard_workers -= 1
+            elif self.async_pipeline:
+                self.async_pipeline = False
+            elif self.partition_workers > 1:
+                self.partition_workers -= 1
+            else:
+                break
+        print(f"🐢 Load profile {self.profile} allows {limit} connection(s): "
+              f"{self.workers} table worker(s), {self.shard_workers} shard worker(s), "
+              f"{self.partition_workers} partition writer(s)"
+              f"{', without --async' if async_pipeline and not self.async_pipeline else ''}")
+    
+    def _session_options(self) -> Dict[str, str]:
+        """libpq `options` setting the session parameters of the load profile on connect."""
+        if not self.profile:
+            return {}
+        settings = LOAD_PROFILES[self.profile]['settings']
+        options = [self.config['options']] if self.config.get('options') else []
+        options.extend(f"-c {name}={value}" for name, value in settings.items())
+        return {'options': ' '.join(options)}
+    
+    def connect(self) -> None:
+        """Establish database connection.
+        
+        With a load profile, connections come from a pool created by the first
+        importer that connects and shared with the importers it spawns.
+        """
+        try:
+            if self.profile and self.pool is None:
+                self.pool = ThreadedConnectionPool(1, self.connections_needed(),
+                                                   **dict(self.config, **self._session_options()))
+                self._owns_pool = True
+                settings = LOAD_PROFILES[self.profile]['settings']
+                print(f"⚙️  Load profile {self.profile}: "
+                      + ', '.join(f"{name}={value}" for name, value in settings.items()))
+            self.conn = self.pool.getconn() if self.pool else psycopg2.connect(**self.config)
+            self.cur = self.conn.cursor()
+            if self._owns_pool or not self.pool:
+                print(f"✅ Connected to database: {self.config['database']}")
+        except PoolError as e:
+            # Raised in the thread of a spawned importer, where exiting would not stop the load
+            raise PoolError(f"No free connection in the pool of load profile {self.profile} "
+                            f"({self.pool.maxconn} connections): {e}") from e
+        except Exception as e:
+            print(f"❌ Database connection failed: {e}")
+            sys.exit(1)
+    
+    def disconnect(self) -> None:
+        """Close database connection (or hand it back to the pool)."""
+        if self._hash_pool:
+            self._hash_pool.shutdown()
+            self._hash_pool = None
+        if self.cur:
+            self.cur.close()
+            self.cur = None
+        if self.conn:
+            if self.pool:
+                # The pool rolls back whatever transaction is left open
+                self.pool.putconn(self.conn)
+            else:
+                self.conn.close()
+                print("✅ Database connection closed")
+            self.conn = None
+        if self._owns_pool:
+            self.pool.closeall()
+            self.pool = None
+            self._owns_pool = False
+            print("✅ Database connections closed")
+    
+    def read_csv(self, filename: str) -> Optional[CsvStream]:
+        """Open a CSV file (or its .gz/.zst version) as a lazily parsed stream of rows (dictionaries)."""
+        filepath = find_csv(CSV_DIR, filename)
+        
+        if not filepath:
+            print(f"⚠️  File not found: {os.path.join(CSV_DIR, filename)}")
+            return None
+        filename = os.path.basename(filepath)
+        
+        try:
+            stream = CsvStream(filepath)
+        except Exception as e:
+            print(f"❌ Error reading {filename}: {e}")
+            return None
+        
+        if not stream.fieldnames:
+            print(f"❌ Error reading {filename}: no header row")
+            return None
+        
+        print(f"📄 Reading {filename} (encoding: {stream.encoding}, delimiter: '{stream.delimiter}')")
+        return stream
+    
+    def prepare_row(self, row: Dict[str, Any], table: str) -> Dict[str, Any]:
+        """Prepare row data for insertion: whitelist columns, apply defaults, cast values."""
+        converter = compile_converter(table, tuple(row.keys()))
+        return dict(zip(converter.columns, converter(list(row.values()))))
+    
+    def _bcrypt(self, password: str) -> str:
+        started = time.perf_counter()
+        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.bcrypt_rounds)).decode('utf-8')
+        self.metrics.add('users', 'hash', time.perf_counter() - started, 1)
+        return hashed
+    
+    def hash_password(self, password: Any, label: Any = 'user') -> Any:
+        """Return the bcrypt hash of a plain text password (hashes are returned unchanged)."""
+        if not password:
+            return password
+        pwd = str(password)
+        # Check if password is already hashed (bcrypt hashes start with $2a$, $2b$, or $2y$)
+        if not pwd.startswith('$2'):
+            if HAS_BCRYPT:
+                # Hash the plain text password
+                print(f"  🔐 Hashed password for {label}")
+                return self._bcrypt(pwd)
+            print(f"  ⚠️  Cannot hash password for {label} - bcrypt not installed")
+        return password
+    
+    def insert_row(self, table: str, data: Dict[str, Any]) -> bool:
+        """Insert a single row into the specified table."""
+        if not self.cur or not self.conn:
+            print("❌ No database connection")
+            return False
+        
+        if table == 'users' and 'password' in data:
+            data['password'] = self.hash_password(data['password'], data.get('email', 'user'))
+        columns = [col for col in SCHEMA.get(table, {}) if col in data]
+        row = tuple(data[col] for col in columns)
+        return self.write_batch(table, columns, [(0, row)], use_copy=False) == 1
+    
+    def copy_rows(self, table: str, columns: List[str], rows: List[Sequence[Any]]) -> None:
+        """Stream already prepared rows into a table with a single COPY ... FROM STDIN."""
+        buf = _copy_buffer(rows)
+        query = sql.SQL("COPY {} ({}) FROM STDIN").format(
+            sql.Identifier(table),
+            sql.SQL(', ').join(map(sql.Identifier, columns))
+        )
+        self.cur.copy_expert(query, buf)
+    
+    def insert_rows(self, table: str, columns: List[str], rows: List[Sequence[Any]]) -> None:
+        """Insert already prepared rows with a single multi-row INSERT.
+        
+        In incremental mode rows whose id already exists are updated instead
+        (ON CONFLICT (id) DO UPDATE), keeping their original createdAt.
+        """
+        query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+            sql.Identifier(table),
+            sql.SQL(', ').join(map(sql.Identifier, columns))
+        )
+        updates = [col for col in columns if col not in ('id', 'createdAt')]
+        if self.incremental and 'id' in columns and updates:
+            query += sql.SQL(" ON CONFLICT (id) DO UPDATE SET {}").format(
+                sql.SQL(', ').join(sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(col))
+                                   for col in updates)
+            )
+        execute_values(self.cur, query, rows, page_size=len(rows))
+    
+    def _send_rows(self, table: str, columns: List[str], rows: List[Sequence[Any]], use_copy: bool) -> None:
+        """Send prepared rows with COPY or a multi-row INSERT.
+        
+        Rows without an id are sent in a separate statement that omits the column,
+        so the DB default generates it.
+        """
+        send = self.copy_rows if use_copy else self.insert_rows
+        for group_columns, group_rows in _id_groups(columns, rows):
+            send(table, group_columns, group_rows)
+    
+    def write_batch(self, table: str, columns: List[str], batch: List[Tuple[int, Sequence[Any]]],
+                    use_copy: bool, into: Optional[str] = None) -> int:
+        """Write (row number, prepared row) pairs inside a SAVEPOINT. Returns the number of rows stored.
+        
+        When the batch fails, it is rolled back to its savepoint and split in two
+        halves that are retried the same way, so a single bad row costs O(log n)
+        extra statements and every other row of the batch is kept. Rows go to
+        `into` (e.g. a partition of the table) when given.
+        """
+        self.cur.execute("SAVEPOINT import_batch")
+        try:
+            self._send_rows(into or table, columns, [row for _, row in batch], use_copy)
+            self.cur.execute("RELEASE SAVEPOINT import_batch")
+            return len(batch)
+        except Exception as e:
+            self.cur.execute("ROLLBACK TO SAVEPOINT import_batch")
+            self.cur.execute("RELEASE SAVEPOINT import_batch")
+            if len(batch) == 1:
+                idx, row = batch[0]
+                self._failed_rows.append(idx)
+                if idx:
+                    self.rejects.add(table, idx, type(e).__name__, str(e))
+                else:
+                    print(f"❌ Error inserting row into {table}: {e}")
+                    print(f"   Data: {dict(zip(columns, row))}")
+                return 0
+        
+        mid = len(batch) // 2
+        return (self.write_batch(table, columns, batch[:mid], use_copy, into)
+                + self.write_batch(table, columns, batch[mid:], use_copy, into))
+    
+    def _prepare_shard(self, table: str, columns: List[str],
+                       rows: List[Tuple[int, Tuple[Any, ...]]]) -> List[Tuple[int, Tuple[Any, ...]]]:
+        """Start the per-row transforms that run after casting, ahead of the shard's write.
+        
+        For users, every plain text password is submitted to a bcrypt thread pool and
+        replaced by its Future, which write_shard resolves. Empty passwords and values
+        that are already bcrypt hashes ($2...) are left as they are.
+        """
+        if table != 'users' or 'password' not in columns:
+            return rows
+        password_index = columns.index('password')
+        if not HAS_BCRYPT:
+            print(f"  ⚠️  Cannot hash passwords for {table} - bcrypt not installed")
+            return rows
+        
+        with self._hash_pool_lock:
+            if self._hash_pool is None:
+                self._hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+        prepared = []
+        for idx, row in rows:
+            pwd = row[password_index]
+            if pwd and not pwd.startswith('$2'):
+                future = self._hash_pool.submit(self._bcrypt, pwd)
+                row = row[:password_index] + (future,) + row[password_index + 1:]
+            prepared.append((idx, row))
+        return prepared
+    
+    def _finish_shard(self, table: str, columns: List[str],
+                      rows: List[Tuple[int, Tuple[Any, ...]]]) -> List[Tuple[int, Tuple[Any, ...]]]:
+        """Wait for the password hashes submitted by _prepare_shard and put them in the rows."""
+        if table != 'users' or 'password' not in columns:
+            return rows
+        password_index = columns.index('password')
+        finished = []
+        hashed = 0
+        for idx, row in rows:
+            pwd = row[password_index]
+            if isinstance(pwd, Future):
+                row = row[:password_index] + (pwd.result(),) + row[password_index + 1:]
+                hashed += 1
+            finished.append((idx, row))
+        if hashed:
+            print(f"  🔐 Hashed {hashed} password(s) for {table}")
+        return finished
+    
+    def select_delta(self, table: str, fieldnames: Tuple[str, ...], rows: List[Tuple[int, Tuple[Any, ...]]],
+                     seen_ids: Set[str]
+                     ) -> Tuple[List[Tuple[int, Tuple[Any, ...]]], Dict[int, Tuple[Optional[str], str]]]:
+        """Keep only the rows that are new or changed since the fingerprints in the manifest.
+        
+        Returns those rows and their (id, fingerprint) by row number, to be recorded
+        once written. Every id seen is added to `seen_ids`. Rows without an id are
+        kept unless an earlier run stored a row with the same content (id None).
+        """
+        converter = compile_converter(table, fieldnames)
+        known = self.manifest.table(table)
+        id_index = converter.id_index
+        changed = []
+        fingerprints: Dict[int, Tuple[Optional[str], str]] = {}
+        for idx, row in rows:
+            row_id = row[id_index] if id_index >= 0 else None
+            fp = converter.fingerprint(row)
+            if row_id is None:
+                if not self.manifest.match_content(table, fp):
+                    changed.append((idx, row))
+                    fingerprints[idx] = (None, fp)
+                continue
+            seen_ids.add(row_id)
+            if known.get(row_id) != fp:
+                changed.append((idx, row))
+                fingerprints[idx] = (row_id, fp)
+        with self._delta_lock:
+            self._unchanged_rows += len(rows) - len(changed)
+        return changed, fingerprints
+    
+    def write_shard(self, table: str, columns: List[str], rows: List[Tuple[int, Tuple[Any, ...]]],
+                    errors: List[Tuple[int, str]], use_copy: bool,
+                    fingerprints: Optional[Dict[int, Tuple[Optional[str], str]]] = None,
+                    wait_turn: Optional[Callable[[], bool]] = None, into: Optional[str] = None) -> int:
+        """Log cast errors as rejects, write a prepared shard and commit it. Returns the number of rows stored.
+        
+        If given, wait_turn() is called before the commit; when it returns False the
+        shard is rolled back instead. Fingerprints of the rows that were stored are
+        recorded in the manifest after the commit. `into` is passed to write_batch().
+        """
+        for idx, error in errors:
+            self.rejects.add(table, idx, 'ValueError', error)
+        
+        rows = self._finish_shard(table, columns, rows)
+        self._failed_rows = []
+        started = time.perf_counter()
+        stored = self.write_batch(table, columns, rows, use_copy, into) if rows else 0
+        self.metrics.add(table, 'write', time.perf_counter() - started, stored)
+        self.metrics.fail(table, len(errors) + len(self._failed_rows))
+        if wait_turn and not wait_turn():
+            self.conn.rollback()
+            raise RuntimeError(f"Shard of {table} rolled back after an earlier shard failed")
+        started = time.perf_counter()
+        self.conn.commit()
+        self.metrics.add(table, 'commit', time.perf_counter() - started)
+        
+        if fingerprints:
+            known = self.manifest.table(table)
+            for idx in self._failed_rows:
+                fingerprints.pop(idx, None)
+            for row_id, fp in fingerprints.values():
+                if row_id is None:
+                    self.manifest.add_content(table, fp)
+                else:
+                    known[row_id] = fp
+        return stored
+    
+    def prune_table(self, table: str, seen_ids: Set[str]) -> int:
+        """Delete rows imported by an earlier run whose id is no longer in the CSV file."""
+        known = self.manifest.table(table)
+        vanished = [row_id for row_id in known if row_id not in seen_ids]
+        if not vanished:
+            return 0
+        try:
+            self.cur.execute(
+                sql.SQL("DELETE FROM {} WHERE id = ANY(%s::uuid[])").format(sql.Identifier(table)),
+                (vanished,)
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"❌ Error deleting vanished rows from {table}: {e}")
+            return 0
+        for row_id in vanished:
+            del known[row_id]
+        print(f"🗑️  Deleted {len(vanished)} vanished rows from {table}")
+        return len(vanished)
+    
+    def _spawn(self) -> 'DatabaseImporter':
+        """Create an importer with the same settings, for use on another connection."""
+        importer = DatabaseImporter(self.config, use_copy=self.use_copy, batch_size=self.batch_size,
+                                    workers=1, shard_workers=1, bcrypt_rounds=self.bcrypt_rounds,
+                                    incremental=self.incremental, prune=self.prune, resume=self.resume,
+                                    use_cache=self.use_cache, server_cast=self.server_cast,
+                                    orphans=self.orphans, replace_partitions=self.replace_partitions,
+                                    async_pipeline=self.async_pipeline)
+        importer.partition_workers = self.partition_workers
+        importer.profile = self.profile
+        importer.pool = self.pool
+        importer.dedup = self.dedup
+        importer.rejects = self.rejects
+        importer.manifest = self.manifest
+        importer.checkpoint = self.checkpoint
+        importer.metrics = self.metrics
+        return importer
+    
+    def _load_shards_parallel(self, table: str, fieldnames: Tuple[str, ...], columns: List[str],
+                              shards: Iterable[List[Tuple[int, List[str]]]], use_copy: bool,
+                              seen_ids: Set[str], on_commit: Callable[[int, int], None],
+                              ends: Callable[[List[Tuple[int, List[str]]]], Tuple[int, int]],
+                              timestamp_formats: Tuple[Tuple[str, str], ...] = (),
+                              staging: Optional[StagingCache] = None,
+                              references: Optional[ReferenceCheck] = None) -> int:
+        """Cast shards in a process pool and write them over `shard_workers` connections.
+        
+        Shards are cast and written concurrently, but each one goes through the
+        same cast_shard/write_shard steps as a serial load, so the stored rows and
+        error counts match it. At most twice `shard_workers` shards are in flight.
+        
+        Commits happen in shard order: a writer waits for the previous shard's
+        commit before its own, and rolls back if an earlier shard failed. Committed
+        data is therefore always a prefix of the file, which on_commit(stored, end)
+        checkpoints as results are collected.
+        """
+        local = threading.local()
+        writers: List[DatabaseImporter] = []
+        writers_lock = threading.Lock()
+        
+        aborted = threading.Event()
+        
+        def write(cast_future: Future, previous: Optional[threading.Event], committed: threading.Event,
+                  first_row: int, end: Tuple[int, int]) -> int:
+            def wait_turn() -> bool:
+                if previous:
+                    previous.wait()
+                return not aborted.is_set()
+            
+            try:
+                writer = getattr(local, 'importer', None)
+                if writer is None:
+                    writer = local.importer = self._spawn()
+                    writer.connect()
+                    with writers_lock:
+                        writers.append(writer)
+                rows, errors, seconds = cast_future.result()
+                self.metrics.add(table, 'cast', seconds, len(rows) + len(errors))
+                if staging:
+                    staging.add(rows, errors, end, first_row)
+                rows, errors = self.check_shard(table, columns, rows, errors, references)
+                fingerprints = None
+                if self.incremental:
+                    rows, fingerprints = self.select_delta(table, fieldnames, rows, seen_ids)
+                rows = self._prepare_shard(table, columns, rows)
+                return writer.write_shard(table, columns, rows, errors, use_copy, fingerprints, wait_turn)
+            except BaseException:
+                aborted.set()
+                raise
+            finally:
+                committed.set()
+        
+        success_count = 0
+        in_flight: deque = deque()
+        previous: Optional[threading.Event] = None
+        try:
+            with ProcessPoolExecutor(max_workers=self.shard_workers) as casters, \
+                    ThreadPoolExecutor(max_workers=self.shard_workers) as writer_pool:
+                for shard in shards:
+                    committed = threading.Event()
+                    cast_future = casters.submit(timed_cast_shard, table, fieldnames, shard, timestamp_formats)
+                    end = ends(shard)
+                    in_flight.append((writer_pool.submit(write, cast_future, previous, committed, shard[0][0], end), end))
+                    previous = committed
+                    if len(in_flight) >= 2 * self.shard_workers:
+                        future, end = in_flight.popleft()
+                        success_count += future.result()
+                        on_commit(success_count, end)
+                while in_flight:
+                    future, end = in_flight.popleft()
+                    success_count += future.result()
+                    on_commit(success_count, end)
+        finally:
+            for writer in writers:
+                writer.disconnect()
+        return success_count
+    
+    def _load_shards_async(self, table: str, fieldnames: Tuple[str, ...], columns: List[str],
+                           shards: Iterable[List[Tuple[int, List[str]]]], use_copy: bool,
+                           seen_ids: Set[str], on_commit: Callable[[int, Tuple[int, int]], None],
+                           ends: Callable[[List[Tuple[int, List[str]]]], Tuple[int, int]],
+                           timestamp_formats: Tuple[Tuple[str, str], ...] = (),
+                           staging: Optional[StagingCache] = None,
+                           references: Optional[ReferenceCheck] = None) -> int:
+        """Load a table through an asyncio pipeline of reader, caster and writer stages (--async).
+        
+        The reader parses shards in a thread and hands them to a process pool for
+        casting; the pending casts go through a bounded queue to the writers, so at
+        most PIPELINE_QUEUE_DEPTH shards per writer are held in memory and the
+        reader waits when the writers fall behind. Each writer owns a connection:
+        one of an asyncpg pool when asyncpg is installed and rows are COPYed,
+        otherwise a psycopg2 connection driven from a worker thread.
+        
+        As in _load_shards_parallel, shards are committed in file order and each
+        goes through the same check and write steps as a serial load.
+        """
+        return asyncio.run(self._pipeline(table, fieldnames, columns, shards, use_copy, seen_ids, on_commit,
+                                          ends, timestamp_formats, staging, references))
+    
+    async def _pipeline(self, table: str, fieldnames: Tuple[str, ...], columns: List[str],
+                        shards: Iterable[List[Tuple[int, List[str]]]], use_copy: bool,
+                        seen_ids: Set[str], on_commit: Callable[[int, Tuple[int, int]], None],
+                        ends: Callable[[List[Tuple[int, List[str]]]], Tuple[int, int]],
+                        timestamp_formats: Tuple[Tuple[str, str], ...],
+                        staging: Optional[StagingCache], references: Optional[ReferenceCheck]) -> int:
+        loop = asyncio.get_running_loop()
+        writers = self.shard_workers if self.shard_workers > 1 else PIPELINE_WRITERS
+        queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_DEPTH * writers)
+        # Set once a stage failed: later shards are rolled back (or skipped) instead of committed
+        aborted = threading.Event()
+        failures: List[BaseException] = []
+        committed: List[asyncio.Event] = []
+        results: Dict[int, Tuple[int, Tuple[int, int]]] = {}
+        totals = {'next': 0, 'stored': 0}
+        
+        async def read(casters: ProcessPoolExecutor) -> None:
+            it = iter(shards)
+            try:
+                while not aborted.is_set():
+                    shard = await loop.run_in_executor(None, next, it, None)
+                    if shard is None:
+                        break
+                    end = ends(shard)
+                    cast = loop.run_in_executor(casters, timed_cast_shard, table, fieldnames, shard, timestamp_formats)
+                    committed.append(asyncio.Event())
+                    await queue.put((len(committed) - 1, cast, shard[0][0], end))
+            except BaseException as e:
+                aborted.set()
+                failures.append(e)
+            finally:
+                for _ in range(writers):
+                    await queue.put(None)
+        
+        async def write(send: Callable[..., Any]) -> None:
+            # Failed and skipped shards are still taken off the queue, so the reader never blocks for good
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                seq, cast, first_row, end = item
+                try:
+                    if aborted.is_set():
+                        cast.cancel()
+                        continue
+                    rows, errors, seconds = await cast
+                    self.metrics.add(table, 'cast', seconds, len(rows) + len(errors))
+                    if staging:
+                        staging.add(rows, errors, end, first_row)
+                    rows, errors = self.check_shard(table, columns, rows, errors, references)
+                    fingerprints = None
+                    if self.incremental:
+                        rows, fingerprints = self.select_delta(table, fieldnames, rows, seen_ids)
+                    rows = self._prepare_shard(table, columns, rows)
+                    results[seq] = (await send(rows, errors, fingerprints, committed[seq - 1] if seq else None), end)
+                    # Commits happen in shard order, but their writers may resume in any order
+                    while totals['next'] in results:
+                        stored, shard_end = results.pop(totals['next'])
+                        totals['stored'] += stored
+                        totals['next'] += 1
+                        on_commit(totals['stored'], shard_end)
+                except BaseException as e:
+                    aborted.set()
+                    failures.append(e)
+                finally:
+                    committed[seq].set()
+        
+        def wait_turn(previous: Optional[asyncio.Event]) -> bool:
+            # Called from a writer thread, before the commit of its shard
+            if previous:
+                asyncio.run_coroutine_threadsafe(previous.wait(), loop).result()
+            return not aborted.is_set()
+        
+        with ProcessPoolExecutor(max_workers=writers) as casters:
+            if HAS_ASYNCPG and use_copy:
+                # Counted in connections_needed(), though not taken from self.pool
+                settings = LOAD_PROFILES[self.profile]['settings'] if self.profile else {}
+                async with asyncpg.create_pool(min_size=writers, max_size=writers,
+                                               **_asyncpg_config(self.config, settings)) as pool:
+                    async def write_on_pool() -> None:
+                        async with pool.acquire() as con:
+                            await write(functools.partial(self._write_shard_async, con, table, columns, aborted))
+                    
+                    await asyncio.gather(read(casters), *(write_on_pool() for _ in range(writers)))
+            else:
+                spawned = [self._spawn() for _ in range(writers)]
+                with ThreadPoolExecutor(max_workers=writers) as threads:
+                    try:
+                        for writer in spawned:
+                            await loop.run_in_executor(threads, writer.connect)
+                        
+                        def send_with(writer: 'DatabaseImporter') -> Callable[..., Any]:
+                            def send(rows: List[Tuple[int, Tuple[Any, ...]]], errors: List[Tuple[int, str]],
+                                     fingerprints: Optional[Dict[int, Tuple[Optional[str], str]]],
+                                     previous: Optional[asyncio.Event]) -> Any:
+                                return loop.run_in_executor(threads, functools.partial(
+                                    writer.write_shard, table, columns, rows, errors, use_copy, fingerprints,
+                                    functools.partial(wait_turn, previous)))
+                            return send
+                        
+                        await asyncio.gather(read(casters), *(write(send_with(writer)) for writer in spawned))
+                    finally:
+                        for writer in spawned:
+                            writer.disconnect()
+        if failures:
+            raise failures[0]
+        return totals['stored']
+    
+    async def _write_shard_async(self, con: Any, table: str, columns: List[str], aborted: threading.Event,
+                                 rows: List[Tuple[int, Tuple[Any, ...]]], errors: List[Tuple[int, str]],
+                                 fingerprints: Optional[Dict[int, Tuple[Optional[str], str]]],
+                                 previous: Optional[asyncio.Event]) -> int:
+        """write_shard() on an asyncpg connection: COPY a prepared shard and commit it after `previous`.
+        
+        Incremental loads do not COPY, so they never get here: their fingerprints
+        are recorded by write_shard() on the psycopg2 writers.
+        """
+        assert fingerprints is None, "incremental loads are written on psycopg2 connections"
+        for idx, error in errors:
+            self.rejects.add(table, idx, 'ValueError', error)
+        
+        rows = await asyncio.get_running_loop().run_in_executor(None, self._finish_shard, table, columns, rows)
+        failed: List[int] = []
+        transaction = con.transaction()
+        await transaction.start()
+        try:
+            started = time.perf_counter()
+            stored = await self._write_batch_async(con, table, columns, rows, failed) if rows else 0
+            self.metrics.add(table, 'write', time.perf_counter() - started, stored)
+            self.metrics.fail(table, len(errors) + len(failed))
+            if previous:
+                await previous.wait()
+            if aborted.is_set():
+                raise RuntimeError(f"Shard of {table} rolled back after an earlier shard failed")
+        except BaseException:
+            await transaction.rollback()
+            raise
+        started = time.perf_counter()
+        await transaction.commit()
+        self.metrics.add(table, 'commit', time.perf_counter() - started)
+        return stored
+    
+    async def _write_batch_async(self, con: Any, table: str, columns: List[str],
+                                 batch: List[Tuple[int, Sequence[Any]]], failed: List[int]) -> int:
+        """write_batch() on an asyncpg connection, whose nested transactions are savepoints."""
+        try:
+            async with con.transaction():
+                for group_columns, group_rows in _id_groups(columns, [row for _, row in batch]):
+                    data = _copy_buffer(group_rows).getvalue().encode('utf-8')
+                    await con.copy_to_table(table, source=io.BytesIO(data), columns=group_columns, format='text')
+            return len(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                idx = batch[0][0]
+                failed.append(idx)
+                # asyncpg names its errors like psycopg2's, with an Error suffix
+                name = type(e).__name__
+                self.rejects.add(table, idx, name[:-len('Error')] if name.endswith('ViolationError') else name, str(e))
+                return 0
+        
+        mid = len(batch) // 2
+        return (await self._write_batch_async(con, table, columns, batch[:mid], failed)
+                + await self._write_batch_async(con, table, columns, batch[mid:], failed))
+    
+    def _load_shards(self, table: str, fieldnames: Tuple[str, ...], columns: List[str],
+                     casted: Iterable[Tuple[Tuple[int, int], List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]]]],
+                     use_copy: bool, seen_ids: Set[str], on_commit: Callable[[int, Tuple[int, int]], None],
+                     references: Optional[ReferenceCheck] = None) -> int:
+        """Write casted (end, rows, errors) shards in order on this connection.
+        
+        One shard of lookahead: the next shard is cast (or read from the staging
+        cache) and its passwords are hashing while the current one is being written.
+        """
+        success_count = 0
+        previous = None
+        for end, rows, errors in casted:
+            rows, errors = self.check_shard(table, columns, rows, errors, references)
+            fingerprints = None
+            if self.incremental:
+                rows, fingerprints = self.select_delta(table, fieldnames, rows, seen_ids)
+            current = (end, (self._prepare_shard(table, columns, rows), errors, use_copy, fingerprints))
+            if previous:
+                success_count += self.write_shard(table, columns, *previous[1])
+                on_commit(success_count, previous[0])
+            previous = current
+        if previous:
+            success_count += self.write_shard(table, columns, *previous[1])
+            on_commit(success_count, previous[0])
+        return success_count
+    
+    def reference_check(self, table: str, stream: CsvStream, converter: RowConverter) -> Optional[ReferenceCheck]:
+        """Build the foreign key pre-check of a table, or None if it has no FOREIGN_KEYS column.
+        
+        Tables are imported (and committed) after the tables they reference, so
+        the ids of those are read from the database once, when the import of the
+        table starts. For a self reference (predefined_values.parentId) the ids of
+        the table's own CSV file are added too, as rows may reference later rows.
+        """
+        parents = sorted({FOREIGN_KEYS[col] for col in converter.columns if col in FOREIGN_KEYS})
+        if not parents:
+            return None
+        ids: Dict[str, Set[str]] = {}
+        for parent in parents:
+            self.cur.execute(sql.SQL("SELECT id::text FROM {}").format(sql.Identifier(parent)))
+            ids[parent] = {row_id for row_id, in self.cur.fetchall()}
+        self.conn.commit()
+        if table in ids and converter.id_index >= 0:
+            position = converter._slots[converter.id_index][0]
+            for values in CsvStream(stream.filepath).records():
+                row_id = ID_REGISTRY.derive(values[position]) if position < len(values) else None
+                if row_id:
+                    ids[table].add(row_id.lower())
+        return ReferenceCheck(table, converter.columns, ids, self.orphans)
+    
+    def find_duplicates(self, table: str, stream: CsvStream, converter: RowConverter) -> None:
+        """Scan a table's CSV file for rows repeating a natural key (--dedup), in a pass of its own."""
+        if not self.dedup or table not in DEDUP_KEYS:
+            return
+        started = time.perf_counter()
+        count = self.dedup.scan(table, CsvStream(stream.filepath).records(), converter)
+        self.metrics.add(table, 'dedup', time.perf_counter() - started)
+        if count:
+            print(f"🧹 Dropping {count} duplicate row(s) of {table} (same {', '.join(DEDUP_KEYS[table])}), "
+                  f"keeping the {self.dedup.keep} of each")
+    
+    def check_shard(self, table: str, columns: List[str], rows: List[Tuple[int, Tuple[Any, ...]]],
+                    errors: List[Tuple[int, str]], references: Optional[ReferenceCheck] = None
+                    ) -> Tuple[List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]]]:
+        """Drop duplicates and run the foreign key pre-check on a casted shard. Returns its rows and errors.
+        
+        Rows failing the pre-check are recorded as rejected here.
+        """
+        if not self.dedup and not references:
+            return rows, errors
+        started = time.perf_counter()
+        count = len(rows)
+        if self.dedup:
+            rows = self.dedup.apply(table, columns, rows)
+        if references:
+            rows, rejected, cleared = references(rows)
+            for idx, error in rejected:
+                self.rejects.add(table, idx, 'ForeignKeyViolation', error)
+            self.metrics.fail(table, len(rejected))
+            if cleared:
+                print(f"  🔗 Cleared {cleared} reference(s) to missing rows in {table}")
+        self.metrics.add(table, 'check', time.perf_counter() - started, count)
+        return rows, errors
+    
+    def reset_sequence(self, table: str) -> None:
+        """Reset the ID sequence for a table after importing with explicit IDs."""
+        if not self.cur or not self.conn:
+            return
+        
+        try:
+            # Get the sequence name (PostgreSQL convention: tablename_id_seq)
+            sequence_name = f"{table}_id_seq"
+            
+            # Reset sequence to max(id) + 1
+            self.cur.execute(
+                sql.SQL("SELECT setval({}, COALESCE((SELECT MAX(id) FROM {}), 1), true)").format(
+                    sql.Literal(sequence_name),
+                    sql.Identifier(table)
+                )
+            )
+            self.conn.commit()
+            print(f"🔄 Reset sequence for {table}")
+        except Exception as e:
+            # Sequence might not exist or table might not have id column
+            self.conn.rollback()
+    
+    def partition_key(self, table: str) -> Optional[str]:
+        """The PARTITION_KEYS column of a table if it is RANGE partitioned on it in the database."""
+        key = PARTITION_KEYS.get(table)
+        if not key:
+            return None
+        self.cur.execute("""
+            SELECT pt.partstrat, array_length(pt.partattrs::int2[], 1), a.attname
+            FROM pg_partitioned_table pt
+            JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+            WHERE pt.partrelid = %s::regclass
+        """, (sql.Identifier(table).as_string(self.conn),))
+        found = self.cur.fetchone()
+        self.conn.commit()
+        if found is None:
+            return None
+        if found != ('r', 1, key):
+            print(f"⚠️  {table} is not partitioned by range of {key}; loading it through the parent table")
+            return None
+        return key
+    
+    def _create_partition(self, table: str, month: date, existing: Set[str]) -> Optional[str]:
+        """Name of the monthly partition of `table` for `month`, created if missing.
+        
+        None when it cannot be created (e.g. another partition or the default one
+        already holds rows of the month): those rows are then routed by the parent.
+        """
+        name = f"{table}_{month:%Y_%m}"
+        if name in existing:
+            return name
+        try:
+            self.cur.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})").format(
+                sql.Identifier(name), sql.Identifier(table),
+                sql.Literal(month.isoformat()), sql.Literal(_next_month(month).isoformat())))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"⚠️  Could not create partition {name}, loading its rows through {table}: {e}")
+            return None
+        existing.add(name)
+        print(f"🗂️  Created partition {name}")
+        return name
+    
+    def _load_partitioned(self, table: str, columns: List[str], key: str,
+                          casted: Iterable[Tuple[Tuple[int, int], List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]]]],
+                          use_copy: bool, references: Optional[ReferenceCheck] = None,
+                          replace: bool = False, resumed: Optional[Dict[str, Any]] = None,
+                          on_commit: Optional[Callable[..., None]] = None) -> int:
+        """Route casted rows by the month of `key` into the partitions of a table, loaded in parallel.
+        
+        Rows are buffered per month and every full batch is COPYed straight into
+        its partition (created if missing) by one of `partition_workers` connections,
+        so partitions load concurrently and PostgreSQL does not route row by row.
+        
+        With `replace`, each month of the file is loaded into a new table instead
+        and swapped in for the month's partition once complete (see
+        _swap_partitions()), so the whole window is replaced, not appended to.
+        
+        The batches of a month are always written by the same connection, in file
+        order, so the rows of a month committed so far are those up to the last
+        row of its last committed batch. on_commit(stored, end, partitions) records
+        that row per month ('rows', '' for rows outside any month) and the months
+        swapped in ('swapped'); given back as `resumed` (with the CSV rows whose
+        rejects were already recorded as 'checked'), the rows and months already
+        loaded are skipped. Months loaded into a new table are only recorded once
+        swapped in: an interrupted month is loaded again from the start.
+        """
+        key_index = columns.index(key)
+        workers = self.partition_workers
+        shard_size = COPY_CHUNK_SIZE if use_copy else self.batch_size
+        self.cur.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+        """, (sql.Identifier(table).as_string(self.conn),))
+        existing = {name for name, in self.cur.fetchall()}
+        self.conn.commit()
+        # Per month: the table its rows are written to (None: the parent)
+        targets: Dict[Optional[date], Optional[str]] = {None: None}
+        pending: Dict[Optional[date], List[Tuple[int, Tuple[Any, ...]]]] = {}
+        # Per month: the writer its batches go to
+        lanes: Dict[Optional[date], int] = {}
+        
+        resumed = resumed or {}
+        checked_end: Tuple[int, int] = tuple(resumed.get('checked', (0, 0)))
+        rejected_through = checked_end[0]
+        committed: Dict[str, int] = dict(resumed.get('rows', {}))
+        swapped: List[str] = list(resumed.get('swapped', []))
+        # A replace loads the months not swapped in yet again from their first row
+        loaded = {label: row for label, row in committed.items() if not replace or label == ''}
+        done = set(swapped)
+        if loaded or done:
+            print(f"⏩ Skipping the rows of {table} committed by the interrupted run "
+                  f"({len(done or loaded)} month(s))")
+        
+        def already_loaded(idx: int, row: Tuple[Any, ...]) -> bool:
+            label = _month_label(_month_of(row[key_index]))
+            return label in done or idx <= loaded.get(label, 0)
+        stored = 0
+        written: Dict[Optional[date], int] = {}
+        state_lock = threading.Lock()
+        
+        def target(month: Optional[date]) -> Optional[str]:
+            if month not in targets:
+                targets[month] = (self._create_load_table(table, month) if replace
+                                  else self._create_partition(table, month, existing))
+            return targets[month]
+        
+        def record(count: int) -> None:
+            # Called with state_lock held
+            nonlocal stored
+            stored += count
+            if on_commit:
+                on_commit(stored, checked_end, partitions={'rows': dict(committed), 'swapped': list(swapped)})
+        
+        local = threading.local()
+        writers: List[DatabaseImporter] = []
+        writers_lock = threading.Lock()
+        
+        def write(month: Optional[date], rows: List[Tuple[int, Tuple[Any, ...]]]) -> int:
+            writer = getattr(local, 'importer', None)
+            if writer is None:
+                writer = local.importer = self._spawn()
+                writer.connect()
+                with writers_lock:
+                    writers.append(writer)
+            count = writer.write_shard(table, columns, rows, [], use_copy, into=targets[month])
+            with state_lock:
+                written[month] = written.get(month, 0) + count
+                if not (replace and month is not None):
+                    committed[_month_label(month)] = rows[-1][0]
+                    record(count)
+            return count
+        
+        success_count = 0
+        in_flight: deque = deque()
+        lane_pools = [ThreadPoolExecutor(max_workers=1) for _ in range(workers)]
+        try:
+            try:
+                def submit(month: Optional[date], rows: List[Tuple[int, Tuple[Any, ...]]]) -> None:
+                    nonlocal success_count
+                    target(month)
+                    lane = lanes.setdefault(month, len(lanes) % workers)
+                    in_flight.append(lane_pools[lane].submit(write, month, rows))
+                    if len(in_flight) >= 2 * workers:
+                        success_count += in_flight.popleft().result()
+                
+                for end, rows, errors in casted:
+                    if loaded or done:
+                        rows = [(idx, row) for idx, row in rows if not already_loaded(idx, row)]
+                    rows, errors = self.check_shard(table, columns, rows, errors, references)
+                    # Rejects of the rows checked by the interrupted run are already in the reject file
+                    errors = [(idx, error) for idx, error in errors if idx > rejected_through]
+                    for idx, error in errors:
+                        self.rejects.add(table, idx, 'ValueError', error)
+                    self.metrics.fail(table, len(errors))
+                    with state_lock:
+                        checked_end = max(checked_end, tuple(end))
+                    for idx, row in self._prepare_shard(table, columns, rows):
+                        month = _month_of(row[key_index])
+                        batch = pending.setdefault(month, [])
+                        batch.append((idx, row))
+                        if len(batch) >= shard_size:
+                            submit(month, pending.pop(month))
+                for month, rows in pending.items():
+                    submit(month, rows)
+                while in_flight:
+                    success_count += in_flight.popleft().result()
+            finally:
+                # Writes already queued finish before the load tables can be dropped
+                for lane_pool in lane_pools:
+                    lane_pool.shutdown()
+        except BaseException:
+            if replace:
+                self._drop_load_tables(table, targets)
+            raise
+        finally:
+            for writer in writers:
+                writer.disconnect()
+        if replace:
+            def on_swap(month: date) -> None:
+                with state_lock:
+                    swapped.append(_month_label(month))
+                    record(written.get(month, 0))
+            
+            failed = self._swap_partitions(table, targets, existing, on_swap)
+            if failed:
+                raise RuntimeError(f"Could not replace partition(s) {', '.join(failed)} of {table}; "
+                                   f"their rows were not loaded, run again with --resume to load them")
+        return success_count
+    
+    def _create_load_table(self, table: str, month: Optional[date]) -> Optional[str]:
+        """Create the table a month of `table` is loaded into before it is swapped in as its partition.
+        
+        It copies the columns, defaults and CHECKs of the table, plus a CHECK on the
+        month so attaching it does not have to scan it; its indexes are built by
+        the ATTACH. Rows outside any month (None) go through the parent table.
+        """
+        if month is None:
+            return None
+        key = PARTITION_KEYS[table]
+        name = f"{table}_{month:%Y_%m}_load"
+        self.cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(name)))
+        self.cur.execute(sql.SQL(
+            "CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+            "CONSTRAINT {} CHECK ({} IS NOT NULL AND {} >= {} AND {} < {}))"
+        ).format(sql.Identifier(name), sql.Identifier(table), sql.Identifier(f"{name}_month"),
+                 sql.Identifier(key), sql.Identifier(key), sql.Literal(month.isoformat()),
+                 sql.Identifier(key), sql.Literal(_next_month(month).isoformat())))
+        self.conn.commit()
+        return name
+    
+    def _drop_load_tables(self, table: str, targets: Dict[Optional[date], Optional[str]]) -> None:
+        self.conn.rollback()
+        for month, name in targets.items():
+            if month is not None and name:
+                self.cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(name)))
+        self.conn.commit()
+    
+    def _swap_partitions(self, table: str, targets: Dict[Optional[date], Optional[str]], existing: Set[str],
+                         on_swap: Optional[Callable[[date], None]] = None) -> List[str]:
+        """Swap each loaded month in for the partition of its month (--replace-partitions).
+        
+        In one transaction per month the old partition is detached and dropped and
+        the loaded table renamed and attached in its place, so readers see either
+        the old or the new month; on_swap(month) is called once it is committed.
+        Returns the partitions that failed to swap, whose loaded rows are dropped.
+        """
+        failed = []
+        for month, name in sorted((m, n) for m, n in targets.items() if m is not None):
+            partition = f"{table}_{month:%Y_%m}"
+            started = time.perf_counter()
+            try:
+                if partition in existing:
+                    self.cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                        sql.Identifier(table), sql.Identifier(partition)))
+                    self.cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+                self.cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                    sql.Identifier(name), sql.Identifier(partition)))
+                self.cur.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM ({}) TO ({})").format(
+                    sql.Identifier(table), sql.Identifier(partition),
+                    sql.Literal(month.isoformat()), sql.Literal(_next_month(month).isoformat())))
+                self.cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(
+                    sql.Identifier(partition), sql.Identifier(f"{name}_month")))
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                self.cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                self.conn.commit()
+                print(f"❌ Could not replace partition {partition}, keeping the old one: {e}")
+                failed.append(partition)
+                continue
+            existing.add(partition)
+            if on_swap:
+                on_swap(month)
+            self.metrics.add(table, 'swap', time.perf_counter() - started)
+            print(f"🔁 Replaced partition {partition}")
+        return failed
+    
+    def merge_from_staging(self, table: str, stream: CsvStream, converter: RowConverter,
+                           timestamp_formats: Tuple[Tuple[str, str], ...] = ()) -> Optional[int]:
+        """Import a CSV file with the casts done by PostgreSQL instead of Python (--server-cast).
+        
+        The file is copied as text into an UNLOGGED staging table, then cast and
+        inserted into the table by a single INSERT ... SELECT built from the
+        SERVER_CAST_FUNCTIONS; rows failing a cast are reported like Python cast
+        errors and left out. Everything runs in one transaction. Returns the number
+        of rows stored, or None if the set-based load failed (a constraint
+        violation, a malformed line...), in which case nothing was written.
+        """
+        stage = sql.Identifier(f'_import_stage_{table}')
+        staged = [sql.Identifier(f'c{i}') for i in range(len(stream.fieldnames))]
+        try:
+            self.cur.execute(SERVER_CAST_FUNCTIONS)
+            self.cur.execute(
+                "SELECT a.attname, format_type(a.atttypid, a.atttypmod), t.typcategory "
+                "FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid "
+                "WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped",
+                (sql.Identifier(table).as_string(self.conn),)
+            )
+            types = {name: (type_name, category) for name, type_name, category in self.cur.fetchall()}
+            
+            started = time.perf_counter()
+            self.cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(stage))
+            self.cur.execute(sql.SQL("CREATE UNLOGGED TABLE {} (line bigserial, {})").format(
+                stage, sql.SQL(', ').join(sql.SQL("{} text").format(c) for c in staged)))
+            errors = 'cp1252_fallback' if stream.encoding.startswith('utf-8') else 'strict'
+            with open(stream.filepath, 'r', encoding=stream.encoding, errors=errors, newline='') as f:
+                self.cur.copy_expert(
+                    sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, DELIMITER {}, HEADER true)").format(
+                        stage, sql.SQL(', ').join(staged), sql.Literal(stream.delimiter)), f)
+            copy_seconds = time.perf_counter() - started
+            
+            formats = dict(timestamp_formats)
+            # checks[i] gives the error of a row rejected by the cast of class classes[i]
+            values, checks, classes = [], [], []
+            for i, (col, kind, (idx, _, default)) in enumerate(zip(converter.columns, converter.kinds,
+                                                                   converter._slots)):
+                raw = staged[idx] if idx >= 0 else sql.NULL
+                expr, check = _server_cast(kind, raw, sql.Identifier(f'v{i}'), formats.get(col))
+                if default is not _NO_DEFAULT:
+                    expr = sql.SQL("CASE WHEN {0} IS NULL OR {0} = '' THEN {1} ELSE {2} END").format(
+                        raw, sql.Literal(default), expr)
+                    if check is not None:
+                        check = sql.SQL("CASE WHEN {} <> '' THEN {} END").format(raw, check)
+                type_name, category = types.get(col, ('text', 'S'))
+                if category != 'S':
+                    # Text has no assignment cast to enums or jsonb; literals sent by psycopg2 do
+                    expr = sql.SQL("({})::{}").format(expr, sql.SQL(type_name))
+                values.append(sql.SQL("{} AS {}").format(expr, sql.Identifier(f'v{i}')))
+                if check is not None:
+                    checks.append(check)
+                    classes.append('ValueError')
+            
+            # Foreign keys are checked after the casts, as by ReferenceCheck
+            outputs = [sql.Identifier(f'v{i}') for i in range(len(converter.columns))]
+            orphans = []
+            for i, col in enumerate(converter.columns):
+                parent = FOREIGN_KEYS.get(col)
+                if not parent:
+                    continue
+                value = sql.Identifier('typed', f'v{i}')
+                orphan = sql.SQL("{0} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {1} p WHERE p.id = {0})").format(
+                    value, sql.Identifier(parent))
+                if parent == table and converter.id_index >= 0:
+                    # Rows may reference rows of the same file
+                    orphan += sql.SQL(" AND NOT EXISTS (SELECT 1 FROM typed t WHERE t.{} = {})").format(
+                        sql.Identifier(f'v{converter.id_index}'), value)
+                if self.orphans == 'null':
+                    outputs[i] = sql.SQL("CASE WHEN {} THEN NULL ELSE {} END AS {}").format(
+                        orphan, value, sql.Identifier(f'v{i}'))
+                    orphans.append(sql.SQL("({})::int").format(orphan))
+                else:
+                    checks.append(sql.SQL("CASE WHEN {} THEN format('%s references a missing %s row: %s', {}, {}, {}) END").format(
+                        orphan, sql.Literal(col), sql.Literal(parent), value))
+                    classes.append('ForeignKeyViolation')
+            errors = sql.SQL("ARRAY[{}]::text[]").format(sql.SQL(', ').join(checks))
+            cleared = sql.SQL(' + ').join(orphans) if orphans else sql.SQL("0")
+            
+            def insert(name: str, positions: List[int], condition: sql.Composable) -> sql.Composable:
+                return sql.SQL("{} AS (INSERT INTO {} ({}) SELECT {} FROM casted WHERE NOT rejected{} RETURNING 1)").format(
+                    sql.Identifier(name), sql.Identifier(table),
+                    sql.SQL(', ').join(sql.Identifier(converter.columns[i]) for i in positions),
+                    sql.SQL(', ').join(sql.Identifier(f'v{i}') for i in positions), condition)
+            
+            # Rows without an id leave the column to its DB default, as in _send_rows
+            positions = list(range(len(converter.columns)))
+            if converter.id_index < 0:
+                inserts = {'stored': insert('stored', positions, sql.SQL(''))}
+            else:
+                id_value = sql.Identifier(f'v{converter.id_index}')
+                inserts = {
+                    'stored': insert('stored', positions, sql.SQL(" AND {} IS NOT NULL").format(id_value)),
+                    'stored_without_id': insert('stored_without_id',
+                                                [i for i in positions if i != converter.id_index],
+                                                sql.SQL(" AND {} IS NULL").format(id_value)),
+                }
+            # Values are cast once in `typed`; `casted` adds the errors of the rows a check rejects
+            started = time.perf_counter()
+            self.cur.execute(sql.SQL(
+                "WITH typed AS MATERIALIZED (SELECT line, {}, {} FROM {}), "
+                "checked AS MATERIALIZED (SELECT line, {}, {} AS errors, {} AS cleared FROM typed), "
+                "casted AS (SELECT *, num_nonnulls(VARIADIC errors) > 0 AS rejected FROM checked), {} "
+                "SELECT (SELECT count(*) FROM casted), {}, "
+                "ARRAY(SELECT ARRAY[line::text] || errors FROM casted WHERE rejected ORDER BY line), "
+                "(SELECT COALESCE(sum(cleared), 0) FROM casted WHERE NOT rejected)"
+            ).format(
+                sql.SQL(', ').join(staged), sql.SQL(', ').join(values), stage,
+                sql.SQL(', ').join(outputs), errors, cleared, sql.SQL(', ').join(inserts.values()),
+                sql.SQL(' + ').join(sql.SQL("(SELECT count(*) FROM {})").format(sql.Identifier(name))
+                                    for name in inserts)
+            ))
+            rows_read, stored, rejected, cleared = self.cur.fetchone()
+            self.cur.execute(sql.SQL("DROP TABLE {}").format(stage))
+            self.metrics.add(table, 'write', time.perf_counter() - started, stored)
+            started = time.perf_counter()
+            self.conn.commit()
+            self.metrics.add(table, 'commit', time.perf_counter() - started)
+        except Exception as e:
+            self.conn.rollback()
+            print(f"⚠️  Server-side cast of {table} failed, casting it in Python instead: {e}")
+            return None
+        
+        for line, *row_errors in rejected:
+            # Reported with the first failing check, as the Python casts stop at the first error
+            error_class, message = next((classes[i], message) for i, message in enumerate(row_errors) if message)
+            self.rejects.add(table, int(line), error_class, message)
+        if cleared:
+            print(f"  🔗 Cleared {cleared} reference(s) to missing rows in {table}")
+        nbytes = os.path.getsize(stream.filepath)
+        self.metrics.add(table, 'read', copy_seconds, rows_read, nbytes)
+        self.metrics.fail(table, len(rejected))
+        stream.rows_read, stream.offset = rows_read, nbytes
+        return stored
+
+    def import_table(self, table: str) -> int:
+        """Import all data from CSV file into specified table."""
+        print(f"\n📊 Importing {table}...")
+        started = time.perf_counter()
+        self.metrics.sample_rss(table)
+        
+        # Open CSV file as a stream; rows are parsed while they are imported
+        filename = f"{table}.csv"
+        stream = self.read_csv(filename)
+        
+        if stream is None:
+            print(f"⚠️  No data to import for {table}")
+            return 0
+        
+        # Validate required columns
+        mapping = COLUMN_MAPPINGS.get(table, {})
+        required = mapping.get('required', [])
+        
+        if required:
+            missing = [col for col in required if col not in stream.fieldnames]
+            if missing:
+                print(f"❌ Missing required columns for {table}: {missing}")
+                return 0
+        
+        # Resume after the last committed shard of an interrupted run
+        fingerprint = file_fingerprint(stream.filepath)
+        progress = self.checkpoint.get(table, fingerprint) if self.checkpoint and self.resume else None
+        if progress and progress['done']:
+            print(f"⏭️  {table} was already imported ({progress['stored']} rows)")
+            # References to its duplicates are still rewritten in the tables imported after it
+            self.find_duplicates(table, stream, compile_converter(table, tuple(stream.fieldnames),
+                                                                  stream.timestamp_formats(table)))
+            return progress['stored']
+        # A load into monthly partitions resumes from the start of the file, skipping what each month committed
+        partitions = progress.get('partitions') if progress else None
+        start_row = progress['rows'] if progress and partitions is None else 0
+        start_offset = progress['offset'] if progress and partitions is None else 0
+        stored_before = progress['stored'] if progress else 0
+        resumed = dict(partitions, checked=(progress['rows'], progress['offset'])) if partitions is not None else None
+        if start_row:
+            print(f"⏩ Resuming {table} after row {start_row}")
+        stream.rows_read = start_row
+        self.rejects.begin(table, stream.filepath, append=bool(progress))
+        
+        records = stream.records(start_offset)
+        first_record = next(records, None)
+        if first_record is None and not progress:
+            print(f"⚠️  No data to import for {table}")
+            return 0
+        first_row = dict(zip(stream.fieldnames, first_record or []))
         
         # Check if IDs are being imported
-        has_id = 'id' in rows[0] and rows[0]['id'] != ''
+        has_id = 'id' in first_row and first_row['id'] != ''
         has_integer_ids = False
         
         if has_id:
             # Check if first row has integer ID
-            first_id = str(rows[0]['id']).strip()
+            first_id = str(first_row['id']).strip()
             if first_id and '-' not in first_id:
                 has_integer_ids = True
                 print(f"🔄 Converting integer IDs to UUIDs for {table}")
         
-        # Import rows
-        success_count = 0
-        for idx, row in enumerate(rows, 1):
-            prepared = self.prepare_row(row, table)
-            if self.insert_row(table, prepared):
-                success_count += 1
-            else:
-                print(f"⚠️  Failed to import row {idx}")
+        # Cast and write records in shards, each committed once written
+        fieldnames = tuple(stream.fieldnames)
+        timestamp_formats = stream.timestamp_formats(table)
+        for col, fmt in timestamp_formats:
+            if fmt != 'iso':
+                print(f"🕒 Parsing {col} as {fmt} dates")
+        converter = compile_converter(table, fieldnames, timestamp_formats)
+        columns = converter.columns
         
-        self.conn.commit()
+        seen_ids: Set[str] = set()
+        
+        # Tables RANGE partitioned by month (PARTITION_KEYS) are loaded one partition per stream
+        partition_key = (self.partition_key(table) if (not progress or partitions is not None)
+                         and not self.incremental else None)
+        
+        # With --server-cast, complete loads of tables without passwords to hash are cast by PostgreSQL
+        success_count = None
+        if (self.server_cast and not self.incremental and not self.dedup and not progress
+                and not partition_key and 'password' not in columns and not is_compressed(stream.filepath)):
+            success_count = self.merge_from_staging(table, stream, converter, timestamp_formats)
+        if success_count is None:
+            # Rows casted by an earlier import of the same file are read from its staging cache;
+            # otherwise a complete (not resumed) import builds one
+            staging = None
+            cached = False
+            cache_path = _state_path(os.path.join('cache', f'{table}.cache'))
+            if 'password' in columns:
+                # Passwords are hashed on the write path, after the cache would be written
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+            elif self.use_cache:
+                cache_key = json.dumps([STAGING_CACHE_VERSION, fingerprint, fieldnames, timestamp_formats,
+                                        converter.signature])
+                staging = StagingCache(cache_path, cache_key, converter)
+                cached = staging.load()
+                if cached:
+                    print(f"⚡ Reading {table} from its staging cache")
+                elif start_row:
+                    staging = None
+                else:
+                    staging.begin()
+            self._unchanged_rows = 0
+            # Duplicates and orphan foreign keys are dropped before the write path
+            self.find_duplicates(table, stream, converter)
+            references = self.reference_check(table, stream, converter)
+            # Incremental imports upsert, which COPY cannot do
+            use_copy = self.use_copy and not self.incremental
+            shard_size = COPY_CHUNK_SIZE if use_copy else self.batch_size
+            first = [first_record] if first_record is not None else []
+            shards = self.metrics.timed(
+                table, 'read', _chunked(enumerate(itertools.chain(first, records), start_row + 1), shard_size))
+            
+            def shard_end(shard: List[Tuple[int, List[str]]]) -> Tuple[int, int]:
+                # Called right after the shard was read, while stream.offset is at its end
+                return shard[-1][0], stream.offset
+            
+            def on_commit(stored: int, end: Tuple[int, int], partitions: Optional[Dict[str, Any]] = None) -> None:
+                if self.checkpoint:
+                    self.checkpoint.update(table, fingerprint, end[0], end[1], stored_before + stored,
+                                           partitions=partitions)
+                # Rejects of the committed rows are written before a kill could lose them
+                self.rejects.flush(table, end[0])
+            
+            def cast_shards() -> Iterator[Tuple[Tuple[int, int], List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]]]]:
+                for shard in shards:
+                    end = shard_end(shard)
+                    rows, errors, seconds = timed_cast_shard(table, fieldnames, shard, timestamp_formats)
+                    self.metrics.add(table, 'cast', seconds, len(shard))
+                    if staging:
+                        staging.add(rows, errors, end, shard[0][0])
+                    yield end, rows, errors
+            
+            def cached_shards() -> Iterator[Tuple[Tuple[int, int], List[Tuple[int, Tuple[Any, ...]]], List[Tuple[int, str]]]]:
+                started = time.perf_counter()
+                for end, rows, errors, size in staging.shards(start_row):
+                    self.metrics.add(table, 'read', time.perf_counter() - started, len(rows) + len(errors), size)
+                    # Account the rows as read from the file
+                    stream.rows_read, stream.offset = end
+                    yield end, rows, errors
+                    started = time.perf_counter()
+            
+            try:
+                if partition_key:
+                    success_count = self._load_partitioned(table, columns, partition_key,
+                                                           cached_shards() if cached else cast_shards(),
+                                                           use_copy, references, self.replace_partitions,
+                                                           resumed, on_commit)
+                elif self.async_pipeline and not cached:
+                    success_count = self._load_shards_async(table, fieldnames, columns, shards, use_copy,
+                                                            seen_ids, on_commit, shard_end, timestamp_formats,
+                                                            staging, references)
+                elif self.shard_workers > 1 and not cached:
+                    success_count = self._load_shards_parallel(table, fieldnames, columns, shards, use_copy,
+                                                               seen_ids, on_commit, shard_end, timestamp_formats,
+                                                               staging, references)
+                else:
+                    success_count = self._load_shards(table, fieldnames, columns,
+                                                      cached_shards() if cached else cast_shards(),
+                                                      use_copy, seen_ids, on_commit, references)
+            except BaseException:
+                if staging and not cached:
+                    staging.discard()
+                raise
+            if staging and not cached:
+                staging.commit()
+        success_count += stored_before
         
         # Reset sequence if IDs were imported
         if has_id:
+            reset_started = time.perf_counter()
             self.reset_sequence(table)
+            self.metrics.add(table, 'reset_sequence', time.perf_counter() - reset_started)
+        
+        if self.incremental and self.prune:
+            if progress:
+                print(f"⚠️  Not pruning {table}: the resumed run did not see every id")
+            else:
+                self.prune_table(table, seen_ids)
         
-        print(f"✅ Imported {success_count}/{len(rows)} rows into {table}")
+        if self.checkpoint:
+            self.checkpoint.update(table, fingerprint, stream.rows_read, stream.offset, success_count, done=True)
+        
+        elapsed = time.perf_counter() - started
+        self.metrics.table_done(table, elapsed, success_count, stream.rows_read, stream.offset - start_offset)
+        print(f"✅ Imported {success_count}/{stream.rows_read} rows into {table} in {elapsed:.2f}s")
+        if self.incremental:
+            print(f"⏭️  Skipped {self._unchanged_rows} unchanged rows in {table}")
+        self.rejects.finish(table)
         return success_count
     
+    def defer_indexes(self, tables: Sequence[str]) -> Dict[str, List[Dict[str, str]]]:
+        """Drop the secondary indexes and foreign keys of `tables` ahead of a bulk load.
+        
+        Their definitions are saved to the state directory before anything is
+        dropped, so rebuild_deferred() can restore them, even after a crash.
+        Primary keys and unique indexes are kept: they enforce constraints.
+        """
+        deferred = self._load_deferred()
+        self.cur.execute("""
+            SELECT c.relname, ic.relname, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indrelid
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema() AND c.relname = ANY(%s)
+              AND NOT i.indisprimary AND NOT i.indisunique
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+            ORDER BY c.relname, ic.relname
+        """, (list(tables),))
+        indexes = [{'table': t, 'name': name, 'definition': d} for t, name, d in self.cur.fetchall()]
+        self.cur.execute("""
+            SELECT c.relname, con.conname, pg_get_constraintdef(con.oid)
+            FROM pg_constraint con
+            JOIN pg_class c ON c.oid = con.conrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema() AND c.relname = ANY(%s) AND con.contype = 'f'
+            ORDER BY c.relname, con.conname
+        """, (list(tables),))
+        foreign_keys = [{'table': t, 'name': name, 'definition': d} for t, name, d in self.cur.fetchall()]
+        self.conn.rollback()
+        
+        deferred['indexes'] += indexes
+        deferred['foreign_keys'] += foreign_keys
+        self._save_deferred(deferred)
+        
+        try:
+            for fk in foreign_keys:
+                self.cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(
+                    sql.Identifier(fk['table']), sql.Identifier(fk['name'])))
+            for index in indexes:
+                self.cur.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(index['name'])))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"⚠️  Could not drop indexes before loading: {e}")
+            return self._load_deferred()
+        if indexes or foreign_keys:
+            print(f"⏸️  Dropped {len(indexes)} index(es) and {len(foreign_keys)} foreign key(s) until the load is done")
+        return deferred
+    
+    def rebuild_deferred(self, deferred: Dict[str, List[Dict[str, str]]]) -> bool:
+        """Recreate the indexes and foreign keys dropped by defer_indexes(), up to `workers` at a time.
+        
+        Foreign keys are added NOT VALID, then validated, which only takes a lock
+        that lets the other tables' statements run alongside. Returns False if any
+        statement failed; the saved definitions are then kept for the next run.
+        """
+        index_statements = [(index['name'], sql.SQL(index['definition'])) for index in deferred['indexes']]
+        add_statements = [
+            (fk['name'], sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {} NOT VALID").format(
+                sql.Identifier(fk['table']), sql.Identifier(fk['name']), sql.SQL(fk['definition'])))
+            for fk in deferred['foreign_keys']
+        ]
+        validate_statements = [
+            (fk['name'], sql.SQL("ALTER TABLE {} VALIDATE CONSTRAINT {}").format(
+                sql.Identifier(fk['table']), sql.Identifier(fk['name'])))
+            for fk in deferred['foreign_keys']
+        ]
+        print(f"\n🔨 Rebuilding {len(index_statements)} index(es) and {len(add_statements)} foreign key(s)...")
+        failed = self._execute_parallel(index_statements)
+        # ADD CONSTRAINT locks both tables, so these run one at a time
+        for name, statement in add_statements:
+            try:
+                self.cur.execute(statement)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                print(f"❌ Could not restore {name}: {e}")
+                failed.append(name)
+        invalid = self._execute_parallel([s for s in validate_statements if s[0] not in failed])
+        for name in invalid:
+            print(f"⚠️  {name} is restored NOT VALID: existing rows violate it")
+        
+        if failed:
+            # Keep what still has to be restored
+            self._save_deferred({
+                'indexes': [i for i in deferred['indexes'] if i['name'] in failed],
+                'foreign_keys': [fk for fk in deferred['foreign_keys'] if fk['name'] in failed],
+            })
+            return False
+        if os.path.exists(_state_path('deferred.json')):
+            os.remove(_state_path('deferred.json'))
+        return True
+    
+    def analyze_tables(self, tables: Sequence[str]) -> None:
+        """Refresh the planner statistics of freshly loaded tables."""
+        self._execute_parallel([(table, sql.SQL("ANALYZE {}").format(sql.Identifier(table))) for table in tables])
+        print(f"📊 Analyzed {len(tables)} table(s)")
+    
+    def _execute_parallel(self, statements: Sequence[Tuple[str, sql.Composable]]) -> List[str]:
+        """Run independent statements on up to `workers` connections; returns the labels of those that failed."""
+        if not statements:
+            return []
+        local = threading.local()
+        connections: List[DatabaseImporter] = []
+        connections_lock = threading.Lock()
+        
+        def run(label: str, statement: sql.Composable) -> bool:
+            worker = getattr(local, 'importer', None)
+            if worker is None:
+                worker = local.importer = self._spawn()
+                worker.connect()
+                with connections_lock:
+                    connections.append(worker)
+            try:
+                worker.cur.execute(statement)
+                worker.conn.commit()
+                return True
+            except Exception as e:
+                worker.conn.rollback()
+                print(f"❌ {label}: {e}")
+                return False
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(statements)))) as pool:
+                results = list(pool.map(lambda args: run(*args), statements))
+        finally:
+            for worker in connections:
+                worker.disconnect()
+        return [label for (label, _), ok in zip(statements, results) if not ok]
+    
+    def _load_deferred(self) -> Dict[str, List[Dict[str, str]]]:
+        """Indexes and foreign keys dropped by an earlier bulk load and not restored yet."""
+        path = _state_path('deferred.json')
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return {'indexes': data.get('indexes', []), 'foreign_keys': data.get('foreign_keys', [])}
+            except Exception as e:
+                print(f"⚠️  Could not read {path}: {e}")
+        return {'indexes': [], 'foreign_keys': []}
+    
+    def _save_deferred(self, deferred: Dict[str, List[Dict[str, str]]]) -> None:
+        path = _state_path('deferred.json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(deferred, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
     def clear_table(self, table: str) -> None:
         """Clear all data from a table (use with caution!)."""
         if not self.cur or not self.conn:
@@ -595,6 +3679,13 @@ class DatabaseImporter:
         print("   CSV DATA IMPORT")
         print("="*60)
         
+        manifest_path = _state_path('manifest.json')
+        if self.incremental:
+            self.manifest.load(manifest_path)
+        self.checkpoint = ImportCheckpoint(_state_path('checkpoint.json'))
+        if self.resume and not clear_existing:
+            self.checkpoint.load()
+        
         if clear_existing:
             response = input("\n⚠️  WARNING: This will delete ALL existing data! Continue? (yes/no): ")
             if response.lower() != 'yes':
@@ -604,19 +3695,167 @@ class DatabaseImporter:
             print("\n🗑️  Clearing existing data...")
             for table in reversed(IMPORT_ORDER):
                 self.clear_table(table)
+            # Nothing imported earlier is left to compare against or resume
+            self.manifest.clear()
+            self.checkpoint.clear()
         
         print("\n📥 Starting import process...\n")
+        self.metrics = ImportMetrics()
+        
+        # Indexes left dropped by an interrupted bulk load are restored after this load too
+        deferred = self._load_deferred()
+        if self.defer_indexes_during_load:
+            deferred = self.defer_indexes(IMPORT_ORDER)
+        elif deferred['indexes'] or deferred['foreign_keys']:
+            print("⚠️  Indexes dropped by an interrupted bulk load will be rebuilt after this import")
         
+        failed: List[str] = []
         total_imported = 0
-        for table in IMPORT_ORDER:
-            count = self.import_table(table)
-            total_imported += count
-            print(f"  Imported {count} rows into {table}, wainting 1s")
-            time.sleep(1)
+        try:
+            if self.workers > 1:
+                total_imported = self._import_parallel(IMPORT_ORDER, failed)
+            else:
+                for table in IMPORT_ORDER:
+                    total_imported += self.import_table(table)
+        finally:
+            self.rejects.close()
+            self.rejects.write_summary()
+            if deferred['indexes'] or deferred['foreign_keys']:
+                self.conn.rollback()
+                self.rebuild_deferred(deferred)
+                self.analyze_tables(IMPORT_ORDER)
+        
+        self.metrics.finish(failed)
+        if self.incremental:
+            self.manifest.save(manifest_path)
+        if failed:
+            print(f"\n💡 Import of {', '.join(failed)} failed; run again with --resume to continue it")
+        else:
+            self.checkpoint.clear()
         
         print("\n" + "="*60)
         print(f"✅ Import complete! Total rows imported: {total_imported}")
         print("="*60 + "\n")
+    
+    def _import_table_on_own_connection(self, table: str) -> int:
+        """Import one table with a dedicated importer (and connection), for worker threads."""
+        worker = self._spawn()
+        worker.shard_workers = self.shard_workers
+        worker.connect()
+        try:
+            return worker.import_table(table)
+        finally:
+            worker.disconnect()
+    
+    def _import_parallel(self, tables: Sequence[str], failed: List[str]) -> int:
+        """Import tables concurrently, following the foreign key dependency graph.
+        
+        Up to `workers` tables run at once, each on its own connection. A table is
+        started as soon as every parent table has finished (import_table commits
+        before returning), so independent tables never wait on each other. Tables
+        whose import raised are appended to `failed`.
+        """
+        deps = table_dependencies(tables)
+        pending = list(tables)
+        finished: Set[str] = set()
+        running: Dict[Future, str] = {}
+        total_imported = 0
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for table in [t for t in pending if deps[t] <= finished]:
+                    pending.remove(table)
+                    running[pool.submit(self._import_table_on_own_connection, table)] = table
+                
+                if not running:
+                    print(f"❌ Unresolvable table dependencies: {pending}")
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table = running.pop(future)
+                    try:
+                        total_imported += future.result()
+                    except Exception as e:
+                        print(f"❌ Import of {table} failed: {e}")
+                        failed.append(table)
+                    finished.add(table)
+        
+        return total_imported
+
+
+# Sample CSV templates, one header row and a few example rows per table
+SAMPLE_CSVS = {
+    'users.csv': [
+        ['id', 'email', 'password', 'firstName', 'lastName', 'role', 'isActive', 'refreshToken', 'lastLogin', 'firebaseUid', 'createdAt', 'updatedAt'],
+        ['', 'admin@supervision.com', 'Admin123!', 'Admin', 'User', 'admin', 'true', '', '', '', '', ''],
+        ['', 'operator@supervision.com', 'Admin123!', 'John', 'Doe', 'read', 'true', '', '', '', '', '']
+    ],
+    'predefined_values.csv': [
+        ['id', 'type', 'value', 'description', 'nickname', 'equipmentType', 'parentId', 'isActive', 'sortOrder', 'createdAt', 'updatedAt'],
+        # Centrales (parentId empty) - types must be lowercase
+        ['', 'centrale', 'Centrale Nord', 'Centrale principale Nord', 'CN', '', '', 'true', '0', '', ''],
+        ['', 'centrale', 'Centrale Sud', 'Centrale principale Sud', 'CS', '', '', 'true', '1', '', ''],
+        # Equipements (set parentId after first import if you need linkage)
+        ['', 'equipement', 'Turbine 1', 'Turbine principale', '', 'Turbine', '', 'true', '0', '', ''],
+        ['', 'equipement', 'Generator A', 'Generateur principal', '', 'Generator', '', 'true', '1', '', ''],
+        # Event types
+        ['', 'type_evenement', 'Maintenance preventive', 'Maintenance planifiee', '', '', '', 'true', '0', '', ''],
+        ['', 'type_evenement', 'Panne', 'Arret imprevu', '', '', '', 'true', '1', '', ''],
+        # Malfunction types
+        ['', 'type_dysfonctionnement', 'Surchauffe', 'Temperature excessive', '', '', '', 'true', '0', '', ''],
+        ['', 'type_dysfonctionnement', 'Vibrations', 'Vibrations anormales', '', '', '', 'true', '1', '', ''],
+        # Intervenant types
+        ['', 'type_intervenant', 'Technicien', 'Technicien de maintenance', '', '', '', 'true', '0', '', ''],
+        ['', 'type_intervenant', 'Ingenieur', 'Ingenieur specialise', '', '', '', 'true', '1', '', '']
+    ],
+    'companies.csv': [
+        ['id', 'name', 'address', 'phone', 'email', 'website', 'isActive', 'createdAt', 'updatedAt'],
+        ['', 'Maintenance Corp', '1 Rue des Services, Paris', '+33123456789', 'contact@maintcorp.com', 'https://maintcorp.com', 'true', '', ''],
+        ['', 'TechServices SARL', '20 Avenue des Energies, Lyon', '+33498765432', 'hello@techservices.com', 'https://techservices.com', 'true', '', '']
+    ],
+    'intervenants.csv': [
+        ['id', 'name', 'surname', 'phone', 'email', 'country', 'companyId', 'type', 'isActive', 'createdAt', 'updatedAt'],
+        ['', 'Dupont', 'Jean', '+33612345678', 'jean.dupont@maintenance.com', 'France', '', 'Technicien', 'true', '', ''],
+        ['', 'Martin', 'Sophie', '+33687654321', 'sophie.martin@techservices.com', 'France', '', 'Ingenieur', 'true', '', '']
+    ],
+    'interventions.csv': [
+        [
+            'id', 'titre', 'centraleType', 'centrale', 'equipement',
+            'entrepriseIntervenante', 'nombreIntervenant', 'intervenantEnregistre',
+            'dateRef', 'debutInter', 'finInter',
+            'hasPerteProduction', 'hasPerteCommunication', 'indispoTerminee',
+            'dateIndisponibiliteDebut', 'dateIndisponibiliteFin',
+            'typeEvenement', 'typeDysfonctionnement',
+            'rapportAttendu', 'rapportRecu', 'commentaires',
+            'isArchived', 'archivedAt', 'createdById', 'updatedById', 'createdAt', 'updatedAt'
+        ],
+        [
+            '', 'Maintenance Turbine 1', '', 'Centrale Nord', 'Turbine 1',
+            'Maintenance Corp', '2', 'Dupont Jean; Martin Sophie',
+            '2024-01-15T00:00:00', '2024-01-15T08:00:00', '2024-01-15T12:00:00',
+            'false', 'false', 'false',
+            '', '',
+            '["Maintenance preventive"]', '[]',
+            'false', 'false', 'Maintenance trimestrielle',
+            'false', '', '', '', '', ''
+        ],
+        [
+            '', 'Reparation Generator A', '', 'Centrale Nord', 'Generator A',
+            'TechServices SARL', '1', 'Durand Paul',
+            '2024-01-20T00:00:00', '2024-01-20T14:00:00', '2024-01-20T18:00:00',
+            'true', 'false', 'false',
+            '', '',
+            '["Panne"]', '["Surchauffe"]',
+            'true', 'false', 'Temperature excessive detectee',
+            'false', '', '', '', '', ''
+        ]
+    ],
+    'audit_logs.csv': [
+        ['id', 'entityType', 'entityId', 'action', 'oldValues', 'newValues', 'description', 'ipAddress', 'userAgent', 'userId', 'createdAt'],
+        ['', 'intervention', '', 'create', '', '{"titre":"Exemple"}', 'Imported via CSV', '', '', '', '']
+    ]
+}
 
 
 def create_sample_csvs():
@@ -625,79 +3864,7 @@ def create_sample_csvs():
     
     os.makedirs(CSV_DIR, exist_ok=True)
     
-    samples = {
-        'users.csv': [
-            ['id', 'email', 'password', 'firstName', 'lastName', 'role', 'isActive', 'refreshToken', 'lastLogin', 'firebaseUid', 'createdAt', 'updatedAt'],
-            ['', 'admin@supervision.com', 'Admin123!', 'Admin', 'User', 'admin', 'true', '', '', '', '', ''],
-            ['', 'operator@supervision.com', 'Admin123!', 'John', 'Doe', 'read', 'true', '', '', '', '', '']
-        ],
-        'predefined_values.csv': [
-            ['id', 'type', 'value', 'description', 'nickname', 'equipmentType', 'parentId', 'isActive', 'sortOrder', 'createdAt', 'updatedAt'],
-            # Centrales (parentId empty) - types must be lowercase
-            ['', 'centrale', 'Centrale Nord', 'Centrale principale Nord', 'CN', '', '', 'true', '0', '', ''],
-            ['', 'centrale', 'Centrale Sud', 'Centrale principale Sud', 'CS', '', '', 'true', '1', '', ''],
-            # Equipements (set parentId after first import if you need linkage)
-            ['', 'equipement', 'Turbine 1', 'Turbine principale', '', 'Turbine', '', 'true', '0', '', ''],
-            ['', 'equipement', 'Generator A', 'Generateur principal', '', 'Generator', '', 'true', '1', '', ''],
-            # Event types
-            ['', 'type_evenement', 'Maintenance preventive', 'Maintenance planifiee', '', '', '', 'true', '0', '', ''],
-            ['', 'type_evenement', 'Panne', 'Arret imprevu', '', '', '', 'true', '1', '', ''],
-            # Malfunction types
-            ['', 'type_dysfonctionnement', 'Surchauffe', 'Temperature excessive', '', '', '', 'true', '0', '', ''],
-            ['', 'type_dysfonctionnement', 'Vibrations', 'Vibrations anormales', '', '', '', 'true', '1', '', ''],
-            # Intervenant types
-            ['', 'type_intervenant', 'Technicien', 'Technicien de maintenance', '', '', '', 'true', '0', '', ''],
-            ['', 'type_intervenant', 'Ingenieur', 'Ingenieur specialise', '', '', '', 'true', '1', '', '']
-        ],
-        'companies.csv': [
-            ['id', 'name', 'address', 'phone', 'email', 'website', 'isActive', 'createdAt', 'updatedAt'],
-            ['', 'Maintenance Corp', '1 Rue des Services, Paris', '+33123456789', 'contact@maintcorp.com', 'https://maintcorp.com', 'true', '', ''],
-            ['', 'TechServices SARL', '20 Avenue des Energies, Lyon', '+33498765432', 'hello@techservices.com', 'https://techservices.com', 'true', '', '']
-        ],
-        'intervenants.csv': [
-            ['id', 'name', 'surname', 'phone', 'email', 'country', 'companyId', 'type', 'isActive', 'createdAt', 'updatedAt'],
-            ['', 'Dupont', 'Jean', '+33612345678', 'jean.dupont@maintenance.com', 'France', '', 'Technicien', 'true', '', ''],
-            ['', 'Martin', 'Sophie', '+33687654321', 'sophie.martin@techservices.com', 'France', '', 'Ingenieur', 'true', '', '']
-        ],
-        'interventions.csv': [
-            [
-                'id', 'titre', 'centraleType', 'centrale', 'equipement',
-                'entrepriseIntervenante', 'nombreIntervenant', 'intervenantEnregistre',
-                'dateRef', 'debutInter', 'finInter',
-                'hasPerteProduction', 'hasPerteCommunication', 'indispoTerminee',
-                'dateIndisponibiliteDebut', 'dateIndisponibiliteFin',
-                'typeEvenement', 'typeDysfonctionnement',
-                'rapportAttendu', 'rapportRecu', 'commentaires',
-                'isArchived', 'archivedAt', 'createdById', 'updatedById', 'createdAt', 'updatedAt'
-            ],
-            [
-                '', 'Maintenance Turbine 1', '', 'Centrale Nord', 'Turbine 1',
-                'Maintenance Corp', '2', 'Dupont Jean; Martin Sophie',
-                '2024-01-15T00:00:00', '2024-01-15T08:00:00', '2024-01-15T12:00:00',
-                'false', 'false', 'false',
-                '', '',
-                '["Maintenance preventive"]', '[]',
-                'false', 'false', 'Maintenance trimestrielle',
-                'false', '', '', '', '', ''
-            ],
-            [
-                '', 'Reparation Generator A', '', 'Centrale Nord', 'Generator A',
-                'TechServices SARL', '1', 'Durand Paul',
-                '2024-01-20T00:00:00', '2024-01-20T14:00:00', '2024-01-20T18:00:00',
-                'true', 'false', 'false',
-                '', '',
-                '["Panne"]', '["Surchauffe"]',
-                'true', 'false', 'Temperature excessive detectee',
-                'false', '', '', '', '', ''
-            ]
-        ],
-        'audit_logs.csv': [
-            ['id', 'entityType', 'entityId', 'action', 'oldValues', 'newValues', 'description', 'ipAddress', 'userAgent', 'userId', 'createdAt'],
-            ['', 'intervention', '', 'create', '', '{"titre":"Exemple"}', 'Imported via CSV', '', '', '', '']
-        ]
-    }
-    
-    for filename, data in samples.items():
+    for filename, data in SAMPLE_CSVS.items():
         filepath = os.path.join(CSV_DIR, filename)
         with open(filepath, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f, delimiter=',')
@@ -714,8 +3881,62 @@ def create_sample_csvs():
     print("\n📝 Edit these files with your data and run the script again to import")
 
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Import CSV data into the Supervision database.')
+    parser.add_argument('--no-copy', action='store_true',
+                        help='use batched multi-row INSERTs instead of streaming rows with COPY')
+    parser.add_argument('--batch-size', type=int, default=INSERT_BATCH_SIZE,
+                        help=f'rows per multi-row INSERT (default: {INSERT_BATCH_SIZE})')
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS,
+                        help=f'tables imported concurrently, 1 for a sequential import (default: {IMPORT_WORKERS})')
+    parser.add_argument('--bcrypt-rounds', type=int, default=BCRYPT_ROUNDS,
+                        help=f'bcrypt cost factor for plain text passwords (default: {BCRYPT_ROUNDS})')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only upsert rows that are new or changed since the last incremental import')
+    parser.add_argument('--prune', action='store_true',
+                        help='with --incremental, delete previously imported rows whose id left the CSV')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted import after its last committed shard')
+    parser.add_argument('--shard-workers', type=int, default=SHARD_WORKERS,
+                        help='processes casting and connections writing shards of each table (default: 1, no sharding)')
+    parser.add_argument('--async', dest='async_pipeline', action='store_true',
+                        help='load each table through an asyncio pipeline of reader, caster and writer stages '
+                             '(asyncpg connections if installed)')
+    parser.add_argument('--replace-partitions', action='store_true',
+                        help='swap the monthly partitions of partitioned tables (audit_logs) for the months '
+                             'of the CSV file instead of appending to them')
+    parser.add_argument('--profile', choices=sorted(LOAD_PROFILES),
+                        help='session settings and connection pool of the load: bulk (synchronous_commit=off, '
+                             'large maintenance_work_mem) or online (timeouts, at most 2 connections)')
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help='drop secondary indexes and foreign keys while loading, then rebuild them and ANALYZE')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='neither read nor write the staging cache of casted rows')
+    parser.add_argument('--server-cast', action='store_true',
+                        help='copy each CSV file into an UNLOGGED staging table and cast it in PostgreSQL')
+    parser.add_argument('--dedup', choices=DEDUP_POLICIES,
+                        help='drop rows repeating the natural key of another row, keeping the first or last one, '
+                             'and point references to them at the kept row')
+    parser.add_argument('--orphans', choices=ORPHAN_POLICIES, default='reject',
+                        help='rows referencing missing rows: fail them (reject, the default) '
+                             'or clear the reference (null)')
+    parser.add_argument('--rejects', metavar='DIR',
+                        help='directory of the per-table files of rejected rows '
+                             '(default: csv_data/.import_state/rejects)')
+    parser.add_argument('--report', metavar='FILE',
+                        help='write a JSON report with per-table and per-stage timings of the run')
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help='write the run metrics as a Prometheus textfile (e.g. for node_exporter)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='validate the CSV files against the schema without connecting to the database')
+    return parser.parse_args(argv)
+
+
 def main():
     """Main execution function."""
+    args = parse_args()
+    
     print("\n" + "="*60)
     print("   SUPERVISION DATABASE - CSV IMPORT TOOL")
     print("="*60 + "\n")
@@ -729,7 +3950,7 @@ def main():
         return
     
     # Check if there are CSV files
-    csv_files = [f for f in os.listdir(CSV_DIR) if f.endswith('.csv')]
+    csv_files = [f for f in os.listdir(CSV_DIR) if f.endswith(('.csv', '.csv.gz', '.csv.zst'))]
     if not csv_files:
         print(f"⚠️  No CSV files found in '{CSV_DIR}' directory")
         create_sample = input("Would you like to create sample CSV templates? (yes/no): ")
@@ -741,6 +3962,16 @@ def main():
     for f in csv_files:
         print(f"   - {f}")
     print()
+    
+    if args.dry_run:
+        sys.exit(0 if dry_run() else 1)
+    
+    if args.async_pipeline and not HAS_ASYNCPG:
+        print("💡 asyncpg is not installed; the --async pipeline writes over psycopg2 connections "
+              "(pip install asyncpg)\n")
+    
+    if not args.resume and os.path.exists(_state_path('checkpoint.json')):
+        print("💡 A previous import did not finish; run with --resume to continue it\n")
 
     # Offer to regenerate templates to ensure they match current schema
     regen = input("Regenerate sample CSV templates (this will overwrite existing CSVs)? (yes/no): ")
@@ -753,7 +3984,14 @@ def main():
     clear_existing = clear_data.lower() == 'yes'
     
     # Create importer and run import
-    importer = DatabaseImporter(DB_CONFIG)
+    importer = DatabaseImporter(DB_CONFIG, use_copy=not args.no_copy, batch_size=args.batch_size,
+                                workers=args.workers, shard_workers=args.shard_workers,
+                                bcrypt_rounds=args.bcrypt_rounds, incremental=args.incremental,
+                                prune=args.prune, resume=args.resume, use_cache=not args.no_cache,
+                                defer_indexes=args.defer_indexes, server_cast=args.server_cast,
+                                orphans=args.orphans, dedup=args.dedup, rejects_dir=args.rejects,
+                                async_pipeline=args.async_pipeline, profile=args.profile,
+                                replace_partitions=args.replace_partitions)
     
     try:
         importer.connect()
@@ -764,6 +4002,11 @@ def main():
         print(f"\n❌ Import failed: {e}")
     finally:
         importer.disconnect()
+        if args.report:
+            importer.metrics.write_json(args.report)
+            print(f"📈 Run report written to {args.report}")
+        if args.prometheus:
+            importer.metrics.write_prometheus(args.prometheus)
 
 
 if __name__ == '__main__':
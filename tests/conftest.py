@@ -0,0 +1,95 @@
+"""
+Shared fixtures of the import_data tests.
+
+Tests that need PostgreSQL connect with DB_CONFIG (DATABASE_* / DB_* variables)
+and are skipped when it cannot be reached or is not migrated. They load into
+empty copies of the tables created in TEST_SCHEMA, which comes first in the
+search path of every connection, so the data of the database is never touched.
+"""
+
+import csv
+import os
+import sys
+from typing import Dict, Optional, Sequence
+
+import psycopg2
+import pytest
+from psycopg2 import sql
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import import_data  # noqa: E402
+
+# Schema holding the tables the tests load into
+TEST_SCHEMA = 'import_test'
+
+
+def write_sample_csvs(directory: str, tables: Optional[Sequence[str]] = None) -> None:
+    """Write the SAMPLE_CSVS templates of `tables` (default: all) into `directory`."""
+    for filename, data in import_data.SAMPLE_CSVS.items():
+        if tables is None or filename[:-len('.csv')] in tables:
+            with open(os.path.join(directory, filename), 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(data)
+
+
+def sample_rows(table: str) -> int:
+    return len(import_data.SAMPLE_CSVS[f'{table}.csv']) - 1
+
+
+def table_counts(conn) -> Dict[str, int]:
+    """Rows of each IMPORT_ORDER table of TEST_SCHEMA."""
+    counts = {}
+    with conn.cursor() as cur:
+        for table in import_data.IMPORT_ORDER:
+            cur.execute(sql.SQL("SELECT count(*) FROM {}.{}").format(
+                sql.Identifier(TEST_SCHEMA), sql.Identifier(table)))
+            counts[table] = cur.fetchone()[0]
+    return counts
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """A CSV_DIR of its own for the test, with a fresh id registry and converter cache."""
+    monkeypatch.setattr(import_data, 'CSV_DIR', str(tmp_path))
+    import_data.ID_REGISTRY.clear()
+    import_data.compile_converter.cache_clear()
+    yield tmp_path
+    import_data.ID_REGISTRY.clear()
+    import_data.compile_converter.cache_clear()
+
+
+@pytest.fixture(scope='session')
+def db_config():
+    """DB_CONFIG with TEST_SCHEMA first in the search path; skips the test without a migrated database."""
+    config = dict(import_data.DB_CONFIG, options=f'-c search_path={TEST_SCHEMA},public')
+    try:
+        conn = psycopg2.connect(**config)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM pg_tables WHERE schemaname = 'public' AND tablename = ANY(%s)",
+                        (list(import_data.IMPORT_ORDER),))
+            if cur.fetchone()[0] < len(import_data.IMPORT_ORDER):
+                pytest.skip("the database is not migrated")
+    finally:
+        conn.close()
+    return config
+
+
+@pytest.fixture
+def db(db_config):
+    """Empty copies of the IMPORT_ORDER tables in TEST_SCHEMA, dropped after the test."""
+    conn = psycopg2.connect(**db_config)
+    conn.autocommit = True
+    schema = sql.Identifier(TEST_SCHEMA)
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(schema))
+        cur.execute(sql.SQL("CREATE SCHEMA {}").format(schema))
+        for table in import_data.IMPORT_ORDER:
+            cur.execute(sql.SQL("CREATE TABLE {}.{} (LIKE public.{} INCLUDING ALL)").format(
+                schema, sql.Identifier(table), sql.Identifier(table)))
+    yield conn
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(schema))
+    conn.close()
@@ -0,0 +1,106 @@
+"""Casts of raw CSV values (RowConverter, TimestampParser, the --server-cast functions)."""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pytest
+from psycopg2 import sql
+
+import import_data
+from import_data import TimestampParser
+
+# Type of the value of each server-side cast, the Python casts' results are compared as
+SERVER_CAST_TYPES = {
+    'bool': 'boolean', 'int': 'numeric', 'number': 'double precision', 'timestamp': 'timestamp',
+    'json_text': 'text', 'jsonb': 'jsonb', 'uuid': 'uuid', 'enum_predefined': 'text',
+}
+
+# Values the sample CSVs do not cover
+EDGE_VALUES = {
+    'bool': ['true', 'TRUE', ' yes ', '0', 'no', 'x', ''],
+    'int': ['1', ' -2 ', '+3', '1.5', 'x', '', '007'],
+    'number': ['1', '1.5', ' -2e3 ', '.5', '5.', 'x', ''],
+    'json_text': ['a,b, c', '["x","y"]', '[1,2]', '[bad', '', ' a , ,b ', '[]', '["é"]'],
+    'jsonb': ['{"a":1}', '[1]', 'x', '', '"s"', '1'],
+    'uuid': ['1', '42', '', 'null', '550e8400-e29b-41d4-a716-446655440000',
+             ' 550E8400-E29B-41D4-A716-446655440000 ', 'abc'],
+    'enum_predefined': ['site', ' Site ', 'nope', ''],
+    'timestamp': ['2023-05-11', '2023-05-11T12', '2023-05-11 12:30', '2023-05-11T12:30:45.5',
+                  '2023-05-11T12:30:45,123456', '2023-05-11T12:30:45Z', '2023-05-11T12:30:45+02:00',
+                  '2023-05-11T12:30:45-0530', '2023-02-30', '2023-13-01', '11/05/2023', '11/05/2023 12h45',
+                  '11.05.2023 12:45:30', '11-05-2023 12:45:30.25', '31/12/2023', '12/31/2023',
+                  '  11/05/2023  ', 'garbage', 'May 11 2023', ''],
+}
+
+
+def test_timestamps_fall_back_to_iso_only():
+    parse = TimestampParser('day-first')
+    assert parse('11/05/2023 12:45') == datetime(2023, 5, 11, 12, 45)
+    assert parse('2023-05-11T12:45:00') == datetime(2023, 5, 11, 12, 45)
+    # 05/13/2023 is a month-first date: reading it as such would mix conventions in the column
+    with pytest.raises(ValueError, match='the column has day-first dates'):
+        parse('05/13/2023')
+
+
+def test_timestamps_without_format_try_every_format():
+    assert TimestampParser()('05/13/2023') == datetime(2023, 5, 13)
+    with pytest.raises(ValueError):
+        TimestampParser()('yesterday')
+
+
+def test_timestamps_cast_in_other_processes_copy_as_iso():
+    fieldnames = ('id', 'action', 'createdAt')
+    shard = [(1, ['1', 'create', '11/05/2023 12:45']), (2, ['2', 'update', '11/05/2023 12:45']),
+             (3, ['3', 'delete', '2023-05-11T10:45:00+00:00']), (4, ['4', 'delete', '2023-05-11T12:45:00+02:00'])]
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        rows, errors = pool.submit(import_data.cast_shard, 'audit_logs', fieldnames, shard,
+                                   (('createdAt', 'day-first'),)).result()
+    assert not errors
+    index = import_data.compile_converter('audit_logs', fieldnames).columns.index('createdAt')
+    created = [row[index] for _, row in rows]
+    assert all(type(value) is datetime for value in created)
+    copied = import_data._copy_buffer([(value,) for value in created]).getvalue()
+    # Equal instants with another offset are not the same timestamp value
+    assert copied == ('2023-05-11T12:45:00\n2023-05-11T12:45:00\n'
+                      '2023-05-11T10:45:00+00:00\n2023-05-11T12:45:00+02:00\n')
+
+
+
+
+def _cast_cases():
+    """(kind, value, timestamp format) of every sample CSV value and edge value."""
+    cases = set()
+    for filename, (header, *rows) in import_data.SAMPLE_CSVS.items():
+        schema = import_data.SCHEMA.get(filename[:-len('.csv')], {})
+        for row in rows:
+            for col, value in zip(header, row):
+                kind = schema.get(col, 'string').rstrip('?')
+                if kind in SERVER_CAST_TYPES:
+                    cases.add((kind, value, None))
+    for kind, values in EDGE_VALUES.items():
+        formats = (None, *import_data.TIMESTAMP_PARSERS) if kind == 'timestamp' else (None,)
+        cases.update((kind, value, fmt) for value in values for fmt in formats)
+    return sorted(cases, key=lambda case: (case[0], case[1], case[2] or ''))
+
+
+def test_server_casts_match_the_python_casts(db):
+    """--server-cast must load exactly what the Python casts do, errors included."""
+    mismatches = []
+    with db.cursor() as cur:
+        cur.execute("SET TimeZone = 'UTC'")
+        cur.execute(import_data.SERVER_CAST_FUNCTIONS)
+        for kind, value, fmt in _cast_cases():
+            cast = TimestampParser(fmt) if kind == 'timestamp' else import_data._caster(kind)
+            try:
+                casted, error = cast(value), None
+            except ValueError as e:
+                casted, error = None, str(e)
+            expr, check = import_data._server_cast(kind, sql.Literal(value), sql.Identifier('v'), fmt)
+            pg_type = sql.SQL(SERVER_CAST_TYPES[kind])
+            # Python results go through the same type, so equal values have the same text
+            cur.execute(sql.SQL("SELECT v::text, ({})::{}::text, {} FROM (SELECT ({})::{} AS v) s").format(
+                sql.Literal(casted), pg_type, check if check is not None else sql.NULL, expr, pg_type))
+            server, python, server_error = cur.fetchone()
+            if (server, server_error) != (python, error):
+                mismatches.append((kind, value, fmt, (python, error), (server, server_error)))
+    assert not mismatches
@@ -0,0 +1,26 @@
+"""Encoding and delimiter detection shared by the importer and the converter (csv_utils)."""
+
+import codecs
+
+from csv_utils import file_fingerprint, sniff_csv
+
+
+def test_sniff_csv(tmp_path):
+    path = tmp_path / 'a.csv'
+    path.write_bytes('id;name\n1;café\n'.encode('cp1252'))
+    assert sniff_csv(path) == ('cp1252', ';')
+    path.write_bytes(codecs.BOM_UTF8 + 'id\tname\n1\tcafé\n'.encode('utf-8'))
+    assert sniff_csv(path) == ('utf-8-sig', '\t')
+
+
+def test_stray_cp1252_bytes_of_utf8_files_are_decoded():
+    assert 'caf\xe9 \x81'.encode('latin-1').decode('utf-8', errors='cp1252_fallback') == 'café \x81'
+
+
+def test_file_fingerprint_follows_the_content(tmp_path):
+    path = tmp_path / 'a.csv'
+    path.write_text('id,name\n1,a\n')
+    before = file_fingerprint(path)
+    assert file_fingerprint(path) == before
+    path.write_text('id,name\n1,b\n')
+    assert file_fingerprint(path) != before
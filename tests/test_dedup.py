@@ -0,0 +1,33 @@
+"""Natural key deduplication (--dedup) of Deduplicator."""
+
+import import_data
+from import_data import Deduplicator, RowConverter
+
+COMPANIES = ['id', 'name']
+INTERVENANTS = ['id', 'name', 'surname', 'companyId']
+
+
+def test_keys_reference_the_surviving_parent():
+    dedup = Deduplicator('first')
+    assert dedup.scan('companies', [['1', 'Acme'], ['2', 'Acme'], ['3', 'Other']],
+                      RowConverter('companies', COMPANIES)) == 1
+    # Both Jean Dupont work for Acme, through either of its ids
+    records = [['10', 'Dupont', 'Jean', '1'], ['11', 'Dupont', 'Jean', '2'], ['12', 'Dupont', 'Jean', '3']]
+    assert dedup.scan('intervenants', records, RowConverter('intervenants', INTERVENANTS)) == 1
+    assert dedup.dropped['intervenants'] == {2}
+    resolve = import_data.ID_REGISTRY.derive
+    assert dedup.aliases['intervenants'] == {resolve('11'): resolve('10')}
+
+
+def test_only_key_columns_are_cast():
+    converter = RowConverter('companies', ['id', 'name', 'createdAt'])
+    position = converter.columns.index('createdAt')
+    
+    def cast(value):
+        raise AssertionError(f"createdAt is not part of the key: {value}")
+    
+    idx, _, default = converter._slots[position]
+    converter._slots[position] = (idx, cast, default)
+    dedup = Deduplicator('last')
+    assert dedup.scan('companies', [['1', 'Acme', '2024-01-01'], ['2', 'Acme', '2024-01-02']], converter) == 1
+    assert dedup.dropped['companies'] == {1}
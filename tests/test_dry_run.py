@@ -0,0 +1,35 @@
+"""--dry-run: the casts and header checks of an import, without a database."""
+
+import re
+
+import import_data
+from conftest import write_sample_csvs
+
+
+def failures(output: str) -> dict:
+    """Failure count of each column of the dry run report."""
+    return {name: int(failed) for name, failed in
+            re.findall(r'^(?:❌|  ) (\w+)\s+\S+\s+\d+\s+\S+\s+\S+\s+\d+\s+(\d+)$', output, re.M)}
+
+
+def test_sample_csvs_pass(state_dir):
+    write_sample_csvs(str(state_dir))
+    assert import_data.dry_run()
+
+
+def test_bad_values_and_missing_required_headers_fail(state_dir, capsys):
+    # companies.name is required: the import would skip the whole table
+    (state_dir / 'companies.csv').write_text(
+        'id,isActive,createdAt,updatedAt\n'
+        '1,maybe,2023-05-11T12:00:00,2023-05-11T12:00:00\n'
+        '2,true,yesterday,2023-05-11T12:00:00\n'
+        '3,false,2023-05-11T12:00:00,2023-05-11T12:00:00\n', encoding='utf-8')
+    assert not import_data.dry_run(['companies'])
+    output = capsys.readouterr().out
+    assert '❌ Missing required columns (the import skips the table): name' in output
+    assert 'name' not in output.split('Not in CSV (DB default):')[1].splitlines()[0]
+    counts = failures(output)
+    assert counts['isActive'] == 1
+    assert counts['createdAt'] == 1
+    assert counts['updatedAt'] == 0
+    assert '1 would be rejected' in output
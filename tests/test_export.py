@@ -0,0 +1,61 @@
+"""export_data.py dumps, plain and compressed, read back by the importer."""
+
+import gzip
+
+import pytest
+from psycopg2 import sql
+
+import export_data
+import import_data
+from csv_utils import find_csv
+from import_data import CsvStream, DatabaseImporter
+
+from conftest import TEST_SCHEMA, sample_rows, table_counts, write_sample_csvs
+
+
+def _import(config) -> None:
+    importer = DatabaseImporter(config, bcrypt_rounds=4)
+    importer.connect()
+    try:
+        importer.import_all()
+    finally:
+        importer.disconnect()
+
+
+@pytest.mark.parametrize('compress', [None, 'gzip', 'zstd'])
+def test_exports_import_back(db, db_config, state_dir, monkeypatch, compress):
+    if compress == 'zstd':
+        pytest.importorskip('zstandard')
+    write_sample_csvs(state_dir)
+    _import(db_config)
+    expected = {table: sample_rows(table) for table in import_data.IMPORT_ORDER}
+    assert table_counts(db) == expected
+    
+    monkeypatch.setattr(export_data, 'DB_CONFIG', db_config)
+    output = state_dir / 'export'
+    assert export_data.export_all(import_data.IMPORT_ORDER, str(output), compress=compress) == []
+    for table in import_data.IMPORT_ORDER:
+        path = find_csv(str(output), f'{table}.csv')
+        assert path.endswith(f'.csv{export_data.COMPRESSIONS.get(compress, "")}')
+        stream = CsvStream(path)
+        assert stream.fieldnames == export_data.export_columns(table)
+        assert sum(1 for _ in stream.records()) == expected[table]
+    
+    with db.cursor() as cur:
+        cur.execute(sql.SQL("TRUNCATE {} CASCADE").format(sql.SQL(', ').join(
+            sql.Identifier(TEST_SCHEMA, table) for table in import_data.IMPORT_ORDER)))
+    monkeypatch.setattr(import_data, 'CSV_DIR', str(output))
+    _import(db_config)
+    assert table_counts(db) == expected
+
+
+def test_compressed_files_resume_at_an_offset(tmp_path):
+    path = tmp_path / 'companies.csv.gz'
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        f.write('id,name\n1,a\n2,b\n3,c\n')
+    stream = CsvStream(str(path))
+    records = stream.records()
+    assert next(records) == ['1', 'a']
+    offset = stream.offset
+    records.close()
+    assert list(CsvStream(str(path)).records(offset)) == [['2', 'b'], ['3', 'c']]
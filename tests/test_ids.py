@@ -0,0 +1,28 @@
+"""Resolution of legacy ids to UUIDs (IdRegistry)."""
+
+import uuid
+
+import import_data
+from import_data import IdRegistry, RowConverter
+
+
+def test_primary_keys_are_not_memoized(state_dir):
+    converter = RowConverter('companies', ['id', 'name'])
+    rows = [converter([str(i), f'company {i}']) for i in range(1, 1001)]
+    assert len({row[converter.columns.index('id')] for row in rows}) == 1000
+    assert len(import_data.ID_REGISTRY) == 0
+
+
+def test_foreign_keys_are_memoized_up_to_the_cache_size():
+    registry = IdRegistry(cache_size=100)
+    for i in range(1000):
+        registry.resolve(str(i))
+    assert len(registry) == 100
+    assert registry.resolve('7') == registry.derive('7') == str(uuid.uuid5(registry.namespace_uuid, '7'))
+
+
+def test_uuids_are_kept_as_is():
+    registry = IdRegistry()
+    value = str(uuid.uuid4())
+    assert registry.resolve(value) == registry.derive(value) == value
+    assert registry.derive('') is None and registry.derive('null') is None
@@ -0,0 +1,44 @@
+"""Incremental imports (--incremental) against the fingerprints of the manifest."""
+
+import csv
+import os
+
+import import_data
+
+from conftest import sample_rows, table_counts, write_sample_csvs
+
+
+def _import(config, **options):
+    importer = import_data.DatabaseImporter(config, bcrypt_rounds=4, incremental=True, **options)
+    importer.connect()
+    try:
+        importer.import_all()
+    finally:
+        importer.disconnect()
+
+
+def test_rows_without_id_are_not_imported_again(db, db_config, state_dir):
+    # The sample rows have no id
+    write_sample_csvs(state_dir)
+    _import(db_config)
+    expected = {table: sample_rows(table) for table in import_data.IMPORT_ORDER}
+    assert table_counts(db) == expected
+    
+    _import(db_config)
+    assert table_counts(db) == expected
+
+
+def test_repeated_rows_without_id_are_each_stored_once(db, db_config, state_dir):
+    write_sample_csvs(state_dir, ['companies'])
+    path = os.path.join(state_dir, 'companies.csv')
+    _import(db_config)
+    
+    # A second copy of the first company, and a new one
+    rows = import_data.SAMPLE_CSVS['companies.csv']
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows([rows[1], ['', 'Other Corp'] + rows[1][2:]])
+    _import(db_config)
+    assert table_counts(db)['companies'] == sample_rows('companies') + 2
+    
+    _import(db_config, workers=1, shard_workers=2)
+    assert table_counts(db)['companies'] == sample_rows('companies') + 2
@@ -0,0 +1,27 @@
+"""Per-table peak RSS of ImportMetrics."""
+
+import import_data
+import pytest
+
+
+def test_table_peak_rss_is_sampled_per_table(monkeypatch):
+    rss = iter([100, 300, 200, 50, 60, 40])
+    monkeypatch.setattr(import_data, 'current_rss_bytes', lambda: next(rss))
+    metrics = import_data.ImportMetrics()
+    metrics.sample_rss('users')
+    metrics.add('users', 'cast', 0.1, 10)
+    metrics.table_done('users', 1.0, 10, 10, 100)
+    # A later, smaller table does not inherit the peak of the first one
+    metrics.sample_rss('sites')
+    metrics.add('sites', 'write', 0.1, 1)
+    metrics.table_done('sites', 1.0, 1, 1, 10)
+    tables = metrics.report()['tables']
+    assert tables['users']['peak_rss_bytes'] == 300
+    assert tables['sites']['peak_rss_bytes'] == 60
+
+
+def test_current_rss_bytes():
+    rss = import_data.current_rss_bytes()
+    if rss is None:
+        pytest.skip('no /proc/self/statm')
+    assert rss > 0
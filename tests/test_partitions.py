@@ -0,0 +1,134 @@
+"""Loads of audit_logs into monthly partitions (PARTITION_KEYS)."""
+
+import csv
+import json
+import os
+
+import pytest
+from psycopg2 import sql
+
+import import_data
+from import_data import DatabaseImporter
+
+from conftest import TEST_SCHEMA, write_sample_csvs
+
+# Months of the audit_logs rows written by write_audit_logs
+MONTHS = ['2024-01', '2024-02', '2024-03']
+
+
+def write_audit_logs(directory, rows_per_month: int = 20, with_ids: bool = True) -> int:
+    """Write an audit_logs.csv with `rows_per_month` rows in each of MONTHS; returns the row count.
+    
+    The months are interleaved, as rows of a real export are not sorted by month.
+    """
+    header = import_data.SAMPLE_CSVS['audit_logs.csv'][0]
+    with open(os.path.join(directory, 'audit_logs.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        row_id = 1
+        for day in range(rows_per_month):
+            for month in MONTHS:
+                values = dict.fromkeys(header, '')
+                values.update(id=str(row_id) if with_ids else '', entityType='intervention', entityId=str(row_id),
+                              action='update', newValues=json.dumps({'n': row_id}),
+                              createdAt=f'{month}-{day % 28 + 1:02d}T10:00:00')
+                writer.writerow([values[col] for col in header])
+                row_id += 1
+    return len(MONTHS) * rows_per_month
+
+
+@pytest.fixture
+def partitioned(db):
+    """Make the audit_logs of TEST_SCHEMA RANGE partitioned by createdAt."""
+    table = sql.Identifier(TEST_SCHEMA, 'audit_logs')
+    with db.cursor() as cur:
+        cur.execute(sql.SQL("DROP TABLE {}").format(table))
+        cur.execute(sql.SQL('CREATE TABLE {} (LIKE public.audit_logs INCLUDING DEFAULTS, '
+                            'PRIMARY KEY (id, "createdAt")) PARTITION BY RANGE ("createdAt")').format(table))
+    return db
+
+
+def _import(config, **options):
+    importer = DatabaseImporter(config, bcrypt_rounds=4, **options)
+    importer.connect()
+    try:
+        importer.import_all()
+    finally:
+        importer.disconnect()
+
+
+def partition_counts(conn):
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SELECT tableoid::regclass::text, count(*) FROM {} GROUP BY 1 ORDER BY 1").format(
+            sql.Identifier(TEST_SCHEMA, 'audit_logs')))
+        return dict(cur.fetchall())
+
+
+@pytest.mark.parametrize('profile', ['bulk', 'online'])
+def test_partitioned_load_fits_profile_pool(partitioned, db_config, state_dir, profile):
+    write_sample_csvs(state_dir, ['users'])
+    rows = write_audit_logs(state_dir)
+    importer = DatabaseImporter(db_config, workers=3, profile=profile)
+    assert importer.connections_needed() <= (import_data.LOAD_PROFILES[profile]['max_connections']
+                                             or importer.connections_needed())
+    _import(db_config, workers=3, profile=profile)
+    
+    assert partition_counts(partitioned) == expected_counts(rows)
+
+
+def test_partition_writers_are_counted():
+    importer = DatabaseImporter({}, workers=3)
+    assert importer.connections_needed() == 1 + 3 * (1 + import_data.PARTITION_WORKERS)
+
+
+def expected_counts(rows):
+    return {f"audit_logs_{month.replace('-', '_')}": rows // len(MONTHS) for month in MONTHS}
+
+
+def fail_on_month(monkeypatch, month: str, after: int):
+    """Make the write of `month` fail once `after` of its batches are written."""
+    write_shard = DatabaseImporter.write_shard
+    written = []
+    
+    def failing_write_shard(self, table, columns, rows, *args, **kwargs):
+        if table == 'audit_logs' and f"{rows[0][1][columns.index('createdAt')]:%Y-%m}" == month:
+            if len(written) >= after:
+                raise RuntimeError('interrupted')
+            written.append(rows)
+        return write_shard(self, table, columns, rows, *args, **kwargs)
+    
+    monkeypatch.setattr(DatabaseImporter, 'write_shard', failing_write_shard)
+
+
+def test_interrupted_partitioned_load_resumes_without_duplicates(partitioned, db_config, state_dir, monkeypatch):
+    write_sample_csvs(state_dir, ['users'])
+    # Rows without an id are not caught by the primary key: only the checkpoint keeps them from doubling
+    rows = write_audit_logs(state_dir, with_ids=False)
+    monkeypatch.setattr(import_data, 'COPY_CHUNK_SIZE', 5)
+    with monkeypatch.context() as m:
+        fail_on_month(m, '2024-02', after=2)
+        with pytest.raises(RuntimeError):
+            _import(db_config, workers=1, resume=True)
+    assert 0 < sum(partition_counts(partitioned).values()) < rows
+    
+    _import(db_config, workers=1, resume=True)
+    assert partition_counts(partitioned) == expected_counts(rows)
+    assert not os.path.exists(os.path.join(import_data._state_path('rejects'), 'audit_logs.jsonl'))
+
+
+def test_failed_partition_swap_is_reported_and_resumed(partitioned, db_config, state_dir):
+    write_sample_csvs(state_dir, ['users'])
+    rows = write_audit_logs(state_dir)
+    # A table in the way of the rename of the loaded 2024-02 table
+    blocker = sql.Identifier(TEST_SCHEMA, 'audit_logs_2024_02')
+    with partitioned.cursor() as cur:
+        cur.execute(sql.SQL("CREATE TABLE {} (id int)").format(blocker))
+    with pytest.raises(RuntimeError, match='audit_logs_2024_02'):
+        _import(db_config, workers=1, resume=True, replace_partitions=True)
+    assert partition_counts(partitioned) == {name: count for name, count in expected_counts(rows).items()
+                                             if name != 'audit_logs_2024_02'}
+    
+    with partitioned.cursor() as cur:
+        cur.execute(sql.SQL("DROP TABLE {}").format(blocker))
+    _import(db_config, workers=1, resume=True, replace_partitions=True)
+    assert partition_counts(partitioned) == expected_counts(rows)
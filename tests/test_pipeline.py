@@ -0,0 +1,70 @@
+"""Load paths of DatabaseImporter: --async, across table workers."""
+
+import pytest
+
+import import_data
+from import_data import DatabaseImporter
+
+from conftest import sample_rows, table_counts, write_sample_csvs
+
+
+def _import(config, **options) -> DatabaseImporter:
+    importer = DatabaseImporter(config, bcrypt_rounds=4, **options)
+    importer.connect()
+    try:
+        importer.import_all()
+    finally:
+        importer.disconnect()
+    return importer
+
+
+@pytest.mark.parametrize('shard_workers', [1, 2])
+def test_async_pipeline_runs_on_table_workers(db, db_config, state_dir, monkeypatch, shard_workers):
+    write_sample_csvs(state_dir)
+    pipelined = []
+    load = DatabaseImporter._load_shards_async
+    
+    def spy(self, table, *args, **kwargs):
+        pipelined.append(table)
+        return load(self, table, *args, **kwargs)
+    
+    monkeypatch.setattr(DatabaseImporter, '_load_shards_async', spy)
+    _import(db_config, workers=3, shard_workers=shard_workers, async_pipeline=True)
+    
+    assert sorted(pipelined) == sorted(import_data.IMPORT_ORDER)
+    assert table_counts(db) == {table: sample_rows(table) for table in import_data.IMPORT_ORDER}
+
+
+def test_async_pipeline_counts_its_writers():
+    importer = DatabaseImporter({}, workers=3, async_pipeline=True)
+    assert importer._spawn().async_pipeline
+    writers = max(import_data.PIPELINE_WRITERS, import_data.PARTITION_WORKERS)
+    assert importer.connections_needed() == 1 + 3 * (1 + writers)
+
+
+def test_async_pipeline_fits_the_online_profile():
+    importer = DatabaseImporter({}, async_pipeline=True, profile='online')
+    assert not importer.async_pipeline
+    assert importer.connections_needed() <= import_data.LOAD_PROFILES['online']['max_connections']
+
+
+def test_asyncpg_connections_keep_the_session_options():
+    config = import_data._asyncpg_config({'host': 'db', 'options': '-c search_path=a,public -cwork_mem=4MB'},
+                                         {'lock_timeout': '5s'})
+    assert config['server_settings'] == {'search_path': 'a,public', 'work_mem': '4MB', 'lock_timeout': '5s'}
+
+
+def test_async_pipeline_with_asyncpg(db, db_config, state_dir, monkeypatch):
+    pytest.importorskip('asyncpg')
+    write_sample_csvs(state_dir)
+    written = []
+    write = DatabaseImporter._write_shard_async
+    
+    async def spy(self, con, table, *args):
+        written.append(table)
+        return await write(self, con, table, *args)
+    
+    monkeypatch.setattr(DatabaseImporter, '_write_shard_async', spy)
+    _import(db_config, workers=2, async_pipeline=True)
+    assert set(written) == set(import_data.IMPORT_ORDER)
+    assert table_counts(db) == {table: sample_rows(table) for table in import_data.IMPORT_ORDER}
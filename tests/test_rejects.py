@@ -0,0 +1,83 @@
+"""Reject files of the rows an import could not store (RejectLog)."""
+
+import csv
+import json
+import os
+
+import pytest
+
+import import_data
+from import_data import DatabaseImporter, RejectLog
+
+HEADER = ['id', 'type', 'value', 'description', 'nickname', 'equipmentType', 'parentId', 'isActive', 'sortOrder',
+          'createdAt', 'updatedAt']
+
+
+def write_predefined_values(directory, rows: int = 30) -> list:
+    """Write predefined_values.csv where every fifth row has an invalid type; returns their row numbers."""
+    bad = []
+    with open(os.path.join(directory, 'predefined_values.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for row in range(1, rows + 1):
+            kind = 'centrale'
+            if row % 5 == 0:
+                kind = 'bogus'
+                bad.append(row)
+            writer.writerow(['', kind, f'Value {row}', '', '', '', '', 'true', str(row), '', ''])
+    return bad
+
+
+def read_rejects(table: str):
+    path = os.path.join(import_data._state_path('rejects'), f'{table}.jsonl')
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_flush_continues_where_it_stopped(state_dir):
+    bad = write_predefined_values(state_dir)
+    rejects = RejectLog(import_data._state_path('rejects'))
+    rejects.begin('predefined_values', os.path.join(state_dir, 'predefined_values.csv'))
+    for row in bad:
+        rejects.add('predefined_values', row, 'ValueError', 'Invalid predefined_values.type: bogus')
+    rejects.flush('predefined_values', 12)
+    assert [record['row'] for record in read_rejects('predefined_values')] == [5, 10]
+    # Reported once the read went past it
+    rejects.add('predefined_values', 3, 'UniqueViolation', 'duplicate key')
+    rejects.flush('predefined_values', 22)
+    rejects.finish('predefined_values')
+    records = read_rejects('predefined_values')
+    assert [record['row'] for record in records] == [5, 10, 15, 20, 25, 30, 3]
+    assert [record['line'] for record in records] == [6, 11, 16, 21, 26, 31, 4]
+    assert records[2]['values']['value'] == 'Value 15'
+
+
+def test_rejects_of_committed_shards_are_written_before_the_table_finishes(db, db_config, state_dir, monkeypatch):
+    bad = write_predefined_values(state_dir)
+    monkeypatch.setattr(import_data, 'COPY_CHUNK_SIZE', 5)
+    write_shard = DatabaseImporter.write_shard
+    seen = []
+    
+    def failing_write_shard(self, table, *args, **kwargs):
+        if table == 'predefined_values' and len(seen) == 3:
+            # What a kill of the import at this point would leave
+            seen.append([record['row'] for record in read_rejects(table)])
+            raise RuntimeError('interrupted')
+        seen.append(None)
+        return write_shard(self, table, *args, **kwargs)
+    
+    importer = DatabaseImporter(db_config, workers=1, bcrypt_rounds=4, resume=True)
+    importer.connect()
+    try:
+        with monkeypatch.context() as m:
+            m.setattr(DatabaseImporter, 'write_shard', failing_write_shard)
+            with pytest.raises(RuntimeError):
+                importer.import_all()
+        assert seen[-1] == bad[:3]
+        
+        importer.import_all()
+    finally:
+        importer.disconnect()
+    assert [record['row'] for record in read_rejects('predefined_values')] == bad
@@ -0,0 +1,80 @@
+"""The staging cache of casted rows (StagingCache)."""
+
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import import_data
+from import_data import StagingCache, compile_converter
+
+from conftest import sample_rows, table_counts, write_sample_csvs
+
+
+def _import(config):
+    importer = import_data.DatabaseImporter(config, bcrypt_rounds=4)
+    importer.connect()
+    try:
+        importer.import_all()
+    finally:
+        importer.disconnect()
+
+
+def test_cache_round_trips_typed_values(state_dir):
+    header = tuple(import_data.SAMPLE_CSVS['interventions.csv'][0])
+    converter = compile_converter('interventions', header)
+    records = [(i, values) for i, values in enumerate(import_data.SAMPLE_CSVS['interventions.csv'][1:], 1)]
+    rows, errors = import_data.cast_shard('interventions', header, records)
+    errors.append((99, 'Invalid timestamp: x'))
+    path = os.path.join(state_dir, 'interventions.cache')
+    
+    cache = StagingCache(path, 'key', converter)
+    cache.begin()
+    cache.add(rows, errors, (99, 1234), 1)
+    cache.commit()
+    
+    cache = StagingCache(path, 'key', converter)
+    assert cache.load()
+    [(end, cached_rows, cached_errors, _)] = list(cache.shards())
+    assert (end, cached_rows, cached_errors) == ((99, 1234), rows, errors)
+    assert not StagingCache(path, 'other key', converter).load()
+
+
+def test_columns_keep_their_types(state_dir):
+    converter = SimpleNamespace(table='typed', _volatile=[])
+    aware = datetime(2023, 5, 11, 12, 45, tzinfo=timezone(timedelta(hours=2)))
+    values = [None, True, 1, 1.0, False, 0, -2 ** 63, 2.5e-300, '', 'é\u2028😀', '1',
+              datetime(1, 1, 1), datetime(2023, 5, 11, 12, 45, 0, 123456), aware, aware.astimezone(timezone.utc)]
+    rows = [(i, (value,)) for i, value in enumerate(values, 1)]
+    path = os.path.join(state_dir, 'typed.cache')
+    cache = StagingCache(path, 'key', converter)
+    cache.begin()
+    cache.add(rows[:5], [], (5, 50), 1)
+    cache.add(rows[5:], [(16, 'Invalid timestamp: é')], (16, 160), 6)
+    cache.commit()
+    
+    assert cache.load()
+    cached = [row for _, shard_rows, _, _ in cache.shards() for row in shard_rows]
+    assert cached == rows
+    assert [type(value) for _, (value,) in cached] == [type(value) for value in values]
+    assert [value.utcoffset() for _, (value,) in cached[-2:]] == [timedelta(hours=2), timedelta(0)]
+    # Resuming in the middle of a shard
+    assert [n for _, shard_rows, _, _ in cache.shards(7) for n, _ in shard_rows] == list(range(8, 16))
+
+
+def test_values_without_layout_are_not_cached(state_dir):
+    converter = SimpleNamespace(table='other', _volatile=[])
+    path = os.path.join(state_dir, 'other.cache')
+    cache = StagingCache(path, 'key', converter)
+    cache.begin()
+    cache.add([(1, ({'a': 1},))], [], (1, 10), 1)
+    cache.commit()
+    assert not os.path.exists(path) and not os.path.exists(f'{path}.tmp')
+
+
+def test_passwords_are_never_cached(db, db_config, state_dir):
+    write_sample_csvs(state_dir)
+    _import(db_config)
+    cache_dir = import_data._state_path('cache')
+    assert 'companies.cache' in os.listdir(cache_dir)
+    assert 'users.cache' not in os.listdir(cache_dir)
+    assert table_counts(db)['users'] == sample_rows('users')